@@ -9,6 +9,7 @@ import {
 import { Badge } from "@/components/ui/badge";
 import { CheckCircle2, Loader2 } from "lucide-react";
 import { toast } from "@/components/ui/use-toast";
+import { getVideoRendition, useSignedUrl } from "@/lib/media";
 
 const CategorizedItems = ({ data, isLoading }) => {
   if (isLoading) {
@@ -107,25 +108,8 @@ const CategoryImage = ({ category, images }) => {
   const imageKey = `category-${category}`;
   const imagePath = images && images[imageKey];
 
-  const [imageUrl, setImageUrl] = useState(null);
-  const [error, setError] = useState(false);
-
-  useEffect(() => {
-    if (imagePath) {
-      // Convert OSS path to signed URL
-      fetch(`/api/images/${imagePath.split("/").pop()}`)
-        .then((res) => res.json())
-        .then((data) => {
-          if (data.url) {
-            setImageUrl(data.url);
-          }
-        })
-        .catch((err) => {
-          console.error("Error fetching image URL:", err);
-          setError(true);
-        });
-    }
-  }, [imagePath]);
+  // Convert OSS path to signed URL
+  const { url: imageUrl, error } = useSignedUrl("images", imagePath);
 
   if (error || !imageUrl) {
     return (
@@ -144,25 +128,8 @@ const SubcategoryImage = ({ category, subcategory, images }) => {
   const imageKey = `subcategory-${category}-${subcategory}`;
   const imagePath = images && images[imageKey];
 
-  const [imageUrl, setImageUrl] = useState(null);
-  const [error, setError] = useState(false);
-
-  useEffect(() => {
-    if (imagePath) {
-      // Convert OSS path to signed URL
-      fetch(`/api/images/${imagePath.split("/").pop()}`)
-        .then((res) => res.json())
-        .then((data) => {
-          if (data.url) {
-            setImageUrl(data.url);
-          }
-        })
-        .catch((err) => {
-          console.error("Error fetching subcategory image URL:", err);
-          setError(true);
-        });
-    }
-  }, [imagePath]);
+  // Convert OSS path to signed URL
+  const { url: imageUrl, error } = useSignedUrl("images", imagePath);
 
   if (error || !imageUrl) {
     return (
@@ -187,27 +154,14 @@ const ItemCard = ({ item, images, videos }) => {
   const [selectedRequests, setSelectedRequests] = useState([]);
   const [activeVideo, setActiveVideo] = useState(null);
   const [videoUrl, setVideoUrl] = useState(null);
-  const [itemImageUrl, setItemImageUrl] = useState(null);
+  const [posterUrl, setPosterUrl] = useState(null);
   const [loadingVideo, setLoadingVideo] = useState(false);
 
   // Fetch item image
-  useEffect(() => {
-    const imageKey = `item-${item.name}`;
-    const imagePath = images && images[imageKey];
-
-    if (imagePath) {
-      fetch(`/api/images/${imagePath.split("/").pop()}`)
-        .then((res) => res.json())
-        .then((data) => {
-          if (data.url) {
-            setItemImageUrl(data.url);
-          }
-        })
-        .catch((err) => {
-          console.error("Error fetching item image URL:", err);
-        });
-    }
-  }, [item.name, images]);
+  const { url: itemImageUrl } = useSignedUrl(
+    "images",
+    images && images[`item-${item.name}`]
+  );
 
   // Fetch video when a request is selected
   useEffect(() => {
@@ -217,11 +171,11 @@ const ItemCard = ({ item, images, videos }) => {
       const videoPath = videos && videos[videoKey];
 
       if (videoPath) {
-        fetch(`/api/videos/${videoPath.split("/").pop()}`)
-          .then((res) => res.json())
-          .then((data) => {
-            if (data.url) {
-              setVideoUrl(data.url);
+        getVideoRendition(videoPath)
+          .then(({ url, poster }) => {
+            if (url) {
+              setVideoUrl(url);
+              setPosterUrl(poster);
             }
           })
           .catch((err) => {
@@ -271,6 +225,7 @@ const ItemCard = ({ item, images, videos }) => {
         {videoUrl && activeVideo ? (
           <video
             src={videoUrl}
+            poster={posterUrl || undefined}
             className="w-full h-full object-cover"
             autoPlay
             controls
@@ -3,6 +3,8 @@ import ItemForm from "./ItemForm";
 import CategorizedItems from "./CategorizedItems";
 import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert";
 import { AlertCircle, Loader2 } from "lucide-react";
+import { mergeCategorizedData, streamCategorization } from "@/lib/jobs";
+import { primeSignedUrls } from "@/lib/media";
 
 const CreateTab = ({ setCategorizedData }) => {
   const [localData, setLocalData] = useState(null);
@@ -14,11 +16,13 @@ const CreateTab = ({ setCategorizedData }) => {
   useEffect(() => {
     const fetchStoredData = async () => {
       try {
-        const response = await fetch("/api/stored-data");
+        const response = await fetch("/api/stored-data?resolve=1");
         if (!response.ok) {
           throw new Error("Failed to fetch stored data");
         }
         const data = await response.json();
+        // Media URLs come back pre-signed, so the grid needs no extra calls
+        primeSignedUrls(data.urls, data.expires);
         setLocalData(data);
         setCategorizedData(data);
       } catch (err) {
@@ -37,26 +41,31 @@ const CreateTab = ({ setCategorizedData }) => {
     setError(null);
 
     try {
-      // Send items to backend for categorization
-      const response = await fetch("/api/categorize-items", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({ items }),
-      });
+      // Stream categorization so items appear before their media is ready
+      let streamedData = localData;
+      const showUpdate = (update) => {
+        streamedData = mergeCategorizedData(streamedData, update);
+        setLocalData(streamedData);
+        setCategorizedData(streamedData);
+      };
+      const mediaMappings = {
+        image: "images",
+        video: "videos",
+        audio: "audio",
+      };
 
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.error || "Failed to categorize items");
-      }
+      const result = await streamCategorization(items, (event, data) => {
+        if (event === "categorized") {
+          showUpdate({ items: data.items });
+          // Show the list right away; media fills in as it arrives
+          setIsLoading(false);
+        } else if (mediaMappings[event] && data.oss_key) {
+          showUpdate({ [mediaMappings[event]]: { [data.key]: data.oss_key } });
+        }
+      });
 
       // Process the categorized data from the backend
-      const categorizedData = await response.json();
-
-      // Update local state and parent component state
-      setLocalData(categorizedData);
-      setCategorizedData(categorizedData);
+      showUpdate(result);
     } catch (err) {
       setError(
         err.message || "Something went wrong with the categorization process"
@@ -11,6 +11,8 @@ import {
 } from "lucide-react";
 import VideoPlayer from "./VideoPlayer";
 import { useToast } from "@/components/ui/use-toast";
+import { waitForJob } from "@/lib/jobs";
+import { getSignedUrl, mediaKey, useSignedUrl } from "@/lib/media";
 
 // Title case function
 function toTitleCase(str) {
@@ -20,6 +22,28 @@ function toTitleCase(str) {
     .join(" ");
 }
 
+// Image stored in OSS, resolved through the batched signing endpoint
+const OssImage = ({ path, alt, placeholder }) => {
+  const { url, error } = useSignedUrl("images", path);
+
+  if (!url && !error) {
+    return <div className="w-full h-full bg-primary/5" />;
+  }
+
+  return (
+    <img
+      src={error ? placeholder : url}
+      alt={alt}
+      className="w-full h-full object-cover"
+      onError={(e) => {
+        // Fallback to placeholder on error
+        e.target.onerror = null;
+        e.target.src = placeholder;
+      }}
+    />
+  );
+};
+
 const ManagementTab = ({ categorizedData }) => {
   const [currentView, setCurrentView] = useState("categories");
   const [selectedCategory, setSelectedCategory] = useState(null);
@@ -104,14 +128,12 @@ const ManagementTab = ({ categorizedData }) => {
 
     try {
       // Request audio URL from backend
-      const response = await fetch(`/api/audio/${name.replace(/ /g, "_")}`);
-      if (!response.ok) {
-        throw new Error(`Failed to fetch audio for ${name}`);
-      }
-
-      const data = await response.json();
+      const audioPath = categorizedData.audio && categorizedData.audio[name];
+      const url = audioPath
+        ? await getSignedUrl(mediaKey("audio", audioPath))
+        : null;
 
-      if (!data.url) {
+      if (!url) {
         toast({
           title: "Audio Unavailable",
           description: `No audio available for ${name}`,
@@ -121,7 +143,7 @@ const ManagementTab = ({ categorizedData }) => {
       }
 
       // Create a new audio element and play it
-      audioRef.current = new Audio(data.url);
+      audioRef.current = new Audio(url);
 
       audioRef.current.addEventListener("ended", () => {
         setPlaying(null);
@@ -256,20 +278,10 @@ const ManagementTab = ({ categorizedData }) => {
                     {/* Fetch image from the backend OSS storage */}
                     {organizedData.images &&
                     organizedData.images[`category-${category}`] ? (
-                      <img
-                        src={`/api/images/${organizedData.images[
-                          `category-${category}`
-                        ]
-                          .split("/")
-                          .pop()}`}
+                      <OssImage
+                        path={organizedData.images[`category-${category}`]}
                         alt={category}
-                        className="w-full h-full object-cover"
-                        onError={(e) => {
-                          // Fallback to placeholder on error
-                          e.target.onerror = null;
-                          e.target.src =
-                            "/placeholders/category_placeholder.png";
-                        }}
+                        placeholder="/placeholders/category_placeholder.png"
                       />
                     ) : (
                       <div className="w-full h-full bg-primary/10 flex items-center justify-center">
@@ -349,20 +361,14 @@ const ManagementTab = ({ categorizedData }) => {
                   organizedData.images[
                     `subcategory-${selectedCategory}-${subcategory}`
                   ] ? (
-                    <img
-                      src={`/api/images/${organizedData.images[
-                        `subcategory-${selectedCategory}-${subcategory}`
-                      ]
-                        .split("/")
-                        .pop()}`}
+                    <OssImage
+                      path={
+                        organizedData.images[
+                          `subcategory-${selectedCategory}-${subcategory}`
+                        ]
+                      }
                       alt={subcategory}
-                      className="w-full h-full object-cover"
-                      onError={(e) => {
-                        // Fallback to placeholder on error
-                        e.target.onerror = null;
-                        e.target.src =
-                          "/placeholders/subcategory_placeholder.png";
-                      }}
+                      placeholder="/placeholders/subcategory_placeholder.png"
                     />
                   ) : (
                     <div className="w-full h-full bg-primary/10 flex items-center justify-center">
@@ -441,19 +447,10 @@ const ManagementTab = ({ categorizedData }) => {
                     {/* Fetch item image from OSS storage */}
                     {organizedData.images &&
                     organizedData.images[`item-${item.name}`] ? (
-                      <img
-                        src={`/api/images/${organizedData.images[
-                          `item-${item.name}`
-                        ]
-                          .split("/")
-                          .pop()}`}
+                      <OssImage
+                        path={organizedData.images[`item-${item.name}`]}
                         alt={item.name}
-                        className="w-full h-full object-cover"
-                        onError={(e) => {
-                          // Fallback to placeholder on error
-                          e.target.onerror = null;
-                          e.target.src = "/placeholders/item_placeholder.png";
-                        }}
+                        placeholder="/placeholders/item_placeholder.png"
                       />
                     ) : (
                       <div className="w-full h-full bg-primary/10 flex items-center justify-center">
@@ -613,7 +610,11 @@ const ManagementTab = ({ categorizedData }) => {
                               throw new Error("Failed to generate video");
                             }
 
-                            const result = await response.json();
+                            // Video generation runs as a background job
+                            const job = await response.json();
+                            const result = await waitForJob(job.job_id, {
+                              interval: 3000,
+                            });
 
                             // Add new action to the item's requests
                             const newRequests = [
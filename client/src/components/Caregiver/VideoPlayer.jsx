@@ -1,9 +1,11 @@
 import { useState, useEffect, useRef } from "react";
 import { Loader2 } from "lucide-react";
+import { getVideoRendition } from "@/lib/media";
 
 const VideoPlayer = ({ videoKey }) => {
   const videoRef = useRef(null);
   const [videoUrl, setVideoUrl] = useState(null);
+  const [posterUrl, setPosterUrl] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -19,20 +21,12 @@ const VideoPlayer = ({ videoKey }) => {
       }
 
       try {
-        // Extract filename from the OSS path (videos/filename.mp4)
-        const filename = videoKey.split("/").pop();
+        // Fetch the signed URL of the rendition suited to this connection
+        const { url, poster } = await getVideoRendition(videoKey);
 
-        // Fetch the signed URL from the backend API
-        const response = await fetch(`/api/videos/${filename}`);
-
-        if (!response.ok) {
-          throw new Error("Failed to fetch video URL");
-        }
-
-        const data = await response.json();
-
-        if (data.url) {
-          setVideoUrl(data.url);
+        if (url) {
+          setVideoUrl(url);
+          setPosterUrl(poster);
         } else {
           throw new Error("Invalid video URL received");
         }
@@ -95,6 +89,7 @@ const VideoPlayer = ({ videoKey }) => {
       loop
       muted
       playsInline
+      poster={posterUrl || undefined}
       className="w-full h-full object-cover"
       onLoadedData={handleVideoLoaded}
       onError={handleVideoError}
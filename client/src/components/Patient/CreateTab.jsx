@@ -18,6 +18,7 @@ import {
 } from "lucide-react";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { useToast } from "@/components/ui/use-toast";
+import { streamCategorization } from "@/lib/jobs";
 
 const CreateTab = ({ onAddItem }) => {
   const [activeTab, setActiveTab] = useState("camera");
@@ -151,40 +152,28 @@ const CreateTab = ({ onAddItem }) => {
       setDetectedObject(detectedItem);
       setProcessingStage("categorizing");
 
-      // Now, add the detected item to our categorization system
-      const categorizationResponse = await fetch("/api/categorize-items", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          items: detectedItem,
-        }),
+      // Now, add the detected item to our categorization system and wait
+      // for Wan2.1 to finish generating its media
+      await streamCategorization(detectedItem, (event) => {
+        if (event === "categorized") {
+          // Update processing stage for generating media
+          setProcessingStage("generating");
+        }
       });
 
-      if (!categorizationResponse.ok) {
-        throw new Error("Failed to categorize item");
-      }
-
-      // Update processing stage for generating media
-      setProcessingStage("generating");
-
-      // Simulate the time it takes to generate images and videos with Wan2.1 models
-      setTimeout(() => {
-        setProcessingComplete(true);
-        setIsProcessing(false);
+      setProcessingComplete(true);
+      setIsProcessing(false);
 
-        // Call the parent callback with the categorized item
-        if (onAddItem) {
-          onAddItem(detectedItem);
-        }
+      // Call the parent callback with the categorized item
+      if (onAddItem) {
+        onAddItem(detectedItem);
+      }
 
-        toast({
-          title: "Item Added Successfully",
-          description: `${detectedItem} has been detected, categorized, and all media has been generated.`,
-          variant: "default",
-        });
-      }, 4000); // Simulating the time it takes for Wan2.1 to generate media
+      toast({
+        title: "Item Added Successfully",
+        description: `${detectedItem} has been detected, categorized, and all media has been generated.`,
+        variant: "default",
+      });
     } catch (err) {
       console.error("Error processing image:", err);
       setError(`Failed to process image: ${err.message}`);
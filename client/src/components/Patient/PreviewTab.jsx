@@ -7,8 +7,10 @@ import {
   Play,
   Pause,
   CheckCircle,
+  Loader2,
 } from "lucide-react";
 import VideoPlayer from "./VideoPlayer";
+import { useTreeLevel } from "@/lib/tree";
 
 // Import all images
 import foodAndDrinksImage from "@/assets/food_and_drinks.png";
@@ -125,7 +127,7 @@ function toTitleCase(str) {
     .join(" ");
 }
 
-const PreviewTab = ({ categorizedData }) => {
+const PreviewTab = ({ refreshKey }) => {
   const [currentView, setCurrentView] = useState("categories");
   const [selectedCategory, setSelectedCategory] = useState(null);
   const [selectedSubcategory, setSelectedSubcategory] = useState(null);
@@ -136,34 +138,15 @@ const PreviewTab = ({ categorizedData }) => {
   const audioRef = useRef(null);
   const [isSubmitting, setIsSubmitting] = useState(false);
 
-  // Organized data structure
-  const [organizedData, setOrganizedData] = useState({});
-
-  useEffect(() => {
-    // Process data when it's available
-    if (
-      categorizedData &&
-      categorizedData.items &&
-      categorizedData.items.length > 0
-    ) {
-      const processed = {};
-
-      // Process categories/subcategories/items
-      categorizedData.items.forEach((item) => {
-        if (!processed[item.category]) {
-          processed[item.category] = {};
-        }
-
-        if (!processed[item.category][item.subcategory]) {
-          processed[item.category][item.subcategory] = [];
-        }
-
-        processed[item.category][item.subcategory].push(item);
-      });
-
-      setOrganizedData(processed);
-    }
-  }, [categorizedData]);
+  // Only the level on screen is fetched, a page at a time
+  const level = useTreeLevel({
+    category: currentView === "categories" ? undefined : selectedCategory,
+    subcategory:
+      currentView === "items" || currentView === "actions"
+        ? selectedSubcategory
+        : undefined,
+    refreshKey,
+  });
 
   // Reset selected actions when changing item
   useEffect(() => {
@@ -239,11 +222,29 @@ const PreviewTab = ({ categorizedData }) => {
   };
 
   const renderContent = () => {
-    if (
-      !categorizedData ||
-      !categorizedData.items ||
-      categorizedData.items.length === 0
-    ) {
+    // The actions view only needs the selected item
+    const listing = currentView !== "actions";
+
+    if (listing && level.error && level.entries.length === 0) {
+      return (
+        <div className="p-8 text-center">
+          <p className="text-muted-foreground">
+            Failed to load items. Please check your connection and try again.
+          </p>
+        </div>
+      );
+    }
+
+    if (listing && level.isLoading && level.entries.length === 0) {
+      return (
+        <div className="flex flex-col items-center justify-center py-12 space-y-4">
+          <Loader2 className="h-8 w-8 animate-spin text-primary" />
+          <p className="text-muted-foreground">Loading your items...</p>
+        </div>
+      );
+    }
+
+    if (currentView === "categories" && level.entries.length === 0) {
       return (
         <div className="p-8 text-center">
           <p className="text-muted-foreground">
@@ -260,19 +261,11 @@ const PreviewTab = ({ categorizedData }) => {
       );
     }
 
-    if (Object.keys(organizedData).length === 0) {
-      return (
-        <div className="p-8 text-center">
-          <p className="text-muted-foreground">Processing data...</p>
-        </div>
-      );
-    }
-
     switch (currentView) {
       case "categories":
         return (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-            {Object.keys(organizedData).map((category) => (
+            {level.entries.map(({ name: category }) => (
               <Card
                 key={category}
                 className="cursor-pointer hover:shadow-md transition-shadow relative"
@@ -340,7 +333,7 @@ const PreviewTab = ({ categorizedData }) => {
       case "subcategories":
         return (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-            {Object.keys(organizedData[selectedCategory]).map((subcategory) => (
+            {level.entries.map(({ name: subcategory }) => (
               <Card
                 key={subcategory}
                 className="cursor-pointer hover:shadow-md transition-shadow relative"
@@ -410,7 +403,7 @@ const PreviewTab = ({ categorizedData }) => {
       case "items":
         return (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-            {organizedData[selectedCategory][selectedSubcategory].map(
+            {level.entries.map(
               (item) => (
                 <Card
                   key={item.name}
@@ -710,7 +703,23 @@ const PreviewTab = ({ categorizedData }) => {
               : `${toTitleCase(selectedItem.name)} - Actions`}
           </CardTitle>
         </CardHeader>
-        <CardContent>{renderContent()}</CardContent>
+        <CardContent>
+          {renderContent()}
+          {currentView !== "actions" && level.hasMore && (
+            <div className="mt-4 flex justify-center">
+              <Button
+                variant="outline"
+                onClick={level.loadMore}
+                disabled={level.isLoading}
+              >
+                {level.isLoading && (
+                  <Loader2 className="mr-2 h-4 w-4 animate-spin" />
+                )}
+                Load more
+              </Button>
+            </div>
+          )}
+        </CardContent>
       </Card>
     </div>
   );
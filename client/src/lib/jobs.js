@@ -0,0 +1,154 @@
+// Poll a background job until it finishes and return its result
+export async function waitForJob(jobId, { interval = 2000, onProgress } = {}) {
+  for (;;) {
+    const response = await fetch(`/api/jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error("Failed to fetch job status");
+    }
+
+    const job = await response.json();
+    if (onProgress) {
+      onProgress(job);
+    }
+
+    if (job.status === "completed") {
+      return job.result;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Background job failed");
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+}
+
+// Merge a categorization result (only the submitted items and their media)
+// into the full catalog already shown on screen
+export function mergeCategorizedData(previous, update) {
+  const items = new Map(
+    ((previous && previous.items) || []).map((item) => [item.name, item])
+  );
+  (update.items || []).forEach((item) => items.set(item.name, item));
+
+  const merged = { ...previous, items: [...items.values()] };
+  ["videos", "images", "audio"].forEach((mapping) => {
+    merged[mapping] = {
+      ...((previous && previous[mapping]) || {}),
+      ...(update[mapping] || {}),
+    };
+  });
+  return merged;
+}
+
+// Read SSE messages from a fetch response, calling onMessage(event, data, id)
+// for each. Resolves with true once onMessage returns true (the stream is
+// finished), or false if the server closed the stream first.
+async function readEvents(response, onMessage) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) {
+      return false;
+    }
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE messages are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let id = null;
+      let data = "";
+      message.split("\n").forEach((line) => {
+        if (line.startsWith("event: ")) {
+          event = line.slice(7);
+        } else if (line.startsWith("id: ")) {
+          id = line.slice(4);
+        } else if (line.startsWith("data: ")) {
+          data += line.slice(6);
+        }
+      });
+      if (!data) {
+        continue;
+      }
+
+      if (onMessage(event, JSON.parse(data), id)) {
+        await reader.cancel();
+        return true;
+      }
+    }
+  }
+}
+
+// Categorize items through the streaming endpoint. onEvent(event, data) is
+// called for "categorized", then each "image"/"video"/"audio" asset; the
+// promise resolves with the final job result.
+//
+// The server ends each stream after a while so it never holds a worker for
+// a whole job; the rest is followed on /api/jobs/<id>/events from the last
+// event id, or by polling if the job runs in another worker.
+export async function streamCategorization(items, onEvent) {
+  const response = await fetch("/api/categorize-items/stream", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ items }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.error || "Failed to categorize items");
+  }
+
+  let jobId = null;
+  let lastEventId = null;
+  let result = null;
+
+  const onMessage = (event, payload, id) => {
+    if (id) {
+      lastEventId = id;
+    }
+    if (event === "failed") {
+      throw new Error(payload.error || "Categorization failed");
+    }
+    if (event === "completed") {
+      result = payload;
+      return true;
+    }
+    if (event === "categorized") {
+      jobId = payload.job_id;
+    }
+    onEvent(event, payload);
+    return false;
+  };
+
+  if (await readEvents(response, onMessage)) {
+    return result;
+  }
+  if (!jobId) {
+    throw new Error("Categorization stream ended unexpectedly");
+  }
+
+  for (;;) {
+    const headers = lastEventId ? { "Last-Event-ID": lastEventId } : {};
+    const eventsResponse = await fetch(`/api/jobs/${jobId}/events`, {
+      headers,
+    });
+    if (eventsResponse.status === 404) {
+      // Job runs in another worker; its final result is still available
+      return waitForJob(jobId);
+    }
+    if (!eventsResponse.ok) {
+      throw new Error("Failed to follow categorization progress");
+    }
+    if (await readEvents(eventsResponse, onMessage)) {
+      return result;
+    }
+  }
+}
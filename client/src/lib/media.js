@@ -0,0 +1,136 @@
+import { useEffect, useState } from "react";
+
+// Signed URLs are refreshed this long before the server-side expiry
+const EXPIRY_MARGIN_MS = 5 * 60 * 1000;
+// Requests made within this window are signed together in one call
+const BATCH_DELAY_MS = 10;
+// Matches the server's MAX_SIGN_BATCH
+const MAX_BATCH_SIZE = 500;
+
+const signedUrls = new Map();
+let queued = new Map();
+let flushTimer = null;
+
+// Build the OSS key for a stored media path, which may or may not include
+// its folder prefix (e.g. "images/item_bread.png" or "item_bread.png")
+export function mediaKey(folder, path) {
+  return `${folder}/${path.split("/").pop()}`;
+}
+
+// Seed the cache with URLs the server already signed (e.g. stored-data)
+export function primeSignedUrls(urls, expires = {}) {
+  Object.entries(urls || {}).forEach(([key, url]) => {
+    signedUrls.set(key, {
+      url,
+      expiresAt: expires[key] ? expires[key] * 1000 : Date.now() + 30 * 60 * 1000,
+    });
+  });
+}
+
+async function flush() {
+  const batch = queued;
+  queued = new Map();
+  flushTimer = null;
+
+  const keys = [...batch.keys()];
+  for (let start = 0; start < keys.length; start += MAX_BATCH_SIZE) {
+    const chunk = keys.slice(start, start + MAX_BATCH_SIZE);
+    try {
+      const response = await fetch("/api/media/sign", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ keys: chunk }),
+      });
+      if (!response.ok) {
+        throw new Error("Failed to sign media URLs");
+      }
+
+      const data = await response.json();
+      primeSignedUrls(data.urls, data.expires);
+      chunk.forEach((key) =>
+        batch.get(key).forEach(({ resolve }) => resolve(data.urls[key]))
+      );
+    } catch (err) {
+      chunk.forEach((key) =>
+        batch.get(key).forEach(({ reject }) => reject(err))
+      );
+    }
+  }
+}
+
+// Resolve an OSS key to a signed URL, batching concurrent lookups into a
+// single /api/media/sign request
+export function getSignedUrl(key) {
+  const cached = signedUrls.get(key);
+  if (cached && cached.expiresAt - EXPIRY_MARGIN_MS > Date.now()) {
+    return Promise.resolve(cached.url);
+  }
+
+  return new Promise((resolve, reject) => {
+    if (!queued.has(key)) {
+      queued.set(key, []);
+    }
+    queued.get(key).push({ resolve, reject });
+
+    if (!flushTimer) {
+      flushTimer = setTimeout(flush, BATCH_DELAY_MS);
+    }
+  });
+}
+
+// React hook returning the signed URL for a stored media path, or null
+export function useSignedUrl(folder, path) {
+  const [url, setUrl] = useState(null);
+  const [error, setError] = useState(false);
+
+  useEffect(() => {
+    let cancelled = false;
+    setUrl(null);
+    setError(false);
+
+    if (path) {
+      getSignedUrl(mediaKey(folder, path))
+        .then((signedUrl) => {
+          if (!cancelled) {
+            setUrl(signedUrl);
+          }
+        })
+        .catch((err) => {
+          console.error("Error fetching signed URL:", err);
+          if (!cancelled) {
+            setError(true);
+          }
+        });
+    }
+
+    return () => {
+      cancelled = true;
+    };
+  }, [folder, path]);
+
+  return { url, error };
+}
+
+// Connections on which the low-bitrate video rendition is the better choice
+const SLOW_CONNECTIONS = ["slow-2g", "2g", "3g"];
+
+// Signed URL and poster frame for a stored video path. The server picks the
+// low-bitrate rendition on slow or data-saving connections.
+export async function getVideoRendition(path) {
+  const connection = navigator.connection;
+  const slow =
+    connection &&
+    (connection.saveData || SLOW_CONNECTIONS.includes(connection.effectiveType));
+  const filename = encodeURIComponent(path.split("/").pop());
+
+  // Without the Network Information API the server falls back to client hints
+  const response = await fetch(
+    `/api/videos/${filename}${slow ? "?quality=low" : ""}`
+  );
+  if (!response.ok) {
+    throw new Error("Failed to fetch video URL");
+  }
+  return response.json();
+}
@@ -0,0 +1,90 @@
+import { useCallback, useEffect, useState } from "react";
+import { primeSignedUrls } from "@/lib/media";
+
+// Fetch one page of a category tree level. With no category this lists
+// categories; with a category its subcategories; with both, its items.
+export async function fetchTreeLevel({ category, subcategory, cursor } = {}) {
+  const params = new URLSearchParams({ resolve: "1" });
+  if (category) {
+    params.set("category", category);
+  }
+  if (subcategory) {
+    params.set("subcategory", subcategory);
+  }
+  if (cursor) {
+    params.set("cursor", cursor);
+  }
+
+  const response = await fetch(`/api/tree?${params}`);
+  if (!response.ok) {
+    throw new Error("Failed to fetch categories from server");
+  }
+
+  const page = await response.json();
+  // Media on the page comes back pre-signed
+  primeSignedUrls(page.urls, page.expires);
+  return page;
+}
+
+// React hook listing one level of the tree; further pages load on demand.
+// Change refreshKey to reload after the catalog changes.
+export function useTreeLevel({ category, subcategory, refreshKey } = {}) {
+  const [entries, setEntries] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoading, setIsLoading] = useState(true);
+  const [error, setError] = useState(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    setEntries([]);
+    setNextCursor(null);
+    setIsLoading(true);
+    setError(null);
+
+    fetchTreeLevel({ category, subcategory })
+      .then((page) => {
+        if (!cancelled) {
+          setEntries(page.entries);
+          setNextCursor(page.next_cursor);
+        }
+      })
+      .catch((err) => {
+        console.error("Error fetching categories:", err);
+        if (!cancelled) {
+          setError(err);
+        }
+      })
+      .finally(() => {
+        if (!cancelled) {
+          setIsLoading(false);
+        }
+      });
+
+    return () => {
+      cancelled = true;
+    };
+  }, [category, subcategory, refreshKey]);
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || isLoading) {
+      return;
+    }
+    setIsLoading(true);
+    try {
+      const page = await fetchTreeLevel({
+        category,
+        subcategory,
+        cursor: nextCursor,
+      });
+      setEntries((previous) => [...previous, ...page.entries]);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      console.error("Error fetching categories:", err);
+      setError(err);
+    } finally {
+      setIsLoading(false);
+    }
+  }, [category, subcategory, nextCursor, isLoading]);
+
+  return { entries, hasMore: Boolean(nextCursor), loadMore, isLoading, error };
+}
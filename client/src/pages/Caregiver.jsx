@@ -4,6 +4,7 @@ import CreateTab from "@/components/Caregiver/CreateTab";
 import ManagementTab from "@/components/Caregiver/ManagementTab";
 import { Loader2 } from "lucide-react";
 import { Alert, AlertDescription } from "@/components/ui/alert";
+import { primeSignedUrls } from "@/lib/media";
 
 export default function Caregiver() {
   const [categorizedData, setCategorizedData] = useState(null);
@@ -15,13 +16,15 @@ export default function Caregiver() {
     const fetchStoredData = async () => {
       try {
         setIsLoading(true);
-        const response = await fetch("/api/stored-data");
+        const response = await fetch("/api/stored-data?resolve=1");
 
         if (!response.ok) {
           throw new Error("Failed to fetch data from server");
         }
 
         const data = await response.json();
+        // Media URLs come back pre-signed, so the grid needs no extra calls
+        primeSignedUrls(data.urls, data.expires);
         setCategorizedData(data);
       } catch (err) {
         console.error("Error fetching data:", err);
@@ -1,40 +1,12 @@
-import { useState, useEffect } from "react";
+import { useState } from "react";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import PatientCreateTab from "@/components/Patient/CreateTab";
 import PreviewTab from "@/components/Patient/PreviewTab";
-import { Loader2 } from "lucide-react";
-import { Alert, AlertDescription } from "@/components/ui/alert";
+import { waitForJob } from "@/lib/jobs";
 
 export default function Patient() {
-  const [categorizedData, setCategorizedData] = useState(null);
-  const [isLoading, setIsLoading] = useState(true);
-  const [error, setError] = useState(null);
-
-  // Fetch data from MongoDB via Flask backend on component mount
-  useEffect(() => {
-    const fetchStoredData = async () => {
-      try {
-        setIsLoading(true);
-        const response = await fetch("/api/stored-data");
-
-        if (!response.ok) {
-          throw new Error("Failed to fetch data from server");
-        }
-
-        const data = await response.json();
-        setCategorizedData(data);
-      } catch (err) {
-        console.error("Error fetching data:", err);
-        setError(
-          "Failed to load items. Please check your connection and try again."
-        );
-      } finally {
-        setIsLoading(false);
-      }
-    };
-
-    fetchStoredData();
-  }, []);
+  // Bumped after an item is added so the tree view reloads
+  const [refreshKey, setRefreshKey] = useState(0);
 
   const handleAddItem = async (itemName) => {
     try {
@@ -51,11 +23,13 @@ export default function Patient() {
         throw new Error("Failed to add new item");
       }
 
-      // Get the updated data with the new item
-      const updatedData = await response.json();
+      // Show the categorized items while media is generated in the background
+      const job = await response.json();
+      setRefreshKey((key) => key + 1);
 
-      // Update state with the new data
-      setCategorizedData(updatedData);
+      // Reload once the new item's media is ready
+      await waitForJob(job.job_id);
+      setRefreshKey((key) => key + 1);
 
       console.log(`${itemName} added to the system`);
     } catch (error) {
@@ -84,31 +58,18 @@ export default function Patient() {
       </header>
 
       <main className="container mx-auto py-8 px-4 sm:px-6 lg:px-8">
-        {isLoading ? (
-          <div className="flex flex-col items-center justify-center py-12 space-y-4">
-            <Loader2 className="h-8 w-8 animate-spin text-primary" />
-            <p className="text-muted-foreground">
-              Loading your items from database...
-            </p>
-          </div>
-        ) : error ? (
-          <Alert variant="destructive" className="mb-6">
-            <AlertDescription>{error}</AlertDescription>
-          </Alert>
-        ) : (
-          <Tabs defaultValue="preview" className="w-full">
-            <TabsList className="grid w-full grid-cols-2">
-              <TabsTrigger value="preview">My Items</TabsTrigger>
-              <TabsTrigger value="add">Add New</TabsTrigger>
-            </TabsList>
-            <TabsContent value="preview">
-              <PreviewTab categorizedData={categorizedData} />
-            </TabsContent>
-            <TabsContent value="add">
-              <PatientCreateTab onAddItem={handleAddItem} />
-            </TabsContent>
-          </Tabs>
-        )}
+        <Tabs defaultValue="preview" className="w-full">
+          <TabsList className="grid w-full grid-cols-2">
+            <TabsTrigger value="preview">My Items</TabsTrigger>
+            <TabsTrigger value="add">Add New</TabsTrigger>
+          </TabsList>
+          <TabsContent value="preview">
+            <PreviewTab refreshKey={refreshKey} />
+          </TabsContent>
+          <TabsContent value="add">
+            <PatientCreateTab onAddItem={handleAddItem} />
+          </TabsContent>
+        </Tabs>
       </main>
     </div>
   );
@@ -2,99 +2,424 @@ import os
 import subprocess
 import json
 import time
+import threading
 from pathlib import Path
 import shutil
 import base64
+import io
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Request, Response, g, request, jsonify, send_file, send_from_directory, stream_with_context
 from flask_cors import CORS
-import requests
-import urllib.request
-from pymongo import MongoClient
-from botocore.exceptions import ClientError
-import oss2
-from openai import OpenAI
-from aliyunsdkcore.client import AcsClient
-from aliyunsdkcore.acs_exception.exceptions import ClientException, ServerException
-from aliyunsdknls.request.v20180628 import CreateTtsTaskRequest
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+import clients
+from clients import LazyClient
+from jobs import JobQueue, TaskStatus
+from llm import LlmGateway, LlmUnavailable, ResponseCache
+from local_cache import LocalMediaCache
+from media_cache import MEDIA_PREFIXES, MediaCache
+from metrics import Metrics
+from renditions import (
+    RENDITION_HINTS, choose_rendition, rendition_path, transcode,
+)
+from scheduler import GpuScheduler, Priority
+from signing import SignedUrlCache
+from singleflight import MongoLease, SingleFlight
+from tts import TtsPipeline, speech_cache_key, speech_filename
+from uploads import UploadManager
+from vision import DetectionCache, InvalidImage, perceptual_hash, prepare_image
+from wan_worker import WanWorkerClient
+
+
+class InMemoryUploadRequest(Request):
+    """Request that parses multipart file parts into memory
+
+    Werkzeug spools parts over 500 KB to temporary files; the upload route
+    bounds the body (see max_content_length), so uploads never need to
+    touch the disk.
+    """
+
+    @property
+    def max_content_length(self):
+        # Only the image upload is capped; JSON routes such as /api/categorize
+        # take item lists of any size
+        if self.endpoint == "detect_object":
+            return MAX_DETECT_REQUEST_BYTES
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        return io.BytesIO()
 
 
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 CORS(app)
 
-# Initialize clients using environment variables
-qwen_client = OpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url="https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
-)
+# Stage timings for /metrics and the Server-Timing header
+metrics = Metrics()
+
+# Clients are created from environment variables on first use (see
+# clients.py), so importing the app never connects to anything
+qwen_client = LazyClient(clients.qwen)
 
 # ApsaraDB MongoDB connection for semi-structured data
-mongo_client = MongoClient(os.getenv("MONGODB_CONNECTION_STRING"))
-db = mongo_client[os.getenv("MONGODB_DATABASE", "aphasia_assistant")]
-items_collection = db["items"]
-categories_collection = db["categories"]
-
-# OSS configuration for media storage
-auth = oss2.Auth(
-    os.getenv("OSS_ACCESS_KEY_ID"),
-    os.getenv("OSS_ACCESS_KEY_SECRET")
+items_collection = LazyClient(clients.collection, "items")
+categories_collection = LazyClient(clients.collection, "categories")
+jobs_collection = LazyClient(clients.collection, "jobs")
+media_collection = LazyClient(clients.collection, "media")
+meta_collection = LazyClient(clients.collection, "meta")
+categorization_cache_collection = LazyClient(
+    clients.collection, "categorization_cache")
+leases_collection = LazyClient(clients.collection, "leases")
+llm_cache_collection = LazyClient(clients.collection, "llm_cache")
+
+# Qwen calls go through the gateway: deterministic replies are cached in
+# memory and MongoDB, concurrency is capped and throttling is retried
+llm_cache = ResponseCache(
+    llm_cache_collection,
+    async_collection=LazyClient(clients.async_collection, "llm_cache"),
+    capacity=int(os.getenv("LLM_CACHE_SIZE", "2048"))
 )
-bucket = oss2.Bucket(
-    auth,
-    os.getenv("OSS_ENDPOINT"),
-    os.getenv("OSS_BUCKET_NAME")
+llm = LlmGateway(
+    qwen_client,
+    async_client=LazyClient(clients.async_qwen),
+    cache=llm_cache,
+    max_concurrency=int(os.getenv("QWEN_MAX_CONCURRENCY", "8")),
+    timeout=float(os.getenv("QWEN_CALL_TIMEOUT", "60")),
+    max_retries=int(os.getenv("QWEN_MAX_RETRIES", "3"))
 )
+# Persisted replies expire so prompt or model changes eventually show
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 60 * 60)))
+# Object detection is interactive, so it gives up sooner
+QWEN_DETECT_TIMEOUT = float(os.getenv("QWEN_DETECT_TIMEOUT", "20"))
+
+# OSS bucket for media storage
+bucket = LazyClient(clients.bucket)
 
 # Alibaba Cloud EAS configuration for AI model inference
 EAS_URL = os.getenv("EAS_URL")
 EAS_TOKEN = os.getenv("EAS_TOKEN")
 
 # Local temporary storage
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
-TEMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp')
+DATA_DIR = os.getenv(
+    "DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+TEMP_DIR = os.getenv(
+    "TEMP_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp'))
 VIDEOS_DIR = os.path.join(TEMP_DIR, 'videos')
 IMAGES_DIR = os.path.join(TEMP_DIR, 'images')
+AUDIO_DIR = os.path.join(TEMP_DIR, 'audio')
 
 # Create directories if they don't exist
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(VIDEOS_DIR, exist_ok=True)
 os.makedirs(IMAGES_DIR, exist_ok=True)
+os.makedirs(AUDIO_DIR, exist_ok=True)
+
+# Generated media kept on local disk, LRU-evicted past a byte budget
+local_media = LocalMediaCache(
+    os.path.join(DATA_DIR, "local_media.json"),
+    max_bytes=int(os.getenv(
+        "LOCAL_MEDIA_MAX_BYTES", str(20 * 1024 * 1024 * 1024))),
+    roots=(IMAGES_DIR, VIDEOS_DIR, AUDIO_DIR)
+)
 
-# Wan2.1 model paths
+# Wan2.1 tasks and model paths
+WAN_T2I_TASK = "t2i-1.3B"
+WAN_I2V_TASK = "i2v-1.3B"
 WAN_T2I_MODEL_PATH = os.getenv("WAN_T2I_MODEL_PATH", "./Wan2.1-T2V-1.3B")
 WAN_I2V_MODEL_PATH = os.getenv("WAN_I2V_MODEL_PATH", "./Wan2.1-I2V-1.3B-720P")
 
-# Initialize Alibaba Intelligent Speech client
-speech_client = AcsClient(
-    os.getenv("ALIBABA_SPEECH_ACCESS_KEY_ID"),
-    os.getenv("ALIBABA_SPEECH_ACCESS_KEY_SECRET"),
-    os.getenv("ALIBABA_SPEECH_REGION", "ap-southeast-1")
+# Single-shot Wan2.1 script used when the worker is unavailable
+WAN_GENERATE_SCRIPT = os.getenv("WAN_GENERATE_SCRIPT", "generate.py")
+
+# Persistent Wan2.1 worker (see wan_worker.py); generate.py is the fallback
+WAN_WORKER_ADDRESS = os.getenv("WAN_WORKER_ADDRESS", "127.0.0.1:6100")
+wan_worker = None
+if WAN_WORKER_ADDRESS:
+    if os.getenv("WAN_WORKER_AUTHKEY"):
+        wan_worker = WanWorkerClient(WAN_WORKER_ADDRESS)
+    else:
+        print("WAN_WORKER_AUTHKEY is not set; using generate.py instead of the Wan worker")
+
+# Caps concurrent GPU work per model; interactive requests jump the queue
+gpu_scheduler = GpuScheduler({
+    WAN_T2I_TASK: int(os.getenv("WAN_T2I_CONCURRENCY", "1")),
+    WAN_I2V_TASK: int(os.getenv("WAN_I2V_CONCURRENCY", "1")),
+})
+
+# Fast-start, low-bitrate and poster renditions are cut from each new video
+# with ffmpeg; skipped when ffmpeg is not installed
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+VIDEO_RENDITIONS = (os.getenv("VIDEO_RENDITIONS", "1") == "1"
+                    and shutil.which(FFMPEG_BINARY) is not None)
+# Renditions uploaded next to each video, besides the fast-start original
+EXTRA_RENDITIONS = ("low", "poster")
+
+# Number of image prompts sent to the T2I model per batch
+IMAGE_BATCH_SIZE = int(os.getenv("IMAGE_BATCH_SIZE", "8"))
+
+# Alibaba Intelligent Speech client
+speech_client = LazyClient(clients.speech)
+
+
+# Content-addressed index of generated media, reconciled against OSS by
+# listing instead of one HEAD per asset
+media_cache = MediaCache(
+    os.path.join(DATA_DIR, "media_manifest.json"),
+    reconcile_interval=int(os.getenv("MEDIA_RECONCILE_INTERVAL", str(6 * 60 * 60)))
+)
+
+# Signed GET URLs are reused until shortly before they expire
+signed_urls = SignedUrlCache(
+    lambda oss_key, ttl: bucket.sign_url('GET', oss_key, ttl),
+    ttl=3600,  # 1-hour link
+    refresh_margin=int(os.getenv("SIGNED_URL_REFRESH_MARGIN", "300"))
 )
 
+# Most keys a client may sign in one /api/media/sign call
+MAX_SIGN_BATCH = 500
+
+# Shared pool for OSS uploads; large videos go up as resumable multipart
+uploader = UploadManager(
+    bucket,
+    max_workers=int(os.getenv("UPLOAD_WORKERS", "4")),
+    multipart_threshold=int(os.getenv(
+        "OSS_MULTIPART_THRESHOLD", str(10 * 1024 * 1024))),
+    part_size=int(os.getenv("OSS_PART_SIZE", str(2 * 1024 * 1024))),
+    num_threads=int(os.getenv("OSS_UPLOAD_THREADS", "4")),
+    checkpoint_dir=os.path.join(TEMP_DIR, 'oss_checkpoints'),
+    on_uploaded=media_cache.add_key,
+    timer=lambda: metrics.timer("oss_upload")
+)
 
-class TaskStatus:
-    PENDING = "pending"
-    PROCESSING = "processing"
-    COMPLETED = "completed"
-    FAILED = "failed"
+# Concurrent TTS pipeline shared by categorization and /api/generate-speech
+tts_pipeline = TtsPipeline(
+    speech_client,
+    upload=lambda local_path, oss_key: upload_file_to_oss(local_path, oss_key),
+    audio_dir=AUDIO_DIR,
+    cache=media_cache,
+    local_cache=local_media,
+    max_workers=int(os.getenv("TTS_WORKERS", "8"))
+)
 
 
-def save_data_to_mongodb(data):
-    """Save categorized data to MongoDB"""
+# Deduplicates generation of the same OSS key across threads and, through a
+# MongoDB lease, across gunicorn workers
+generation_lease = MongoLease(
+    leases_collection,
+    ttl=int(os.getenv("GENERATION_LEASE_TTL", str(15 * 60)))
+)
+single_flight = SingleFlight(generation_lease)
+
+# Runs a categorize job's videos and phrases one asset per task, each
+# through single_flight; renders still queue on gpu_scheduler
+media_job_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("MEDIA_JOB_WORKERS", "8")),
+    thread_name_prefix="media-job"
+)
+
+
+@metrics.timed("mongo_persist_job")
+def persist_job(job):
+    """Mirror job state to MongoDB so any worker can report on it"""
     try:
-        # Store items individually
-        for item in data["items"]:
-            items_collection.update_one(
-                {"name": item["name"]},
-                {"$set": item},
+        jobs_collection.update_one(
+            {"job_id": job.id},
+            {"$set": job.to_dict()},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Error persisting job {job.id}: {str(e)}")
+
+
+def configure_clients(qwen=None, mongo=None, oss_bucket=None, speech=None):
+    """Use the given clients instead of the ones built from the environment
+
+    Used by the benchmark harness (bench/) to run the server offline.
+    """
+    clients.configure(qwen=qwen, mongo=mongo, bucket=oss_bucket, speech=speech)
+    if mongo is not None:
+        with data_version_lock:
+            data_version_state["value"] = None
+            stored_data_cache.clear()
+            tree_cache.clear()
+        ensure_indexes()
+
+
+# Qwen categorization results keyed by normalized item name
+CATEGORIZATION_CACHE_SIZE = int(os.getenv("CATEGORIZATION_CACHE_SIZE", "10000"))
+categorization_cache = OrderedDict()
+categorization_cache_lock = threading.Lock()
+
+# Object detection uploads: size cap, downscale target and result cache
+MAX_DETECT_UPLOAD_BYTES = 10 * 1024 * 1024
+# Whole request body, leaving room for the multipart framing; enforced for
+# the detect route only, before any form data is parsed
+MAX_DETECT_REQUEST_BYTES = MAX_DETECT_UPLOAD_BYTES + 64 * 1024
+DETECT_IMAGE_MAX_SIDE = int(os.getenv("DETECT_IMAGE_MAX_SIDE", "1024"))
+detection_cache = DetectionCache()
+
+# Seconds between keepalive comments on idle event streams
+SSE_KEEPALIVE_INTERVAL = 15
+
+# A Flask event stream holds a worker thread, so it ends after this long
+# and the client reconnects to /api/jobs/<id>/events with Last-Event-ID
+SSE_MAX_STREAM_SECONDS = int(os.getenv("SSE_MAX_STREAM_SECONDS", "30"))
+
+# Background workers for media generation so request threads never wait on
+# the GPU
+job_queue = JobQueue(
+    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+    on_update=persist_job
+)
+# Single-video requests from the UI get their own workers so they never
+# queue behind categorization runs
+interactive_job_queue = JobQueue(
+    max_workers=int(os.getenv("INTERACTIVE_JOB_WORKERS", "2")),
+    on_update=persist_job
+)
+
+
+def find_job(job_id):
+    return job_queue.get(job_id) or interactive_job_queue.get(job_id)
+
+
+# How long a worker trusts its cached data version before re-reading it
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "2"))
+
+# Cached data version and the stored-data payloads built for it
+data_version_state = {"value": None, "checked_at": 0}
+stored_data_cache = {}
+tree_cache = OrderedDict()
+data_version_lock = threading.Lock()
+
+
+def get_data_version():
+    """Return the stored-data version, re-reading MongoDB at most every TTL"""
+    with data_version_lock:
+        if not data_version_stale():
+            return data_version_state["value"]
+        doc = meta_collection.find_one({"_id": "data_version"})
+        data_version_state["value"] = doc["value"] if doc else 0
+        data_version_state["checked_at"] = time.time()
+        return data_version_state["value"]
+
+
+def data_version_stale():
+    return (data_version_state["value"] is None
+            or time.time() - data_version_state["checked_at"] > DATA_VERSION_TTL)
+
+
+def set_data_version(value, changed=False):
+    """Record a version read or written by any client (sync or async)"""
+    with data_version_lock:
+        data_version_state["value"] = value
+        data_version_state["checked_at"] = time.time()
+        if changed:
+            stored_data_cache.clear()
+            tree_cache.clear()
+
+
+def bump_data_version():
+    """Mark items/media as changed so cached stored-data is invalidated"""
+    try:
+        doc = meta_collection.find_one_and_update(
+            {"_id": "data_version"},
+            {"$inc": {"value": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        set_data_version(doc["value"], changed=True)
+    except Exception as e:
+        print(f"Error bumping data version: {str(e)}")
+
+
+def ensure_indexes():
+    """Create the indexes the lookups and upserts rely on
+
+    Each index is created on its own, so one that conflicts with an
+    existing index does not keep the others from being built.
+    """
+    indexes = [
+        ("items.name", lambda: items_collection.create_index(
+            [("name", ASCENDING)], unique=True)),
+        # Serves the /api/tree grouping and per-subcategory item pages
+        ("items.category_subcategory_name", lambda: items_collection.create_index([
+            ("category", ASCENDING), ("subcategory", ASCENDING),
+            ("name", ASCENDING)
+        ])),
+        ("media.key", lambda: media_collection.create_index(
+            [("key", ASCENDING)], unique=True)),
+        ("jobs.job_id", lambda: jobs_collection.create_index(
+            [("job_id", ASCENDING)], unique=True)),
+        ("leases.expires_at", generation_lease.ensure_index),
+        ("llm_cache.created_at", lambda: llm_cache.ensure_index(LLM_CACHE_TTL)),
+    ]
+    for name, create in indexes:
+        try:
+            create()
+        except Exception as e:
+            print(f"Error creating MongoDB index {name}: {str(e)}")
+
+
+# Index creation talks to MongoDB, so keep it off the import path
+threading.Thread(target=ensure_indexes, daemon=True).start()
+
+
+def item_upserts(data):
+    return [
+        UpdateOne({"name": item["name"]}, {"$set": item}, upsert=True)
+        for item in data.get("items", [])
+    ]
+
+
+def media_operations(data):
+    """Build media collection upserts for a result's media mappings"""
+    operations = []
+    for media_type, mapping_name in (("image", "images"), ("video", "videos")):
+        for key, oss_path in data.get(mapping_name, {}).items():
+            operations.append(UpdateOne(
+                {"key": key},
+                {"$set": {"type": media_type, "key": key, "oss_path": oss_path}},
                 upsert=True
-            )
+            ))
+    # Audio is keyed by phrase, which could clash with image/video keys
+    for phrase, oss_path in data.get("audio", {}).items():
+        key = f"audio-{phrase}"
+        operations.append(UpdateOne(
+            {"key": key},
+            {"$set": {"type": "audio", "key": key, "phrase": phrase,
+                      "oss_path": oss_path}},
+            upsert=True
+        ))
+    return operations
+
+
+@metrics.timed("mongo_save")
+def save_data_to_mongodb(data):
+    """Save categorized data and its media mappings to MongoDB"""
+    try:
+        item_operations = item_upserts(data)
+        if item_operations:
+            items_collection.bulk_write(item_operations, ordered=False)
+
+        operations = media_operations(data)
+        if operations:
+            media_collection.bulk_write(operations, ordered=False)
+
+        bump_data_version()
         return True
     except Exception as e:
         print(f"Error saving to MongoDB: {str(e)}")
         return False
 
 
+@metrics.timed("mongo_load_items")
 def load_data_from_mongodb():
     """Load categorized data from MongoDB"""
     try:
@@ -107,173 +432,424 @@ def load_data_from_mongodb():
 
 def upload_file_to_oss(local_path, oss_key):
     """Upload a file to OSS and return public URL"""
+    local_media.pin(local_path)
     try:
-        bucket.put_object_from_file(oss_key, local_path)
-        # Generate URL with appropriate expiration
-        url = bucket.sign_url('GET', oss_key, 60 * 60 * 24 * 7)  # 7-day link
-        return url
-    except ClientError as e:
-        print(f"Error uploading to OSS: {str(e)}")
-        return None
+        if not uploader.upload(local_path, oss_key):
+            return None
+    finally:
+        local_media.unpin(local_path)
+    # Generate URL with appropriate expiration
+    return bucket.sign_url('GET', oss_key, 60 * 60 * 24 * 7)  # 7-day link
 
 
-def generate_and_save_image(prompt, filename):
-    """Generate image using Wan2.1 T2I model and save to OSS"""
-    try:
-        # Create an enhanced prompt for better image quality
-        enhanced_prompt = f"A realistic, high-quality photograph of {prompt}. Professional lighting, detailed texture, photorealistic style. No text, no watermarks."
+def upload_file_to_oss_async(local_path, oss_key, callback=None):
+    """Queue an upload so generation can continue; returns a future"""
+    # Not evictable until the upload has finished
+    local_media.pin(local_path)
 
-        # Local temporary path
-        local_image_path = os.path.join(IMAGES_DIR, filename)
+    def done(oss_key, success):
+        local_media.unpin(local_path)
+        if callback:
+            callback(oss_key, success)
 
-        # Check if image already exists in OSS
-        oss_key = f"images/{filename}"
+    return uploader.submit(local_path, oss_key, done)
+
+
+@metrics.timed("media_lookup")
+def find_media(digest, oss_key):
+    """Return oss_key if the asset already exists, without a HEAD request"""
+    media_cache.ensure_reconciled(bucket)
+    return media_cache.lookup(digest, oss_key)
+
+
+def run_wan_generation(task, size, ckpt_dir, prompt, output, image=None,
+                       priority=Priority.BULK, key=None, digest=None):
+    """Run a Wan2.1 job through the GPU scheduler and return its output path
+
+    Calls sharing a key coalesce, so the path may be the output of an
+    identical request that was already queued or running.
+    """
+    return gpu_scheduler.run(
+        task, metrics.timed(task)(wan_generate_atomic),
+        task, size, ckpt_dir, prompt, output, image, digest,
+        priority=priority, key=key)
+
+
+def run_wan_generation_batch(task, size, ckpt_dir, jobs, priority=Priority.BULK):
+    """Run a batch of Wan2.1 prompts, returning output path -> success"""
+    return gpu_scheduler.run(
+        task, metrics.timed(f"{task}_batch")(wan_generate_batch_atomic),
+        task, size, ckpt_dir, jobs,
+        priority=priority)
+
+
+def wan_generate_atomic(task, size, ckpt_dir, prompt, output, image=None,
+                        digest=None):
+    """wan_generate into a temp file, renamed to output only once complete"""
+    temp_output = local_media.temp_path(output)
+    try:
+        wan_generate(task, size, ckpt_dir, prompt, temp_output, image)
+        if os.path.exists(temp_output):
+            local_media.commit(temp_output, output, digest)
+    finally:
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+    return output
+
+
+def wan_generate_batch_atomic(task, size, ckpt_dir, jobs):
+    """wan_generate_batch with each output committed to the local cache
+
+    Jobs may carry a "digest" to index the output under.
+    """
+    temp_outputs = {job["output"]: local_media.temp_path(job["output"])
+                    for job in jobs}
+    try:
+        results = wan_generate_batch(task, size, ckpt_dir, [
+            {"prompt": job["prompt"], "output": temp_outputs[job["output"]]}
+            for job in jobs
+        ])
+        outputs = {}
+        for job in jobs:
+            temp_output = temp_outputs[job["output"]]
+            success = bool(results.get(temp_output)) and os.path.exists(temp_output)
+            if success:
+                local_media.commit(temp_output, job["output"], job.get("digest"))
+            outputs[job["output"]] = success
+        return outputs
+    finally:
+        for temp_output in temp_outputs.values():
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+
+
+def wan_generate(task, size, ckpt_dir, prompt, output, image=None):
+    """Run a Wan2.1 job on the persistent worker, falling back to generate.py"""
+    if wan_worker:
         try:
-            bucket.get_object_meta(oss_key)
-            print(f"Image already exists in OSS for {prompt}")
-            return oss_key
-        except:
-            # Image doesn't exist, generate it
-            print(f"Generating image for: {prompt}")
-
-            # Run Wan2.1 T2I model
-            cmd = [
-                "python", "generate.py",
-                "--task", "t2i-1.3B",
-                "--size", "1024*1024",
-                "--ckpt_dir", WAN_T2I_MODEL_PATH,
-                "--prompt", enhanced_prompt,
-                "--output", local_image_path
-            ]
-
-            process = subprocess.run(
-                cmd,
+            wan_worker.generate(task, size, ckpt_dir, prompt, output, image)
+            return output
+        except ConnectionError as e:
+            print(f"{str(e)}, falling back to generate.py")
+
+    cmd = [
+        "python", WAN_GENERATE_SCRIPT,
+        "--task", task,
+        "--size", size,
+        "--ckpt_dir", ckpt_dir,
+    ]
+    if image:
+        cmd += ["--image", image]
+    cmd += [
+        "--prompt", prompt,
+        "--output", output
+    ]
+
+    subprocess.run(
+        cmd,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    return output
+
+
+def wan_generate_batch(task, size, ckpt_dir, jobs):
+    """Run a batch of Wan2.1 prompts on the worker or one by one via generate.py"""
+    if wan_worker:
+        try:
+            errors = wan_worker.generate_batch(task, size, ckpt_dir, jobs)
+            return {output: error is None for output, error in errors.items()}
+        except ConnectionError as e:
+            print(f"{str(e)}, falling back to generate.py")
+
+    # generate.py takes a single prompt, so run the batch one by one
+    results = {}
+    for job in jobs:
+        try:
+            subprocess.run(
+                [
+                    "python", WAN_GENERATE_SCRIPT,
+                    "--task", task,
+                    "--size", size,
+                    "--ckpt_dir", ckpt_dir,
+                    "--prompt", job["prompt"],
+                    "--output", job["output"]
+                ],
                 check=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE
             )
+            results[job["output"]] = True
+        except subprocess.CalledProcessError as e:
+            print(f"Error generating {job['output']}: {str(e)}")
+            results[job["output"]] = False
+    return results
+
+
+def enhance_image_prompt(prompt):
+    """Create an enhanced prompt for better image quality"""
+    return f"A realistic, high-quality photograph of {prompt}. Professional lighting, detailed texture, photorealistic style. No text, no watermarks."
+
+
+def image_digest(prompt):
+    return MediaCache.digest(
+        WAN_T2I_TASK, enhance_image_prompt(prompt), "1024*1024")
+
+
+def item_image_filename(item_name):
+    return f"item_{item_name.replace(' ', '_').lower()}.png"
 
-            if os.path.exists(local_image_path):
+
+def reference_prompt(item_name):
+    """Simpler T2I prompt used when an item has no image yet"""
+    return f"a clear view of {item_name}"
+
+
+def reference_digest(item_name):
+    return MediaCache.digest(
+        WAN_T2I_TASK, reference_prompt(item_name), "1280*720")
+
+
+def video_prompt(item_name, action):
+    """Create prompt with item context"""
+    return f"A person {action} with {item_name}, realistic, natural movement"
+
+
+def action_video_filename(video_key):
+    """OSS filename of the video for an "item-action" key"""
+    return f"{video_key.replace(' ', '_').replace('-', '_')}.mp4"
+
+
+def video_digest(item_name, action):
+    return MediaCache.digest(
+        WAN_I2V_TASK, video_prompt(item_name, action), "1280*720")
+
+
+@metrics.timed("image_batch")
+def generate_images_batch(image_requests, on_image=None):
+    """Generate every missing image for a list of (prompt, filename) pairs
+
+    Prompts are deduplicated by filename and sent to the T2I model in
+    batches of IMAGE_BATCH_SIZE. Returns a dict of filename -> OSS key for
+    every image that exists afterwards.
+    """
+    prompts = {}
+    for prompt, filename in image_requests:
+        prompts.setdefault(filename, prompt)
+
+    image_keys = {}
+    missing = []
+    local_images = {}
+    for filename, prompt in prompts.items():
+        # Check if image already exists in OSS
+        oss_key = find_media(image_digest(prompt), f"images/{filename}")
+        if oss_key:
+            print(f"Image already exists in OSS for {prompt}")
+            image_keys[filename] = oss_key
+            if on_image:
+                on_image(filename, oss_key)
+            continue
+        # Generated here before but never uploaded (e.g. a failed upload)
+        local_path = local_media.find(image_digest(prompt))
+        if local_path:
+            local_images[filename] = local_path
+        else:
+            missing.append(filename)
+
+    def uploaded(oss_key, success):
+        filename = oss_key.split("/", 1)[1]
+        if success:
+            media_cache.put(image_digest(prompts[filename]), oss_key)
+            print(f"Image generated and uploaded to OSS for {prompts[filename]}")
+            image_keys[filename] = oss_key
+        if on_image:
+            on_image(filename, oss_key if success else None)
+
+    # Uploads run in the background while the next batch generates
+    uploads = [
+        upload_file_to_oss_async(local_path, f"images/{filename}", uploaded)
+        for filename, local_path in local_images.items()
+    ]
+    for start in range(0, len(missing), IMAGE_BATCH_SIZE):
+        batch = missing[start:start + IMAGE_BATCH_SIZE]
+        print(f"Generating images for: {', '.join(prompts[f] for f in batch)}")
+
+        try:
+            results = run_wan_generation_batch(
+                WAN_T2I_TASK, "1024*1024", WAN_T2I_MODEL_PATH,
+                [
+                    {
+                        "prompt": enhance_image_prompt(prompts[filename]),
+                        "output": os.path.join(IMAGES_DIR, filename),
+                        "digest": image_digest(prompts[filename])
+                    }
+                    for filename in batch
+                ]
+            )
+        except Exception as e:
+            print(f"Error generating image batch: {str(e)}")
+            results = {}
+
+        for filename in batch:
+            local_image_path = os.path.join(IMAGES_DIR, filename)
+            if results.get(local_image_path) and os.path.exists(local_image_path):
                 # Upload to OSS
-                upload_file_to_oss(local_image_path, oss_key)
-                print(f"Image generated and uploaded to OSS for {prompt}")
-                return oss_key
+                uploads.append(upload_file_to_oss_async(
+                    local_image_path, f"images/{filename}", uploaded))
             else:
-                print(f"Failed to generate image for {prompt}")
-                return None
+                print(f"Failed to generate image for {prompts[filename]}")
+                if on_image:
+                    on_image(filename, None)
 
-    except Exception as e:
-        print(f"Error generating image for {prompt}: {str(e)}")
-        return None
+    uploader.wait(uploads)
+    return image_keys
+
+
+@metrics.timed("image")
+def generate_and_save_image(prompt, filename):
+    """Generate image using Wan2.1 T2I model and save to OSS"""
+    return generate_images_batch([(prompt, filename)]).get(filename)
 
 
+@metrics.timed("tts")
 def generate_tts_audio(text, voice="Olivia", filename=None):
     """Generate speech audio from text using Alibaba Intelligent Speech Interaction"""
-    try:
-        if not filename:
-            # Generate a unique filename based on text
-            filename = f"speech_{text.replace(' ', '_')[:30].lower()}_{int(time.time())}.mp3"
-
-        # Local audio path
-        local_audio_path = os.path.join(TEMP_DIR, 'audio', filename)
-        os.makedirs(os.path.join(TEMP_DIR, 'audio'), exist_ok=True)
-
-        # Create TTS request
-        request = CreateTtsTaskRequest.CreateTtsTaskRequest()
-        request.set_accept_format('json')
-        request.set_Text(text)
-        request.set_Voice(voice)  # Voice options like Olivia, William, etc.
-        request.set_Format("mp3")
-        request.set_SampleRate(16000)
-
-        # Execute request
-        response = speech_client.do_action_with_exception(request)
-        response_json = json.loads(response)
-
-        if 'TaskId' in response_json:
-            task_id = response_json['TaskId']
-
-            # Wait for task completion and download the audio file
-            status = "RUNNING"
-            while status == "RUNNING":
-                time.sleep(1)
-                status_request = GetTtsTaskRequest.GetTtsTaskRequest()
-                status_request.set_TaskId(task_id)
-                status_response = speech_client.do_action_with_exception(
-                    status_request)
-                status_response_json = json.loads(status_response)
-                status = status_response_json.get('StatusText', 'RUNNING')
-
-            if status == "SUCCESS" and 'TtsUrl' in status_response_json:
-                # Download the audio file
-                urllib.request.urlretrieve(
-                    status_response_json['TtsUrl'], local_audio_path)
+    media_cache.ensure_reconciled(bucket)
+    # Cache hits skip the lease entirely
+    cached = tts_pipeline.cached(text, voice, filename)
+    if cached:
+        return cached
+    oss_key = f"audio/{filename or speech_filename(text, voice)}"
+    return single_flight.do(
+        oss_key, tts_pipeline.synthesize, text, voice, filename,
+        check=lambda: uploaded_by_other_worker(
+            speech_cache_key(text, voice), oss_key))
+
+
+@metrics.timed("oss_head")
+def uploaded_by_other_worker(digest, oss_key):
+    """Return oss_key once another worker's upload of it is visible in OSS"""
+    from oss2.exceptions import OssError
 
-                # Upload to OSS
-                oss_key = f"audio/{filename}"
-                upload_file_to_oss(local_audio_path, oss_key)
-                return oss_key
-            else:
-                print(f"TTS task failed with status: {status}")
-                return None
-        else:
-            print("Failed to create TTS task")
+    try:
+        if not bucket.object_exists(oss_key):
             return None
-    except Exception as e:
-        print(f"Error generating audio: {str(e)}")
+    except OssError as e:
+        print(f"Error checking {oss_key} in OSS: {str(e)}")
         return None
+    media_cache.add_key(oss_key)
+    media_cache.put(digest, oss_key)
+    return oss_key
 
 
-def generate_video(item_name, action, video_filename):
-    """Generate video using Wan2.1 I2V model and save to OSS"""
+@metrics.timed("oss_download")
+def download_from_oss(oss_key, local_path, digest=None):
+    """Fetch an OSS object to local_path; returns True on success"""
+    from oss2.exceptions import OssError
+
+    temp_path = local_media.temp_path(local_path)
     try:
-        # First generate a reference image for the item
-        reference_image = os.path.join(
-            IMAGES_DIR, f"{item_name.replace(' ', '_')}_ref.jpg")
+        bucket.get_object_to_file(oss_key, temp_path)
+        local_media.commit(temp_path, local_path, digest)
+        return True
+    except OssError as e:
+        print(f"Error downloading {oss_key} from OSS: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+# One lock per item so concurrent videos of the same item share one
+# reference image
+reference_locks = {}
+reference_locks_guard = threading.Lock()
+
+
+def resolve_reference_image(item_name, priority=Priority.BULK):
+    """Return a local reference image for I2V, generating one only as a last resort
+
+    Tries, in order: the item's generated image on disk, a previously made
+    reference on disk, either of those in OSS, and finally a T2I run.
+    """
+    item_image = os.path.join(IMAGES_DIR, item_image_filename(item_name))
+    reference_name = f"{item_name.replace(' ', '_')}_ref.jpg"
+    reference_image = os.path.join(IMAGES_DIR, reference_name)
 
-        # Generate reference image if it doesn't exist
+    with reference_locks_guard:
+        lock = reference_locks.setdefault(item_name, threading.Lock())
+
+    with lock:
+        for local_path in (item_image, reference_image):
+            if local_media.get(local_path):
+                return local_path
+
+        candidates = [
+            (image_digest(item_name),
+             f"images/{item_image_filename(item_name)}", item_image),
+            (reference_digest(item_name),
+             f"images/{reference_name}", reference_image),
+        ]
+        for digest, oss_key, local_path in candidates:
+            if find_media(digest, oss_key) and download_from_oss(
+                    oss_key, local_path, digest):
+                print(f"Reusing reference image {oss_key} for {item_name}")
+                return local_path
+
+        # Use simpler T2I prompt to generate reference image
+        print(f"Generating reference image for {item_name}")
+        digest = reference_digest(item_name)
+        run_wan_generation(
+            WAN_T2I_TASK, "1280*720", WAN_T2I_MODEL_PATH,
+            reference_prompt(item_name), reference_image, priority=priority,
+            digest=digest)
         if not os.path.exists(reference_image):
-            # Use simpler T2I command to generate reference image
-            ref_cmd = [
-                "python", "generate.py",
-                "--task", "t2i-1.3B",
-                "--size", "1280*720",
-                "--ckpt_dir", WAN_T2I_MODEL_PATH,
-                "--prompt", f"a clear view of {item_name}",
-                "--output", reference_image
-            ]
-            subprocess.run(ref_cmd, check=True)
+            return None
+
+        # Keep it in OSS so other workers and redeploys can reuse it
+        upload_file_to_oss_async(
+            reference_image, f"images/{reference_name}",
+            lambda oss_key, success: success and media_cache.put(digest, oss_key))
+        return reference_image
+
+
+def render_video(item_name, action, video_filename, priority=Priority.BULK):
+    """Generate video using Wan2.1 I2V model; returns the local path"""
+    try:
+        # A local render that never made it to OSS needs no GPU time
+        local_video_path = local_media.find(video_digest(item_name, action))
+        if local_video_path:
+            make_renditions(local_video_path, video_digest(item_name, action))
+            return local_video_path
+
+        # Reuse the item's image as the I2V reference where possible
+        reference_image = resolve_reference_image(item_name, priority)
+        if not reference_image:
+            print(f"No reference image for {item_name}")
+            return None
 
         # Local video path
         local_video_path = os.path.join(VIDEOS_DIR, video_filename)
 
         # Create prompt with item context
-        prompt = f"A person {action} with {item_name}, realistic, natural movement"
-
-        # Run Wan2.1 I2V model
-        cmd = [
-            "python", "generate.py",
-            "--task", "i2v-1.3B",
-            "--size", "1280*720",
-            "--ckpt_dir", WAN_I2V_MODEL_PATH,
-            "--image", reference_image,
-            "--prompt", prompt,
-            "--output", local_video_path
-        ]
+        prompt = video_prompt(item_name, action)
 
-        process = subprocess.run(
-            cmd,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        # Run Wan2.1 I2V model; a request for the same item and action that
+        # is already queued or rendering is shared rather than repeated
+        local_media.pin(reference_image)
+        try:
+            local_video_path = run_wan_generation(
+                WAN_I2V_TASK, "1280*720", WAN_I2V_MODEL_PATH,
+                prompt, local_video_path, image=reference_image,
+                priority=priority, key=(WAN_I2V_TASK, item_name, action),
+                digest=video_digest(item_name, action))
+        finally:
+            local_media.unpin(reference_image)
 
         # Check if video was created successfully
         if os.path.exists(local_video_path):
-            # Upload to OSS
-            oss_key = f"videos/{video_filename}"
-            upload_file_to_oss(local_video_path, oss_key)
-            return oss_key
+            make_renditions(local_video_path, video_digest(item_name, action))
+            return local_video_path
         else:
             return None
 
@@ -282,6 +858,468 @@ def generate_video(item_name, action, video_filename):
         return None
 
 
+@metrics.timed("transcode")
+def make_renditions(local_video_path, digest=None):
+    """Cut the fast-start, low-bitrate and poster renditions of a video
+
+    The fast-start file replaces the original in place. Does nothing if
+    the renditions already exist locally or ffmpeg is unavailable.
+    """
+    if not VIDEO_RENDITIONS:
+        return
+    if all(local_media.get(rendition_path(local_video_path, name))
+           for name in EXTRA_RENDITIONS):
+        return
+
+    outputs = {name: local_media.temp_path(rendition_path(local_video_path, name))
+               for name in ("full",) + EXTRA_RENDITIONS}
+    local_media.pin(local_video_path)
+    try:
+        if transcode(local_video_path, outputs, ffmpeg=FFMPEG_BINARY):
+            for name, temp_path in outputs.items():
+                if os.path.exists(temp_path):
+                    local_media.commit(
+                        temp_path, rendition_path(local_video_path, name),
+                        digest if name == "full" else None)
+    finally:
+        local_media.unpin(local_video_path)
+        for temp_path in outputs.values():
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def upload_renditions_async(local_video_path, video_oss_key):
+    """Queue uploads of a video's local renditions; returns their futures
+
+    Each uploaded rendition is recorded on the video's "renditions" media
+    document, keyed by the video's OSS key.
+    """
+    def uploaded(name, oss_key, success):
+        if not success:
+            return
+        try:
+            media_collection.update_one(
+                {"key": f"renditions-{video_oss_key}"},
+                {"$set": {"type": "renditions",
+                          "key": f"renditions-{video_oss_key}",
+                          "video": video_oss_key, name: oss_key}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error registering {name} rendition of {video_oss_key}: {str(e)}")
+
+    uploads = []
+    for name in EXTRA_RENDITIONS:
+        local_path = local_media.get(rendition_path(local_video_path, name))
+        if local_path:
+            uploads.append(upload_file_to_oss_async(
+                local_path, rendition_path(video_oss_key, name),
+                partial(uploaded, name)))
+    return uploads
+
+
+def video_url(filename, quality=None, headers=None):
+    """Signed URLs for /api/videos/<file>: the chosen rendition and poster
+
+    Falls back to the original when the low rendition was never made.
+    """
+    oss_key = f"videos/{filename}"
+    rendition = choose_rendition(quality, headers or {})
+    if rendition != "full" and not media_cache.has_key(
+            rendition_path(oss_key, rendition)):
+        rendition = "full"
+
+    poster_key = rendition_path(oss_key, "poster")
+    return {
+        "url": signed_urls.get(rendition_path(oss_key, rendition)),
+        "rendition": rendition,
+        "poster": (signed_urls.get(poster_key)
+                   if media_cache.has_key(poster_key) else None),
+    }
+
+
+@metrics.timed("video")
+def generate_video(item_name, action, video_filename, priority=Priority.BULK):
+    """Generate video using Wan2.1 I2V model and save to OSS
+
+    Concurrent requests for the same video, in this or another worker,
+    share a single generation.
+    """
+    oss_key = f"videos/{video_filename}"
+    digest = video_digest(item_name, action)
+
+    # Cache hits skip the lease entirely
+    existing = find_media(digest, oss_key)
+    if existing:
+        return existing
+
+    def produce():
+        # Another worker may have finished it while we waited for the lease
+        existing = find_media(digest, oss_key)
+        if existing:
+            return existing
+
+        local_video_path = render_video(
+            item_name, action, video_filename, priority)
+        if not local_video_path:
+            return None
+
+        # Upload to OSS
+        if not upload_file_to_oss(local_video_path, oss_key):
+            return None
+        media_cache.put(digest, oss_key)
+        upload_renditions_async(local_video_path, oss_key)
+        return oss_key
+
+    return single_flight.do(
+        oss_key, produce, check=lambda: uploaded_by_other_worker(digest, oss_key))
+
+
+CATEGORIZE_SYSTEM_PROMPT = 'Generate a JSON structure that categorizes the following items into appropriate categories and subcategories. Each item should also include up to 4 common requests or assistance needs that an aphasia patient might want to communicate to caregivers regarding this item. Each item should be organized in this format:\n{\n  "items": [\n    {\n      "name": "item name",\n      "category": "main category",\n      "subcategory": "specific subcategory",\n      "requests": ["request 1", "request 2", "request 3", "request 4"]\n    },\n    ...\n  ]\n}\n\nFor example, if the item is "water", the entry would be:\n{\n  "name": "water",\n  "category": "food and drinks",\n  "subcategory": "beverages",\n  "requests": ["need refill", "make warmer", "add ice", "help drinking"]\n}\n\nProcess the following items and strictly output in JSON format only without any explanation:'
+
+
+def categorization_messages(items):
+    return [
+        {'role': 'system', 'content': CATEGORIZE_SYSTEM_PROMPT},
+        {'role': 'user', 'content': items}
+    ]
+
+
+@metrics.timed("qwen_categorize")
+def categorize_with_qwen(items):
+    """Categorize a raw item list with Qwen and return the parsed JSON"""
+    return llm.complete_json("qwen-max", categorization_messages(items))
+
+
+def normalize_item_name(name):
+    return " ".join(name.lower().split())
+
+
+def tokenize_items(raw_items):
+    """Split a raw item list into unique names, preserving order"""
+    names = {}
+    for token in re.split(r"[,;\n]+", raw_items):
+        name = token.strip()
+        if name:
+            names.setdefault(normalize_item_name(name), name)
+    return names
+
+
+def lookup_cached_categorizations(normalized_names):
+    """Return normalized name -> item for previously categorized names"""
+    found, missing = recall_categorizations(normalized_names)
+    if missing:
+        for doc in categorization_cache_collection.find({"_id": {"$in": missing}}):
+            found[doc["_id"]] = doc["item"]
+            remember_categorization(doc["_id"], doc["item"], persist=False)
+    return found
+
+
+def recall_categorizations(normalized_names):
+    """Split names into (in-memory hits, names to look up in MongoDB)"""
+    found = {}
+    missing = []
+    with categorization_cache_lock:
+        for name in normalized_names:
+            if name in categorization_cache:
+                categorization_cache.move_to_end(name)
+                found[name] = categorization_cache[name]
+            else:
+                missing.append(name)
+    return found, missing
+
+
+def remember_categorization(normalized_name, item, persist=True):
+    with categorization_cache_lock:
+        categorization_cache[normalized_name] = item
+        categorization_cache.move_to_end(normalized_name)
+        while len(categorization_cache) > CATEGORIZATION_CACHE_SIZE:
+            categorization_cache.popitem(last=False)
+
+    if persist:
+        categorization_cache_collection.update_one(
+            {"_id": normalized_name},
+            {"$set": {"item": item}},
+            upsert=True
+        )
+
+
+def known_items_query(names):
+    return {"name": {"$in": list(set(names) | set(names.values()))}}
+
+
+def categorize_incrementally(raw_items):
+    """Categorize only item names that are not already known
+
+    Returns (items, new_items): every submitted item, and the subset that
+    has to be written to the items collection.
+    """
+    names = tokenize_items(raw_items)
+
+    # Known items come from one indexed $in query instead of a full scan
+    known = {}
+    with metrics.timer("mongo_known_items"):
+        for item in items_collection.find(known_items_query(names), {"_id": 0}):
+            known[normalize_item_name(item["name"])] = item
+
+    unknown = [name for name in names if name not in known]
+    cached = lookup_cached_categorizations(unknown)
+    to_categorize = [name for name in unknown if name not in cached]
+
+    categorized = dict(cached)
+    if to_categorize:
+        print(f"Categorizing with Qwen: {', '.join(to_categorize)}")
+        parsed_items = categorize_with_qwen(
+            ", ".join(names[name] for name in to_categorize))["items"]
+
+        matched = match_categorizations(to_categorize, parsed_items)
+        for name in to_categorize:
+            if name in matched:
+                remember_categorization(name, matched[name])
+        categorized.update(matched)
+
+    return split_new_items(known, categorized)
+
+
+def match_categorizations(to_categorize, parsed_items):
+    """Map submitted names to Qwen's items, keyed by normalized name"""
+    # Match results back to the submitted names; fall back to order when
+    # Qwen rewrote the names and the counts line up
+    categorized = {}
+    by_name = {normalize_item_name(item["name"]): item for item in parsed_items}
+    for index, name in enumerate(to_categorize):
+        item = by_name.get(name)
+        if item is None and len(parsed_items) == len(to_categorize):
+            item = parsed_items[index]
+        if item is not None:
+            categorized[name] = item
+
+    # Keep anything Qwen returned that could not be matched to a name
+    matched = {id(item) for item in categorized.values()}
+    for item in parsed_items:
+        if id(item) not in matched:
+            categorized[normalize_item_name(item["name"])] = item
+    return categorized
+
+
+def split_new_items(known, categorized):
+    """Return (items, new_items) from known and freshly categorized items"""
+    items = list(known.values())
+    new_items = []
+    for item in categorized.values():
+        if normalize_item_name(item["name"]) not in known:
+            new_items.append(item)
+    items += new_items
+    return items, new_items
+
+
+def collect_categories(parsed_items):
+    """Return the unique categories and (category, subcategory) pairs"""
+    categories = set()
+    subcategories = set()
+    for item in parsed_items:
+        categories.add(item["category"])
+        subcategories.add((item["category"], item["subcategory"]))
+    return categories, subcategories
+
+
+def collect_image_requests(parsed_items, categories, subcategories):
+    """Return (mapping key, prompt, filename) for every image of a run"""
+    image_requests = []
+    for item in parsed_items:
+        item_name = item["name"]
+        image_requests.append((
+            f"item-{item_name}",
+            item_name,
+            item_image_filename(item_name)
+        ))
+    for category in categories:
+        image_requests.append((
+            f"category-{category}",
+            category,
+            f"category_{category.replace(' ', '_').lower()}.png"
+        ))
+    for category, subcategory in subcategories:
+        image_requests.append((
+            f"subcategory-{category}-{subcategory}",
+            f"{subcategory} in {category}",
+            f"subcategory_{category.replace(' ', '_').lower()}_{subcategory.replace(' ', '_').lower()}.png"
+        ))
+    return image_requests
+
+
+def generate_media_for_items(job, parsed_items):
+    """Generate images, videos and audio for categorized items"""
+    categories, subcategories = collect_categories(parsed_items)
+    image_requests = collect_image_requests(
+        parsed_items, categories, subcategories)
+
+    # One image per unique filename, audio for every unique phrase, plus one
+    # video per item request
+    job.set_total(
+        len({filename for _, _, filename in image_requests})
+        + len(set(categories) | {subcategory for _, subcategory in subcategories}
+              | {item["name"] for item in parsed_items})
+        + sum(len(item.get("requests", [])) for item in parsed_items)
+    )
+
+    # Track OSS paths for images, videos and audio
+    image_mapping = {}
+    video_mapping = {}
+    audio_mapping = {}
+
+    def record(mapping, mapping_name, key, oss_key):
+        # Saved as each asset lands, so a later failure in the job cannot
+        # leave uploaded objects without a mapping
+        mapping[key] = oss_key
+        save_data_to_mongodb({mapping_name: {key: oss_key}})
+
+    # Every finished asset advances progress and is streamed to subscribers
+    mapping_keys = {}
+    for mapping_key, _, filename in image_requests:
+        mapping_keys.setdefault(filename, []).append(mapping_key)
+
+    def image_done(filename, oss_key):
+        for mapping_key in mapping_keys[filename]:
+            if oss_key:
+                record(image_mapping, "images", mapping_key, oss_key)
+            job.emit("image", {"key": mapping_key, "oss_key": oss_key})
+        job.advance()
+
+    def video_done(video_key, oss_key):
+        if oss_key:
+            record(video_mapping, "videos", video_key, oss_key)
+        job.emit("video", {"key": video_key, "oss_key": oss_key})
+        job.advance()
+
+    def audio_done(phrase, oss_key):
+        if oss_key:
+            record(audio_mapping, "audio", phrase, oss_key)
+        job.emit("audio", {"key": phrase, "oss_key": oss_key})
+        job.advance()
+
+    # Generate every item, category and subcategory image in batches
+    generate_images_batch(
+        [(prompt, filename) for _, prompt, filename in image_requests],
+        on_image=image_done
+    )
+
+    def generate(done, key, fn, *args):
+        try:
+            oss_key = fn(*args)
+        except Exception as e:
+            print(f"Error generating media for {key}: {str(e)}")
+            oss_key = None
+        done(key, oss_key)
+
+    # Videos and audio go through the same single-flight path as the
+    # single-item endpoints, so an interactive request or another worker
+    # never produces the same asset at the same time
+    futures = []
+
+    # Process categories, subcategories, and items for TTS; speech is quick
+    # and goes first so it never waits behind GPU renders
+    phrases = list(categories) + [
+        subcategory for _, subcategory in subcategories
+    ] + [item["name"] for item in parsed_items]
+    for phrase in dict.fromkeys(phrases):
+        futures.append(media_job_executor.submit(
+            generate, audio_done, phrase, generate_tts_audio, phrase))
+
+    for item in parsed_items:
+        item_name = item["name"]
+
+        # Process requests for videos
+        for action in item.get("requests", []):
+            # Generate a unique key for this video
+            video_key = f"{item_name}-{action}"
+            futures.append(media_job_executor.submit(
+                generate, video_done, video_key, generate_video,
+                item_name, action, action_video_filename(video_key)))
+
+    wait(futures)
+    return image_mapping, video_mapping, audio_mapping
+
+
+def run_categorization_media_job(job, parsed_items):
+    """Background job: generate all media for a categorization run"""
+    image_mapping, video_mapping, audio_mapping = generate_media_for_items(
+        job, parsed_items)
+
+    # Items were stored when the job was queued and each media mapping as
+    # its asset finished
+    return {
+        "items": parsed_items,
+        "videos": video_mapping,
+        "images": image_mapping,
+        "audio": audio_mapping
+    }
+
+
+def start_categorization(items):
+    """Categorize items and queue their media job"""
+    # Call Qwen only for items that are not known yet
+    categorized_items, new_items = categorize_incrementally(items)
+
+    # Store the items right away so they show up before media is ready
+    if new_items:
+        save_data_to_mongodb({"items": new_items})
+
+    return queue_media_job(categorized_items), categorized_items
+
+
+def queue_media_job(categorized_items):
+    """Hand media generation to the background workers"""
+    return job_queue.submit(
+        "categorize-items", run_categorization_media_job,
+        categorized_items,
+        payload={"items": [item["name"] for item in categorized_items]}
+    )
+
+
+def format_sse(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def stream_job_events(job, after=0, max_seconds=None):
+    """Yield a job's events as SSE messages until it finishes
+
+    With max_seconds the stream also ends once that much time has passed;
+    event ids let the client resume from where it stopped.
+    """
+    deadline = time.time() + max_seconds if max_seconds else None
+    while True:
+        timeout = SSE_KEEPALIVE_INTERVAL
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+            if timeout <= 0:
+                return
+        events = job.wait_for_events(after, timeout=timeout)
+        if not events:
+            if job.is_finished() or (deadline is not None and time.time() >= deadline):
+                return
+            # Comment line keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            yield format_sse(event["event"], event["data"], event["id"])
+            if event["event"] in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                return
+        after = events[-1]["id"]
+
+
+def sse_response(stream):
+    return Response(
+        stream_with_context(stream),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route('/api/categorize-items', methods=['POST'])
 def categorize_items():
     try:
@@ -292,207 +1330,414 @@ def categorize_items():
         if not items:
             return jsonify({"error": "No items provided"}), 400
 
-        # Call Qwen for categorization
-        completion = qwen_client.chat.completions.create(
-            model="qwen-max",
-            messages=[
-                {'role': 'system',
-                 'content': 'Generate a JSON structure that categorizes the following items into appropriate categories and subcategories. Each item should also include up to 4 common requests or assistance needs that an aphasia patient might want to communicate to caregivers regarding this item. Each item should be organized in this format:\n{\n  "items": [\n    {\n      "name": "item name",\n      "category": "main category",\n      "subcategory": "specific subcategory",\n      "requests": ["request 1", "request 2", "request 3", "request 4"]\n    },\n    ...\n  ]\n}\n\nFor example, if the item is "water", the entry would be:\n{\n  "name": "water",\n  "category": "food and drinks",\n  "subcategory": "beverages",\n  "requests": ["need refill", "make warmer", "add ice", "help drinking"]\n}\n\nProcess the following items and strictly output in JSON format only without any explanation:'},
-                {'role': 'user', 'content': items}
-            ],
-            temperature=0
-        )
+        job, categorized_items = start_categorization(items)
 
-        response = completion.choices[0].message.content
-
-        # Strip the triple backticks and 'json' identifier if present
-        if response.startswith("```json"):
-            response = response.lstrip("```json").rstrip("```").strip()
-
-        elif response.startswith("```"):
-            response = response.lstrip("```").rstrip("```").strip()
-
-        # Validate it's proper JSON
-        parsed = json.loads(response)
-
-        # Load existing data from MongoDB
-        existing_data = load_data_from_mongodb()
-        existing_items = {
-            item["name"]: item for item in existing_data.get("items", [])}
-
-        # Track OSS paths for images and videos
-        image_mapping = {}
-        video_mapping = {}
-
-        # Track unique categories and subcategories for image generation
-        categories = set()
-        subcategories = set()
-
-        # Process new items
-        for item in parsed["items"]:
-            item_name = item["name"]
-
-            # Add to category/subcategory sets
-            categories.add(item["category"])
-            subcategories.add(f"{item['category']}-{item['subcategory']}")
-
-            # Check if this item already exists
-            if item_name in existing_items:
-                # Use existing item data but update with new data
-                existing_item = existing_items[item_name]
-
-                # Keep the existing item's data but update with new fields
-                for key, value in item.items():
-                    existing_item[key] = value
-
-                # Use this updated item
-                item = existing_item
-
-            # Generate image for the item
-            item_image_filename = f"item_{item_name.replace(' ', '_').lower()}.png"
-            item_image_key = generate_and_save_image(
-                item_name, item_image_filename)
-            if item_image_key:
-                image_mapping[f"item-{item_name}"] = item_image_key
-
-            # Process requests for videos
-            if "requests" in item:
-                for action in item["requests"]:
-                    # Generate a unique key for this video
-                    video_key = f"{item_name}-{action}"
-                    video_filename = f"{video_key.replace(' ', '_').replace('-', '_')}.mp4"
-
-                    # Check if video exists in OSS
-                    oss_video_key = f"videos/{video_filename}"
-                    try:
-                        bucket.get_object_meta(oss_video_key)
-                        print(
-                            f"Video already exists in OSS for {item_name} - {action}")
-                        video_mapping[video_key] = oss_video_key
-                        continue
-                    except:
-                        # Video doesn't exist, generate it
-                        print(
-                            f"Generating video for: {item_name} - {action}")
-
-                        # Generate the video
-                        video_oss_key = generate_video(
-                            item_name, action, video_filename)
-
-                        if video_oss_key:
-                            video_mapping[video_key] = video_oss_key
-                            print(
-                                f"Video generated and uploaded for {item_name} - {action}")
-                        else:
-                            print(
-                                f"Failed to generate video for {item_name} - {action}")
-
-        # Generate images for categories
-        for category in categories:
-            category_image_filename = f"category_{category.replace(' ', '_').lower()}.png"
-            category_image_key = generate_and_save_image(
-                category, category_image_filename)
-            if category_image_key:
-                image_mapping[f"category-{category}"] = category_image_key
-
-        # Generate images for subcategories
-        for subcategory_full in subcategories:
-            parts = subcategory_full.split('-', 1)
-            if len(parts) == 2:
-                category, subcategory = parts
-                subcategory_image_filename = f"subcategory_{category.replace(' ', '_').lower()}_{subcategory.replace(' ', '_').lower()}.png"
-                subcategory_image_key = generate_and_save_image(
-                    f"{subcategory} in {category}", subcategory_image_filename)
-                if subcategory_image_key:
-                    image_mapping[f"subcategory-{category}-{subcategory}"] = subcategory_image_key
-
-        # Combine existing and new items
-        combined_items = list(existing_items.values())
-
-        # Add any new items that weren't in existing data
-        for item in parsed["items"]:
-            if item["name"] not in existing_items:
-                combined_items.append(item)
-
-        # Create the final response
-        final_data = {
-            "items": combined_items,
-            "videos": video_mapping,
-            "images": image_mapping
-        }
-
-        # Process categories, subcategories, and items for TTS
-        audio_mapping = {}
-
-        # Generate audio for categories
-        for category in categories:
-            audio_key = generate_tts_audio(category)
-            if audio_key:
-                audio_mapping[category] = audio_key
-
-        # Generate audio for subcategories
-        for subcategory_full in subcategories:
-            parts = subcategory_full.split('-', 1)
-            if len(parts) == 2:
-                _, subcategory = parts
-                audio_key = generate_tts_audio(subcategory)
-                if audio_key:
-                    audio_mapping[subcategory] = audio_key
-
-        # Generate audio for items
-        for item in parsed["items"]:
-            audio_key = generate_tts_audio(item["name"])
-            if audio_key:
-                audio_mapping[item["name"]] = audio_key
-
-        # Add audio to final response
-        final_data["audio"] = audio_mapping
-
-        # Save the updated data to MongoDB
-        save_data_to_mongodb(final_data)
-
-        return jsonify(final_data)
+        return jsonify({
+            "job_id": job.id,
+            "status": job.status,
+            "items": categorized_items
+        }), 202
 
+    except LlmUnavailable as e:
+        # Provider throttling; the client can retry later
+        print(f"Error during categorization: {str(e)}")
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"Error during categorization: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/categorize-items/stream', methods=['POST'])
+def categorize_items_stream():
+    """Categorize items and stream media progress as Server-Sent Events
+
+    Emits `categorized` once the items are known, then one `image`, `video`
+    or `audio` event per asset, and finally `completed` or `failed`. Long
+    jobs outlast SSE_MAX_STREAM_SECONDS; the client then follows the rest
+    on /api/jobs/<id>/events.
+    """
+    data = request.json or {}
+    items = data.get('items', '')
+
+    if not items:
+        return jsonify({"error": "No items provided"}), 400
+
+    def stream():
+        try:
+            job, categorized_items = start_categorization(items)
+        except Exception as e:
+            print(f"Error during categorization: {str(e)}")
+            yield format_sse(TaskStatus.FAILED, {"error": str(e)})
+            return
+
+        yield format_sse("categorized", {
+            "job_id": job.id,
+            "items": categorized_items
+        })
+        yield from stream_job_events(job, max_seconds=SSE_MAX_STREAM_SECONDS)
+
+    return sse_response(stream())
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Stream a running job's events; clients fall back to polling on 404"""
+    job = find_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    after = request.headers.get('Last-Event-ID', '0')
+    return sse_response(stream_job_events(
+        job, after=int(after) if after.isdigit() else 0,
+        max_seconds=SSE_MAX_STREAM_SECONDS))
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return status and progress of a background job"""
+    try:
+        job = find_job(job_id)
+        if job:
+            return jsonify(job.to_dict())
+
+        # The job may be running in another worker process
+        stored_job = jobs_collection.find_one({"job_id": job_id}, {"_id": 0})
+        if stored_job:
+            return jsonify(stored_job)
+
+        return jsonify({"error": "Job not found"}), 404
+    except Exception as e:
+        print(f"Error retrieving job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+MEDIA_FOLDERS = {"video": "videos", "image": "images", "audio": "audio"}
+
+# Signed URLs in ?resolve=1 responses are re-issued every window
+STORED_DATA_URL_WINDOW = 30 * 60
+
+
+def media_oss_key(media_type, oss_path):
+    """Normalize a stored media path to its full OSS key"""
+    return f"{MEDIA_FOLDERS[media_type]}/{oss_path.split('/')[-1]}"
+
+
+@metrics.timed("stored_data_build")
+def build_stored_data():
+    """Load items and media mappings from MongoDB"""
+    data = load_data_from_mongodb()
+    data.update(media_mappings(media_collection.find({}, {"_id": 0})))
+    return data
+
+
+def media_mappings(media_files):
+    """Group media documents into video, image and audio mappings"""
+    video_mapping = {}
+    image_mapping = {}
+    audio_mapping = {}
+
+    # Populate with OSS URLs
+    for media in media_files:
+        if media["type"] == "video":
+            video_mapping[media["key"]] = media["oss_path"]
+        elif media["type"] == "image":
+            image_mapping[media["key"]] = media["oss_path"]
+        elif media["type"] == "audio":
+            audio_mapping[media["phrase"]] = media["oss_path"]
+
+    return {"videos": video_mapping, "images": image_mapping,
+            "audio": audio_mapping}
+
+
+def stored_data_etag(version, resolve):
+    """Return (etag, URL window) for a stored-data response"""
+    if resolve:
+        window = int(time.time() // STORED_DATA_URL_WINDOW)
+        return f"v{version}-r{window}", window
+    return f"v{version}", None
+
+
+def cached_stored_data(version, window):
+    """Return (payload, base payload) cached for this version, or None"""
+    with data_version_lock:
+        return (stored_data_cache.get((version, window)),
+                stored_data_cache.get((version, None)))
+
+
+def cache_stored_data(version, window, base, data):
+    with data_version_lock:
+        # Keep only payloads for the current version and window
+        for key in list(stored_data_cache):
+            if key[0] != version or key[1] not in (None, window):
+                del stored_data_cache[key]
+        stored_data_cache[(version, None)] = base
+        stored_data_cache[(version, window)] = data
+
+
+def resolve_media_urls(data):
+    """Return a copy of data with signed URLs for every media path inline"""
+    keys = [media_oss_key("video", path) for path in data["videos"].values()]
+    keys += [media_oss_key("image", path) for path in data["images"].values()]
+    keys += [media_oss_key("audio", path) for path in data["audio"].values()]
+    return dict(data, **sign_stored_keys(keys))
+
+
+def sign_stored_keys(keys):
+    """Return {"urls", "expires"} for OSS keys in an ETagged response"""
+    # URLs must outlive the ETag window so a 304 never revives a dead link
+    signed = signed_urls.get_many(
+        dict.fromkeys(keys),
+        min_validity=STORED_DATA_URL_WINDOW + signed_urls.refresh_margin
+    )
+    return {
+        "urls": {key: url for key, (url, _) in signed.items()},
+        "expires": {key: int(expires_at) for key, (_, expires_at) in signed.items()},
+    }
+
+
 @app.route('/api/stored-data', methods=['GET'])
 def get_stored_data():
-    """Return all stored data"""
+    """Return all stored data
+
+    ?resolve=1 adds signed URLs for every media path. Responses carry a
+    strong ETag derived from the data version, so unchanged loads get a 304.
+    """
     try:
-        data = load_data_from_mongodb()
+        resolve = request.args.get('resolve') in ('1', 'true')
+        version = get_data_version()
+        etag, window = stored_data_etag(version, resolve)
+
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            data, base = cached_stored_data(version, window)
+            if data is None:
+                base = base or build_stored_data()
+                data = resolve_media_urls(base) if resolve else base
+                cache_stored_data(version, window, base, data)
+            response = jsonify(data)
+
+        response.set_etag(etag)
+        # Always revalidate; the ETag makes that cheap
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    except Exception as e:
+        print(f"Error retrieving stored data: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Entries per /api/tree page unless ?limit= asks for fewer (or more)
+TREE_PAGE_SIZE = 50
+MAX_TREE_PAGE_SIZE = 200
+# Tree pages kept in memory for the current data version
+TREE_CACHE_SIZE = int(os.getenv("TREE_CACHE_SIZE", "2000"))
 
-        # Get media metadata from MongoDB
-        video_mapping = {}
-        image_mapping = {}
 
-        # Populate with OSS URLs
-        media_collection = db["media"]
-        media_files = media_collection.find({}, {"_id": 0})
-        for media in media_files:
-            if media["type"] == "video":
-                video_mapping[media["key"]] = media["oss_path"]
-            elif media["type"] == "image":
-                image_mapping[media["key"]] = media["oss_path"]
+def encode_cursor(name):
+    if not isinstance(name, str):
+        raise ValueError(f"Cannot page after {name!r}")
+    return base64.urlsafe_b64encode(name.encode()).decode()
 
-        data["videos"] = video_mapping
-        data["images"] = image_mapping
 
-        return jsonify(data)
+def decode_cursor(cursor):
+    """Return the name a page starts after; raises ValueError if malformed"""
+    try:
+        # validate=True rejects characters outside the alphabet instead of
+        # silently dropping them
+        name = base64.b64decode(cursor, altchars=b"-_", validate=True).decode()
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    # Only cursors we issued round-trip exactly
+    if not name or encode_cursor(name) != cursor:
+        raise ValueError("Invalid cursor")
+    return name
+
+
+def tree_level_query(category, subcategory, after, limit):
+    """Aggregation for one level of the tree, one row past the page"""
+    # Nodes without a string name cannot be paged past, so they are skipped
+    if subcategory is not None:
+        match = {"category": category, "subcategory": subcategory,
+                 "name": {"$type": "string"}}
+        if after is not None:
+            match["name"]["$gt"] = after
+        return [
+            {"$match": match},
+            {"$sort": {"name": 1}},
+            {"$limit": limit + 1},
+            {"$project": {"_id": 0}},
+        ]
+
+    match = {} if category is None else {"category": category}
+    group = {"_id": "$category" if category is None else "$subcategory",
+             "items": {"$sum": 1}}
+    if category is None:
+        group["subcategories"] = {"$addToSet": "$subcategory"}
+    named = {"$type": "string"}
+    if after is not None:
+        named["$gt"] = after
+    pipeline = [{"$match": match}, {"$group": group}, {"$match": {"_id": named}}]
+    pipeline += [{"$sort": {"_id": 1}}, {"$limit": limit + 1}]
+    return pipeline
+
+
+def tree_entry_media_keys(entry, category, subcategory):
+    """Media collection keys of (field, key) for one tree entry"""
+    name = entry["name"]
+    if category is None:
+        image_key = f"category-{name}"
+    elif subcategory is None:
+        image_key = f"subcategory-{category}-{name}"
+    else:
+        image_key = f"item-{name}"
+    keys = [("image", image_key), ("audio", f"audio-{name}")]
+    if subcategory is not None:
+        keys += [(("videos", action), f"{name}-{action}")
+                 for action in entry.get("requests", [])]
+    return keys
+
+
+@metrics.timed("tree_build")
+def build_tree_level(category, subcategory, after, limit):
+    """Return one page of the category -> subcategory -> item tree
+
+    Counts come from a MongoDB aggregation and media from a single $in
+    lookup for the entries on the page, so the cost scales with the page,
+    not the catalog.
+    """
+    rows = list(items_collection.aggregate(
+        tree_level_query(category, subcategory, after, limit)))
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    if subcategory is not None:
+        entries = [dict(row, videos={}) for row in rows]
+    else:
+        entries = []
+        for row in rows:
+            entry = {"name": row["_id"], "items": row["items"]}
+            if "subcategories" in row:
+                entry["subcategories"] = len([
+                    name for name in row["subcategories"] if isinstance(name, str)
+                ])
+            entries.append(entry)
+
+    wanted = {}
+    for entry in entries:
+        entry.setdefault("image", None)
+        entry.setdefault("audio", None)
+        for field, key in tree_entry_media_keys(entry, category, subcategory):
+            wanted[key] = (entry, field)
+    if wanted:
+        for media in media_collection.find(
+                {"key": {"$in": list(wanted)}}, {"_id": 0}):
+            entry, field = wanted[media["key"]]
+            if isinstance(field, tuple):
+                entry[field[0]][field[1]] = media["oss_path"]
+            else:
+                entry[field] = media["oss_path"]
+
+    level = ("categories" if category is None
+             else "subcategories" if subcategory is None else "items")
+    return {
+        "level": level,
+        "category": category,
+        "subcategory": subcategory,
+        "entries": entries,
+        "next_cursor": encode_cursor(entries[-1]["name"]) if more else None,
+    }
+
+
+def tree_media_keys(page):
+    """Full OSS keys of every media path on a tree page"""
+    keys = []
+    for entry in page["entries"]:
+        if entry["image"]:
+            keys.append(media_oss_key("image", entry["image"]))
+        if entry["audio"]:
+            keys.append(media_oss_key("audio", entry["audio"]))
+        keys += [media_oss_key("video", path)
+                 for path in entry.get("videos", {}).values()]
+    return keys
+
+
+def cached_tree_level(key):
+    with data_version_lock:
+        page = tree_cache.get(key)
+        if page is not None:
+            tree_cache.move_to_end(key)
+        return page
+
+
+def cache_tree_level(key, page):
+    with data_version_lock:
+        # Pages of older versions can never be served again
+        for stale in [k for k in tree_cache if k[0] != key[0]]:
+            del tree_cache[stale]
+        tree_cache[key] = page
+        while len(tree_cache) > TREE_CACHE_SIZE:
+            tree_cache.popitem(last=False)
+
+
+@app.route('/api/tree', methods=['GET'])
+def get_tree():
+    """Return one level of the category tree, a page at a time
+
+    No arguments lists categories; ?category= lists its subcategories and
+    ?category=&subcategory= its items with their media. Pass the returned
+    next_cursor as ?cursor= for the next page. ?resolve=1 signs the media
+    on the page, and ETags work as for /api/stored-data.
+    """
+    try:
+        category = request.args.get('category')
+        subcategory = request.args.get('subcategory')
+        if subcategory is not None and category is None:
+            return jsonify({"error": "subcategory requires category"}), 400
+        try:
+            limit = int(request.args.get('limit', TREE_PAGE_SIZE))
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        limit = max(1, min(limit, MAX_TREE_PAGE_SIZE))
+
+        resolve = request.args.get('resolve') in ('1', 'true')
+        version = get_data_version()
+        etag, window = stored_data_etag(version, resolve)
+
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            key = (version, category, subcategory, after, limit)
+            page = cached_tree_level(key)
+            if page is None:
+                page = build_tree_level(category, subcategory, after, limit)
+                cache_tree_level(key, page)
+            if resolve:
+                page = dict(page, **sign_stored_keys(tree_media_keys(page)))
+            response = jsonify(page)
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
     except Exception as e:
-        print(f"Error retrieving stored data: {str(e)}")
+        print(f"Error retrieving category tree: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/videos/<path:filename>', methods=['GET'])
 def get_video(filename):
+    """Signed URL of a video, picking the rendition from the client
+
+    ?quality=low|full wins; otherwise Save-Data, ECT and Downlink hints
+    choose between the low-bitrate and full renditions.
+    """
     try:
-        # Check if file is in OSS and redirect to signed URL
-        oss_key = f"videos/{filename}"
-        url = bucket.sign_url('GET', oss_key, 3600)  # 1-hour link
-        return jsonify({"url": url})
+        response = jsonify(video_url(
+            filename, request.args.get('quality'), request.headers))
+        response.headers["Vary"] = RENDITION_HINTS
+        response.headers["Accept-CH"] = RENDITION_HINTS
+        return response
     except Exception as e:
         print(f"Error serving video: {str(e)}")
         return jsonify({"error": str(e)}), 404
@@ -503,7 +1748,7 @@ def get_image(filename):
     try:
         # Check if file is in OSS and redirect to signed URL
         oss_key = f"images/{filename}"
-        url = bucket.sign_url('GET', oss_key, 3600)  # 1-hour link
+        url = signed_urls.get(oss_key)
         return jsonify({"url": url})
     except Exception as e:
         print(f"Error serving image: {str(e)}")
@@ -515,13 +1760,46 @@ def get_audio(filename):
     try:
         # Check if file exists in OSS and return signed URL
         oss_key = f"audio/{filename}"
-        url = bucket.sign_url('GET', oss_key, 3600)  # 1-hour link
+        url = signed_urls.get(oss_key)
         return jsonify({"url": url})
     except Exception as e:
         print(f"Error serving audio: {str(e)}")
         return jsonify({"error": str(e)}), 404
 
 
+@app.route('/api/media/sign', methods=['POST'])
+def sign_media():
+    """Sign a batch of OSS media keys in one call"""
+    try:
+        data = request.json or {}
+        keys = data.get('keys')
+
+        if not isinstance(keys, list) or not keys:
+            return jsonify({"error": "No keys provided"}), 400
+        if len(keys) > MAX_SIGN_BATCH:
+            return jsonify({
+                "error": f"At most {MAX_SIGN_BATCH} keys can be signed per request"
+            }), 400
+
+        # Only media objects can be signed through this endpoint
+        invalid = [
+            key for key in keys
+            if not isinstance(key, str) or not key.startswith(MEDIA_PREFIXES)
+        ]
+        if invalid:
+            return jsonify({"error": "Invalid media keys", "keys": invalid}), 400
+
+        signed = signed_urls.get_many(dict.fromkeys(keys))
+        return jsonify({
+            "urls": {key: url for key, (url, _) in signed.items()},
+            "expires": {key: int(expires_at) for key, (_, expires_at) in signed.items()}
+        })
+
+    except Exception as e:
+        print(f"Error signing media: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/generate-speech', methods=['POST'])
 def generate_speech():
     try:
@@ -532,25 +1810,15 @@ def generate_speech():
         if not text:
             return jsonify({"error": "No text provided"}), 400
 
-        # Generate a deterministic filename based on text content
-        sanitized_text = text.replace(' ', '_').lower()
-        filename = f"{sanitized_text[:30]}_{hash(text) % 10000}.mp3"
-
-        # Check if this audio already exists in OSS
-        oss_key = f"audio/{filename}"
-        try:
-            bucket.get_object_meta(oss_key)
-            print(f"Audio already exists in OSS for '{text}'")
-        except:
-            # Generate new audio
-            print(f"Generating audio for: '{text}'")
-            oss_key = generate_tts_audio(text, voice, filename)
+        # Cached results are keyed by a stable digest of text and voice, so
+        # this only calls the TTS service for new phrases
+        oss_key = generate_tts_audio(text, voice)
 
-            if not oss_key:
-                return jsonify({"error": "Failed to generate audio"}), 500
+        if not oss_key:
+            return jsonify({"error": "Failed to generate audio"}), 500
 
         # Get signed URL
-        url = bucket.sign_url('GET', oss_key, 3600)  # 1-hour link
+        url = signed_urls.get(oss_key)
         return jsonify({"url": url, "key": oss_key})
 
     except Exception as e:
@@ -558,44 +1826,147 @@ def generate_speech():
         return jsonify({"error": str(e)}), 500
 
 
+def cache_counter(field):
+    return lambda: {
+        (("cache", name),): stats[field]
+        for name, stats in (
+            ("media", media_cache.stats()),
+            ("tts", tts_pipeline.stats()),
+            ("signed_urls", signed_urls.stats()),
+            ("detections", detection_cache.stats()),
+            ("local_media", local_media.stats()),
+            ("llm", llm.stats()),
+        )
+    }
+
+
+def gpu_gauge(field):
+    return lambda: {
+        (("model", model),): count
+        for model, count in gpu_scheduler.stats()[field].items()
+    }
+
+
+metrics.gauge("cache_hits_total", "Cache hits by cache",
+              cache_counter("hits"), kind="counter")
+metrics.gauge("cache_misses_total", "Cache misses by cache",
+              cache_counter("misses"), kind="counter")
+metrics.gauge("jobs_pending", "Queued or running background jobs by queue",
+              lambda: {(("queue", "bulk"),): job_queue.pending_count(),
+                       (("queue", "interactive"),): interactive_job_queue.pending_count()})
+metrics.gauge("uploads_in_flight", "OSS uploads queued or running",
+              uploader.pending_count)
+metrics.gauge("local_media_bytes", "Bytes of generated media kept on local disk",
+              lambda: local_media.stats()["bytes"])
+metrics.gauge("gpu_running", "Wan2.1 runs in progress by model",
+              gpu_gauge("running"))
+metrics.gauge("gpu_waiting", "Wan2.1 runs waiting for a GPU slot by model",
+              gpu_gauge("waiting"))
+
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    metrics.start_request()
+
+
+@app.after_request
+def add_server_timing(response):
+    started = g.get("request_started")
+    if started is not None:
+        total = time.perf_counter() - started
+        response.headers["Server-Timing"] = metrics.server_timing(total)
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe(f"http {request.method} {route}", total,
+                        response.status_code < 500)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Create every client on demand and report whether its service answers"""
+    checks = clients.warm()
+    ok = all(check["ok"] for check in checks.values())
+    return jsonify({"ready": ok, "checks": checks}), 200 if ok else 503
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Return hit/miss counters for the in-process caches"""
+    return jsonify({
+        "media": media_cache.stats(),
+        "tts": tts_pipeline.stats(),
+        "signed_urls": signed_urls.stats(),
+        "detections": detection_cache.stats(),
+        "local_media": local_media.stats(),
+        "llm": llm.stats(),
+        "gpu": gpu_scheduler.stats(),
+        "single_flight": single_flight.stats()
+    })
+
+
+def detection_messages(image_bytes, mime_type):
+    encoded_string = base64.b64encode(image_bytes).decode('utf-8')
+    return [
+        {'role': 'system', 'content': 'You are an AI assistant capable of analyzing images. Detect the main object in the image and provide its name as a single word or short phrase. No explanations.'},
+        {'role': 'user', 'content': [
+            {'type': 'text', 'text': 'What is the main object in this image?'},
+            {'type': 'image_url', 'image_url': {
+                'url': f"data:{mime_type};base64,{encoded_string}"}}
+        ]}
+    ]
+
+
 @app.route('/api/detect-object', methods=['POST'])
 def detect_object():
     try:
+        # Reject oversized bodies before Werkzeug parses the form
+        if (request.content_length or 0) > MAX_DETECT_REQUEST_BYTES:
+            return jsonify({"error": "Image is too large"}), 413
+
         if 'image' not in request.files:
             return jsonify({"error": "No image file provided"}), 400
 
         image_file = request.files['image']
 
-        # Save the image temporarily
-        temp_image_path = os.path.join(TEMP_DIR, 'temp_image.jpg')
-        image_file.save(temp_image_path)
+        # Parsed into memory (see InMemoryUploadRequest), so concurrent
+        # requests never share a file on disk
+        image_bytes = image_file.stream.read(MAX_DETECT_UPLOAD_BYTES + 1)
+        if len(image_bytes) > MAX_DETECT_UPLOAD_BYTES:
+            return jsonify({"error": "Image is too large"}), 413
 
-        # Encode the image to base64 for Qwen-VL
-        with open(temp_image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(
-                image_file.read()).decode('utf-8')
+        # Repeated photos of the same object skip the model call
+        image_hash = perceptual_hash(image_bytes)
+        detected_object = detection_cache.get(image_hash)
+        if detected_object:
+            return jsonify({"detected_item": detected_object, "cached": True})
 
-        # Call Qwen-VL for object detection
-        completion = qwen_client.chat.completions.create(
-            model="qwen-vl",
-            messages=[
-                {'role': 'system', 'content': 'You are an AI assistant capable of analyzing images. Detect the main object in the image and provide its name as a single word or short phrase. No explanations.'},
-                {'role': 'user', 'content': [
-                    {'type': 'text', 'text': 'What is the main object in this image?'},
-                    {'type': 'image_url', 'image_url': {
-                        'url': f"data:image/jpeg;base64,{encoded_string}"}}
-                ]}
-            ],
-            temperature=0
-        )
+        # Shrink the payload sent to Qwen-VL
+        image_bytes, mime_type = prepare_image(
+            image_bytes, max_side=DETECT_IMAGE_MAX_SIDE)
 
-        detected_object = completion.choices[0].message.content.strip()
+        # Call Qwen-VL for object detection
+        with metrics.timer("qwen_detect"):
+            detected_object = llm.complete(
+                "qwen-vl", detection_messages(image_bytes, mime_type),
+                timeout=QWEN_DETECT_TIMEOUT
+            ).strip()
 
-        # Clean up temporary file
-        os.remove(temp_image_path)
+        detection_cache.put(image_hash, detected_object)
 
         return jsonify({"detected_item": detected_object})
 
+    except InvalidImage as e:
+        return jsonify({"error": str(e)}), 400
+    except LlmUnavailable as e:
+        print(f"Error detecting object: {str(e)}")
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"Error detecting object: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -632,6 +2003,8 @@ def update_item_requests():
                 upsert=True
             )
 
+        bump_data_version()
+
         return jsonify({"success": True})
 
     except Exception as e:
@@ -639,6 +2012,17 @@ def update_item_requests():
         return jsonify({"error": str(e)}), 500
 
 
+def run_action_video_job(job, item_name, action, video_filename):
+    """Background job: generate a single action video"""
+    job.set_total(1)
+    video_path = generate_video(
+        item_name, action, video_filename, Priority.INTERACTIVE)
+    if not video_path:
+        raise Exception("Failed to generate video")
+    job.advance()
+    return {"success": True, "videoPath": video_path}
+
+
 @app.route('/api/generate-action-video', methods=['POST'])
 def generate_action_video():
     try:
@@ -652,16 +2036,14 @@ def generate_action_video():
         # Generate a unique filename
         video_filename = f"{item_name.replace(' ', '_')}_{action.replace(' ', '_')}.mp4"
 
-        # Generate the video
-        video_path = generate_video(item_name, action, video_filename)
-
-        if not video_path:
-            return jsonify({"error": "Failed to generate video"}), 500
+        # Generate the video in the background, ahead of bulk work
+        job = interactive_job_queue.submit(
+            "generate-action-video", run_action_video_job,
+            item_name, action, video_filename,
+            payload={"itemName": item_name, "action": action}
+        )
 
-        return jsonify({
-            "success": True,
-            "videoPath": video_path
-        })
+        return jsonify({"job_id": job.id, "status": job.status}), 202
 
     except Exception as e:
         print(f"Error generating action video: {str(e)}")
@@ -0,0 +1,425 @@
+"""ASGI entry point: async I/O for the hot read paths, Flask for the rest
+
+Run with `uvicorn asgi:application --workers N`. Metadata, signing, job
+status, categorization (including its event stream), object detection and
+speech are served natively on the event loop with AsyncOpenAI and httpx,
+and motor; generation still runs on the job, TTS and upload executors
+shared with app.py. Every other route falls through to the WSGI Flask app
+(through a2wsgi), so both serving modes stay in sync.
+"""
+import asyncio
+
+from a2wsgi import WSGIMiddleware
+from pymongo import ReturnDocument
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_module
+import clients
+from app import (
+    DETECT_IMAGE_MAX_SIDE, InvalidImage, LlmUnavailable,
+    MAX_DETECT_REQUEST_BYTES, MAX_DETECT_UPLOAD_BYTES, MAX_SIGN_BATCH,
+    MEDIA_PREFIXES, QWEN_DETECT_TIMEOUT, RENDITION_HINTS,
+    SSE_KEEPALIVE_INTERVAL, TaskStatus, bucket, cache_stored_data,
+    cached_stored_data, categorization_messages, data_version_stale,
+    data_version_state, detection_cache, detection_messages, find_job,
+    format_sse, item_upserts, known_items_query, llm, match_categorizations,
+    media_cache, media_mappings, normalize_item_name, perceptual_hash,
+    prepare_image, queue_media_job, recall_categorizations,
+    remember_categorization, resolve_media_urls, set_data_version, signed_urls,
+    single_flight, speech_cache_key, speech_filename, split_new_items,
+    stored_data_etag, tokenize_items, tts_pipeline, uploaded_by_other_worker,
+    video_url,
+)
+from clients import LazyClient
+
+# How often an SSE stream checks its job for new events
+SSE_POLL_INTERVAL = 0.25
+
+# Async clients with larger pools, created on first use (see clients.py)
+items_collection = LazyClient(clients.async_collection, "items")
+media_collection = LazyClient(clients.async_collection, "media")
+jobs_collection = LazyClient(clients.async_collection, "jobs")
+meta_collection = LazyClient(clients.async_collection, "meta")
+categorization_cache_collection = LazyClient(
+    clients.async_collection, "categorization_cache")
+async_http = LazyClient(clients.async_http)
+
+
+def error_response(message, status_code=500, **extra):
+    return JSONResponse(dict({"error": message}, **extra), status_code=status_code)
+
+
+async def get_data_version():
+    """Async twin of app.get_data_version, sharing its cached state"""
+    if not data_version_stale():
+        return data_version_state["value"]
+    doc = await meta_collection.find_one({"_id": "data_version"})
+    set_data_version(doc["value"] if doc else 0)
+    return data_version_state["value"]
+
+
+async def bump_data_version():
+    try:
+        doc = await meta_collection.find_one_and_update(
+            {"_id": "data_version"},
+            {"$inc": {"value": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        set_data_version(doc["value"], changed=True)
+    except Exception as e:
+        print(f"Error bumping data version: {str(e)}")
+
+
+async def build_stored_data():
+    """Load items and media mappings from MongoDB concurrently"""
+    items, media_files = await asyncio.gather(
+        items_collection.find({}, {"_id": 0}).to_list(None),
+        media_collection.find({}, {"_id": 0}).to_list(None)
+    )
+    return dict({"items": items}, **media_mappings(media_files))
+
+
+async def lookup_cached_categorizations(normalized_names):
+    found, missing = recall_categorizations(normalized_names)
+    if missing:
+        async for doc in categorization_cache_collection.find({"_id": {"$in": missing}}):
+            found[doc["_id"]] = doc["item"]
+            remember_categorization(doc["_id"], doc["item"], persist=False)
+    return found
+
+
+async def categorize_incrementally(raw_items):
+    """Async twin of app.categorize_incrementally"""
+    names = tokenize_items(raw_items)
+
+    known = {}
+    async for item in items_collection.find(known_items_query(names), {"_id": 0}):
+        known[normalize_item_name(item["name"])] = item
+
+    unknown = [name for name in names if name not in known]
+    cached = await lookup_cached_categorizations(unknown)
+    to_categorize = [name for name in unknown if name not in cached]
+
+    categorized = dict(cached)
+    if to_categorize:
+        print(f"Categorizing with Qwen: {', '.join(to_categorize)}")
+        parsed_items = (await llm.async_complete_json(
+            "qwen-max", categorization_messages(
+                ", ".join(names[name] for name in to_categorize))))["items"]
+
+        matched = match_categorizations(to_categorize, parsed_items)
+        writes = []
+        for name in to_categorize:
+            if name in matched:
+                remember_categorization(name, matched[name], persist=False)
+                writes.append(categorization_cache_collection.update_one(
+                    {"_id": name}, {"$set": {"item": matched[name]}}, upsert=True))
+        await asyncio.gather(*writes)
+        categorized.update(matched)
+
+    return split_new_items(known, categorized)
+
+
+async def stored_data(request):
+    """Async /api/stored-data with the same ETag and caching as app.py"""
+    try:
+        resolve = request.query_params.get('resolve') in ('1', 'true')
+        version = await get_data_version()
+        etag, window = stored_data_etag(version, resolve)
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if f'"{etag}"' in if_none_match or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        data, base = cached_stored_data(version, window)
+        if data is None:
+            base = base or await build_stored_data()
+            data = resolve_media_urls(base) if resolve else base
+            cache_stored_data(version, window, base, data)
+        return JSONResponse(data, headers=headers)
+    except Exception as e:
+        print(f"Error retrieving stored data: {str(e)}")
+        return error_response(str(e))
+
+
+async def media_url(request):
+    """Signed URL for /api/videos|images|audio/<file>"""
+    folder = request.url.path.split("/")[2]
+    try:
+        if folder == "videos":
+            # Same rendition choice as app.get_video
+            return JSONResponse(
+                video_url(request.path_params['filename'],
+                          request.query_params.get('quality'), request.headers),
+                headers={"Vary": RENDITION_HINTS, "Accept-CH": RENDITION_HINTS})
+        oss_key = f"{folder}/{request.path_params['filename']}"
+        return JSONResponse({"url": signed_urls.get(oss_key)})
+    except Exception as e:
+        print(f"Error serving {folder}: {str(e)}")
+        return error_response(str(e), 404)
+
+
+async def sign_media(request):
+    """Sign a batch of OSS media keys in one call"""
+    try:
+        data = await request.json() or {}
+        keys = data.get('keys')
+
+        if not isinstance(keys, list) or not keys:
+            return error_response("No keys provided", 400)
+        if len(keys) > MAX_SIGN_BATCH:
+            return error_response(
+                f"At most {MAX_SIGN_BATCH} keys can be signed per request", 400)
+
+        invalid = [
+            key for key in keys
+            if not isinstance(key, str) or not key.startswith(MEDIA_PREFIXES)
+        ]
+        if invalid:
+            return error_response("Invalid media keys", 400, keys=invalid)
+
+        signed = signed_urls.get_many(dict.fromkeys(keys))
+        return JSONResponse({
+            "urls": {key: url for key, (url, _) in signed.items()},
+            "expires": {key: int(expires_at) for key, (_, expires_at) in signed.items()}
+        })
+    except Exception as e:
+        print(f"Error signing media: {str(e)}")
+        return error_response(str(e))
+
+
+async def get_job(request):
+    """Return status and progress of a background job"""
+    job_id = request.path_params["job_id"]
+    try:
+        job = find_job(job_id)
+        if job:
+            return JSONResponse(job.to_dict())
+
+        # The job may be running in another worker process
+        stored_job = await jobs_collection.find_one({"job_id": job_id}, {"_id": 0})
+        if stored_job:
+            return JSONResponse(stored_job)
+
+        return error_response("Job not found", 404)
+    except Exception as e:
+        print(f"Error retrieving job: {str(e)}")
+        return error_response(str(e))
+
+
+async def stream_job_events(job, after=0):
+    """Async twin of app.stream_job_events that never parks a thread"""
+    idle = 0.0
+    while True:
+        events = job.events[after:]
+        if not events:
+            if job.is_finished():
+                return
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+            idle += SSE_POLL_INTERVAL
+            if idle >= SSE_KEEPALIVE_INTERVAL:
+                idle = 0.0
+                yield ": keepalive\n\n"
+            continue
+        idle = 0.0
+        for event in events:
+            yield format_sse(event["event"], event["data"], event["id"])
+            if event["event"] in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                return
+        after = events[-1]["id"]
+
+
+def sse_response(stream):
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def get_job_events(request):
+    """Stream a running job's events; clients fall back to polling on 404"""
+    job = find_job(request.path_params["job_id"])
+    if not job:
+        return error_response("Job not found", 404)
+
+    after = request.headers.get('last-event-id', '0')
+    return sse_response(
+        stream_job_events(job, after=int(after) if after.isdigit() else 0))
+
+
+async def start_categorization(items):
+    """Async twin of app.start_categorization"""
+    categorized_items, new_items = await categorize_incrementally(items)
+
+    # Store the items right away so they show up before media is ready
+    if new_items:
+        await items_collection.bulk_write(
+            item_upserts({"items": new_items}), ordered=False)
+        await bump_data_version()
+
+    return queue_media_job(categorized_items), categorized_items
+
+
+async def categorize_items(request):
+    try:
+        data = await request.json()
+        items = data.get('items', '')
+
+        if not items:
+            return error_response("No items provided", 400)
+
+        job, categorized_items = await start_categorization(items)
+        return JSONResponse({
+            "job_id": job.id,
+            "status": job.status,
+            "items": categorized_items
+        }, status_code=202)
+
+    except LlmUnavailable as e:
+        print(f"Error during categorization: {str(e)}")
+        return error_response(str(e), 503)
+    except Exception as e:
+        print(f"Error during categorization: {str(e)}")
+        return error_response(str(e))
+
+
+async def categorize_items_stream(request):
+    """Categorize items and stream media progress as Server-Sent Events
+
+    Same events as app.categorize_items_stream; the stream stays open for
+    the whole job since waiting on the loop holds no thread.
+    """
+    data = await request.json() or {}
+    items = data.get('items', '')
+
+    if not items:
+        return error_response("No items provided", 400)
+
+    async def stream():
+        try:
+            job, categorized_items = await start_categorization(items)
+        except Exception as e:
+            print(f"Error during categorization: {str(e)}")
+            yield format_sse(TaskStatus.FAILED, {"error": str(e)})
+            return
+
+        yield format_sse("categorized", {
+            "job_id": job.id,
+            "items": categorized_items
+        })
+        async for message in stream_job_events(job):
+            yield message
+
+    return sse_response(stream())
+
+
+async def detect_object(request):
+    try:
+        # Starlette spools large parts to disk and has no size limit of its own
+        if int(request.headers.get('content-length') or 0) > MAX_DETECT_REQUEST_BYTES:
+            return error_response("Image is too large", 413)
+
+        form = await request.form()
+        image_file = form.get('image')
+        if image_file is None or isinstance(image_file, str):
+            return error_response("No image file provided", 400)
+
+        image_bytes = await image_file.read(MAX_DETECT_UPLOAD_BYTES + 1)
+        if len(image_bytes) > MAX_DETECT_UPLOAD_BYTES:
+            return error_response("Image is too large", 413)
+
+        # Hashing and resizing are CPU work; keep them off the event loop
+        image_hash = await run_in_threadpool(perceptual_hash, image_bytes)
+        detected_object = detection_cache.get(image_hash)
+        if detected_object:
+            return JSONResponse({"detected_item": detected_object, "cached": True})
+
+        image_bytes, mime_type = await run_in_threadpool(
+            prepare_image, image_bytes, DETECT_IMAGE_MAX_SIDE)
+
+        detected_object = (await llm.async_complete(
+            "qwen-vl", detection_messages(image_bytes, mime_type),
+            timeout=QWEN_DETECT_TIMEOUT
+        )).strip()
+        detection_cache.put(image_hash, detected_object)
+        return JSONResponse({"detected_item": detected_object})
+
+    except InvalidImage as e:
+        return error_response(str(e), 400)
+    except LlmUnavailable as e:
+        print(f"Error detecting object: {str(e)}")
+        return error_response(str(e), 503)
+    except Exception as e:
+        print(f"Error detecting object: {str(e)}")
+        return error_response(str(e))
+
+
+async def generate_tts_audio(text, voice="Olivia"):
+    """Async twin of app.generate_tts_audio
+
+    Waits for the TTS task on the event loop instead of parking a thread
+    for the whole synthesis.
+    """
+    if media_cache.needs_reconcile():
+        await run_in_threadpool(media_cache.ensure_reconciled, bucket)
+    # Cache hits skip the lease entirely
+    cached = tts_pipeline.cached(text, voice)
+    if cached:
+        return cached
+    oss_key = f"audio/{speech_filename(text, voice)}"
+    return await single_flight.async_do(
+        oss_key, tts_pipeline.async_synthesize, text, voice, None, async_http,
+        check=lambda: uploaded_by_other_worker(
+            speech_cache_key(text, voice), oss_key))
+
+
+async def generate_speech(request):
+    try:
+        data = await request.json()
+        text = data.get('text')
+        voice = data.get('voice', 'Olivia')
+
+        if not text:
+            return error_response("No text provided", 400)
+
+        oss_key = await generate_tts_audio(text, voice)
+        if not oss_key:
+            return error_response("Failed to generate audio")
+
+        return JSONResponse({"url": signed_urls.get(oss_key), "key": oss_key})
+
+    except Exception as e:
+        print(f"Error generating speech: {str(e)}")
+        return error_response(str(e))
+
+
+routes = [
+    Route('/api/stored-data', stored_data, methods=['GET']),
+    Route('/api/videos/{filename:path}', media_url, methods=['GET']),
+    Route('/api/images/{filename:path}', media_url, methods=['GET']),
+    Route('/api/audio/{filename:path}', media_url, methods=['GET']),
+    Route('/api/media/sign', sign_media, methods=['POST']),
+    Route('/api/jobs/{job_id}', get_job, methods=['GET']),
+    Route('/api/jobs/{job_id}/events', get_job_events, methods=['GET']),
+    Route('/api/categorize-items', categorize_items, methods=['POST']),
+    Route('/api/categorize-items/stream', categorize_items_stream,
+          methods=['POST']),
+    Route('/api/detect-object', detect_object, methods=['POST']),
+    Route('/api/generate-speech', generate_speech, methods=['POST']),
+    # Everything else is served by the Flask app
+    Mount('/', app=WSGIMiddleware(flask_module.app)),
+]
+
+application = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"],
+                           allow_methods=["*"], allow_headers=["*"])]
+)
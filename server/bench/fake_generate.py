@@ -0,0 +1,28 @@
+"""Stand-in for Wan2.1's generate.py used by the benchmark harness
+
+Accepts the same arguments, sleeps BENCH_GENERATE_LATENCY seconds and writes
+a small placeholder file to --output.
+"""
+import argparse
+import os
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--task", required=True)
+    parser.add_argument("--size", required=True)
+    parser.add_argument("--ckpt_dir", required=True)
+    parser.add_argument("--image")
+    parser.add_argument("--prompt", required=True)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    time.sleep(float(os.getenv("BENCH_GENERATE_LATENCY", "0")))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "wb") as f:
+        f.write(f"{args.task} {args.prompt}".encode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+
+class Latency:
+    """Sleeps for mean seconds, +/- jitter (a fraction of the mean)"""
+
+    def __init__(self, mean=0.0, jitter=0.2):
+        self.mean = mean
+        self.jitter = jitter
+
+    def sleep(self):
+        if self.mean > 0:
+            spread = self.mean * self.jitter
+            time.sleep(max(0.0, random.uniform(self.mean - spread, self.mean + spread)))
+
+
+class InMemoryBucket:
+    """The subset of oss2.Bucket the server uses, backed by a dict"""
+
+    def __init__(self, latency=None):
+        self.latency = latency or Latency()
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, key, data):
+        self.latency.sleep()
+        with self._lock:
+            self.objects[key] = bytes(data)
+
+    def put_object_from_file(self, key, filename):
+        with open(filename, 'rb') as f:
+            self.put_object(key, f.read())
+
+    def get_object_to_file(self, key, filename):
+        self.latency.sleep()
+        with self._lock:
+            data = self.objects[key]
+        with open(filename, 'wb') as f:
+            f.write(data)
+
+    def object_exists(self, key):
+        self.latency.sleep()
+        with self._lock:
+            return key in self.objects
+
+    def sign_url(self, method, key, expires):
+        # Local HMAC in oss2 too, so no latency here
+        signature = hashlib.sha1(f"{method}{key}{expires}".encode()).hexdigest()
+        return f"https://bench.oss.local/{key}?Expires={int(time.time()) + expires}&Signature={signature}"
+
+    def list_objects(self, prefix='', delimiter='', marker='', max_keys=100, headers=None):
+        """Paged listing compatible with oss2.ObjectIterator"""
+        self.latency.sleep()
+        with self._lock:
+            keys = sorted(key for key in self.objects
+                          if key.startswith(prefix) and key > marker)
+        page = keys[:max_keys]
+        return SimpleNamespace(
+            object_list=[SimpleNamespace(key=key) for key in page],
+            prefix_list=[],
+            is_truncated=len(keys) > max_keys,
+            next_marker=page[-1] if page else ''
+        )
+
+
+def in_memory_resumable_upload(bucket, oss_key, local_path, *args):
+    """Stand-in for uploads.oss_resumable_upload against InMemoryBucket"""
+    bucket.put_object_from_file(oss_key, local_path)
+
+
+def fake_categorization(items):
+    """Deterministic categorization reply for a comma separated item list"""
+    categories = ["food and drinks", "personal care", "household", "clothing"]
+    result = []
+    for name in (item.strip() for item in items.split(",")):
+        if not name:
+            continue
+        index = int(hashlib.md5(name.encode()).hexdigest(), 16)
+        category = categories[index % len(categories)]
+        result.append({
+            "name": name,
+            "category": category,
+            "subcategory": f"{category} {index % 3}",
+            "requests": ["need more", "help using", "put away", "clean"],
+        })
+    return {"items": result}
+
+
+class FakeUpstreamServer:
+    """Local HTTP server standing in for the Qwen API and TTS downloads
+
+    POST {url}/chat/completions answers like the OpenAI-compatible
+    DashScope endpoint; GET {url}/tts/<id>.mp3 serves synthesized audio.
+    """
+
+    def __init__(self, qwen_latency=None, download_latency=None):
+        self.qwen_latency = qwen_latency or Latency()
+        self.download_latency = download_latency or Latency()
+        self.completions = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                server.qwen_latency.sleep()
+                server.completions += 1
+                self._send_json(server.completion(body))
+
+            def do_GET(self):
+                server.download_latency.sleep()
+                self.send_response(200)
+                self.send_header('Content-Type', 'audio/mpeg')
+                payload = b'ID3' + os.urandom(2048)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_json(self, data):
+                payload = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def completion(self, body):
+        messages = body.get('messages', [])
+        system = messages[0]['content'] if messages else ''
+        if isinstance(system, str) and 'categorizes' in system:
+            content = "```json\n" + json.dumps(
+                fake_categorization(messages[-1]['content'])) + "\n```"
+        else:
+            content = "water bottle"
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'qwen-max'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+
+class FakeTtsRequest:
+    """Speech SDK request stand-in; set_<Name>(value) records a parameter"""
+
+    action_name = None
+
+    def __init__(self):
+        self._params = {}
+
+    def get_action_name(self):
+        return self.action_name
+
+    def get_query_params(self):
+        return self._params
+
+    def get_body_params(self):
+        return {}
+
+    def set_accept_format(self, accept_format):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("set_"):
+            return lambda value: self._params.__setitem__(name[4:], value)
+        raise AttributeError(name)
+
+
+class FakeCreateTtsTaskRequest(FakeTtsRequest):
+    action_name = "CreateTtsTask"
+
+
+class FakeGetTtsTaskRequest(FakeTtsRequest):
+    action_name = "GetTtsTask"
+
+
+# For TtsPipeline(request_types=...), so the bench runs without aliyunsdknls
+FAKE_TTS_REQUEST_TYPES = (FakeCreateTtsTaskRequest, FakeGetTtsTaskRequest)
+
+
+class FakeSpeechClient:
+    """AcsClient stand-in for the NLS long-text TTS task API
+
+    Each task reports RUNNING for `polls` status checks, then SUCCESS with a
+    download URL on the FakeUpstreamServer. Pair it with
+    FAKE_TTS_REQUEST_TYPES; it also accepts the real SDK's request objects.
+    """
+
+    def __init__(self, upstream, latency=None, polls=1):
+        self.upstream = upstream
+        self.latency = latency or Latency()
+        self.polls = polls
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def do_action_with_exception(self, request):
+        self.latency.sleep()
+        params = dict(request.get_query_params() or {})
+        params.update(request.get_body_params() or {})
+        if request.get_action_name() == "CreateTtsTask":
+            task_id = uuid.uuid4().hex
+            with self._lock:
+                self._tasks[task_id] = self.polls
+            return json.dumps({"TaskId": task_id}).encode()
+
+        task_id = params.get("TaskId")
+        with self._lock:
+            remaining = self._tasks.get(task_id)
+            if remaining is None:
+                return json.dumps({"StatusText": "FAILED"}).encode()
+            self._tasks[task_id] = remaining - 1
+        if remaining > 0:
+            return json.dumps({"StatusText": "RUNNING"}).encode()
+        return json.dumps({
+            "StatusText": "SUCCESS",
+            "TtsUrl": f"{self.upstream.url}/tts/{task_id}.mp3",
+        }).encode()
+
+
+def fake_generate_script():
+    """Path of the generate.py stand-in (see fake_generate.py)"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_generate.py')
+
+
+def make_workdir():
+    """Scratch DATA_DIR/TEMP_DIR so a run never touches server/data"""
+    root = tempfile.mkdtemp(prefix="bench-")
+    return root, lambda: shutil.rmtree(root, ignore_errors=True)
@@ -0,0 +1,282 @@
+"""Load and latency benchmark for the Flask API, fully offline
+
+Run from server/, after installing the extra tools it uses (requests and
+mongomock) and oss2, which the app imports:
+
+    pip install -r bench/requirements.txt
+    python -m bench.run --concurrency 1,8,32 --requests 200
+
+Qwen, OSS, MongoDB, TTS and Wan2.1 are replaced with local stand-ins from
+bench/fakes.py, each with configurable latency, so numbers reflect the
+server's own overhead plus whatever upstream latency you dial in. MongoDB
+is mongomock unless --mongo-uri points at a real (local) mongod.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fakes import (
+    FAKE_TTS_REQUEST_TYPES, FakeSpeechClient, FakeUpstreamServer,
+    InMemoryBucket, Latency, fake_generate_script, in_memory_resumable_upload,
+    make_workdir,
+)
+
+SCENARIOS = ("stored-data", "stored-data-304", "tree", "media-sign",
+             "media-url", "categorize-items", "generate-speech")
+
+# Items and media seeded before the run so read paths have realistic data
+SEED_ITEMS = 200
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+def configure_environment(args, workdir):
+    """Environment the server reads at import time"""
+    os.environ.setdefault("DASHSCOPE_API_KEY", "bench")
+    os.environ.setdefault("OSS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("OSS_ACCESS_KEY_SECRET", "bench")
+    os.environ["OSS_ENDPOINT"] = "http://127.0.0.1:9"
+    os.environ["OSS_BUCKET_NAME"] = "bench"
+    os.environ["MONGODB_DATABASE"] = "bench"
+    # Background index creation on the default client should fail fast;
+    # the client used for the run is injected
+    os.environ["MONGODB_CONNECTION_STRING"] = args.mongo_uri or (
+        "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200")
+    os.environ["WAN_WORKER_ADDRESS"] = ""
+    os.environ["WAN_GENERATE_SCRIPT"] = fake_generate_script()
+    os.environ["BENCH_GENERATE_LATENCY"] = str(args.generate_latency)
+    os.environ["DATA_DIR"] = os.path.join(workdir, "data")
+    os.environ["TEMP_DIR"] = os.path.join(workdir, "temp")
+
+
+def build_server(args, upstream):
+    """Import the app, swap in the fakes and seed stored data"""
+    import app as server
+    from openai import OpenAI
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        mongo = MongoClient(args.mongo_uri)
+        mongo.drop_database("bench")
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed; pass --mongo-uri for a local mongod")
+        mongo = mongomock.MongoClient()
+
+    bucket = InMemoryBucket(Latency(args.oss_latency))
+    server.configure_clients(
+        qwen=OpenAI(api_key="bench", base_url=upstream.url, max_retries=0),
+        mongo=mongo,
+        oss_bucket=bucket,
+        speech=FakeSpeechClient(upstream, Latency(args.tts_latency))
+    )
+    server.uploader.resumable_upload = in_memory_resumable_upload
+    server.tts_pipeline.request_types = FAKE_TTS_REQUEST_TYPES
+
+    items = []
+    data = {"items": items, "images": {}, "videos": {}, "audio": {}}
+    for index in range(SEED_ITEMS):
+        name = f"seed item {index}"
+        items.append({"name": name, "category": "household",
+                      "subcategory": "household 0",
+                      "requests": ["need more", "clean"]})
+        image_key = f"images/item_seed_item_{index}.png"
+        video_key = f"videos/seed_item_{index}_need_more.mp4"
+        bucket.objects[image_key] = b"png"
+        bucket.objects[video_key] = b"mp4"
+        data["images"][f"item-{name}"] = image_key
+        data["videos"][f"{name}-need more"] = video_key
+        data["audio"][name] = f"audio/speech_seed_{index}.mp3"
+    server.save_data_to_mongodb(data)
+    return server, data
+
+
+class Scenario:
+    """Builds the nth request of a scenario as (method, path, kwargs)"""
+
+    def __init__(self, name, base_url, seed, run_id):
+        self.name = name
+        self.base_url = base_url
+        self.seed = seed
+        self.run_id = run_id
+        self.etag = None
+        self.keys = list(seed["images"].values())
+
+    def prepare(self, session):
+        if self.name == "stored-data-304":
+            response = session.get(f"{self.base_url}/api/stored-data?resolve=1")
+            self.etag = response.headers.get("ETag")
+
+    def request(self, n):
+        if self.name == "stored-data":
+            return "GET", "/api/stored-data?resolve=1", {}
+        if self.name == "stored-data-304":
+            return "GET", "/api/stored-data?resolve=1", {
+                "headers": {"If-None-Match": self.etag or ""}}
+        if self.name == "tree":
+            # The patient view's first screen and one item level
+            if n % 2:
+                return "GET", "/api/tree?resolve=1", {}
+            return "GET", "/api/tree", {"params": {
+                "category": "household", "subcategory": "household 0",
+                "resolve": "1"}}
+        if self.name == "media-sign":
+            start = (n * 50) % len(self.keys)
+            return "POST", "/api/media/sign", {
+                "json": {"keys": (self.keys * 2)[start:start + 50]}}
+        if self.name == "media-url":
+            return "GET", f"/api/{self.keys[n % len(self.keys)]}", {}
+        if self.name == "categorize-items":
+            # Unique names, so every request reaches Qwen
+            return "POST", "/api/categorize-items", {
+                "json": {"items": f"bench {self.run_id} item {n}, bench {self.run_id} tool {n}"}}
+        if self.name == "generate-speech":
+            return "POST", "/api/generate-speech", {
+                "json": {"text": f"bench {self.run_id} phrase {n}"}}
+        raise ValueError(self.name)
+
+
+def wait_for_job(session, base_url, job_id, timeout=300):
+    """Poll a queued job until it finishes; returns its last status"""
+    deadline = time.time() + timeout
+    status = None
+    while time.time() < deadline:
+        response = session.get(f"{base_url}/api/jobs/{job_id}", timeout=30)
+        status = response.json().get("status") if response.ok else None
+        if status in ("completed", "failed"):
+            break
+        time.sleep(0.1)
+    return status
+
+
+def run_level(base_url, scenario, concurrency, total):
+    """Fire `total` requests with `concurrency` in flight; return a report row"""
+    import requests
+
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    scenario.prepare(session())
+    jobs = []
+
+    def one(n):
+        method, path, kwargs = scenario.request(n)
+        started = time.perf_counter()
+        try:
+            response = session().request(method, base_url + path, timeout=300, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        duration = time.perf_counter() - started
+        if ok and response.status_code == 202:
+            jobs.append(response.json()["job_id"])
+        return duration, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    # A 202 only means the media job was queued; a job that then fails
+    # counts as an error too
+    failed_jobs = sum(
+        1 for job_id in jobs
+        if wait_for_job(session(), base_url, job_id) != "completed")
+
+    latencies = sorted(duration for duration, _ in results)
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(1 for _, ok in results if not ok) + failed_jobs,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def print_report(rows):
+    header = f"{'scenario':<18}{'conc':>6}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['scenario']:<18}{row['concurrency']:>6}{row['requests']:>7}"
+              f"{row['errors']:>6}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['throughput_rps']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="comma separated in-flight request counts")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per scenario and concurrency level")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--qwen-latency", type=float, default=0.5)
+    parser.add_argument("--oss-latency", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.05)
+    parser.add_argument("--download-latency", type=float, default=0.05)
+    parser.add_argument("--generate-latency", type=float, default=0.5)
+    parser.add_argument("--mongo-uri", help="use a real mongod instead of mongomock")
+    parser.add_argument("--json", help="also write the report rows to this file")
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir, cleanup = make_workdir()
+    upstream = FakeUpstreamServer(
+        Latency(args.qwen_latency), Latency(args.download_latency)).start()
+    try:
+        configure_environment(args, workdir)
+        server, seed = build_server(args, upstream)
+
+        from werkzeug.serving import make_server
+        httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{httpd.server_port}"
+
+        rows = []
+        run_id = int(time.time())
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            for name in scenarios:
+                scenario = Scenario(name, base_url, seed, f"{run_id}-{concurrency}")
+                rows.append(run_level(base_url, scenario, concurrency, args.requests))
+                print(f"{name} @ {concurrency}: p50 {rows[-1]['p50_ms']} ms, "
+                      f"{rows[-1]['throughput_rps']} req/s", file=sys.stderr)
+                # Let queued media jobs finish so they don't skew the next run
+                while server.job_queue.pending_count():
+                    time.sleep(0.1)
+        httpd.shutdown()
+    finally:
+        upstream.stop()
+        cleanup()
+
+    print()
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
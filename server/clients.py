@@ -0,0 +1,244 @@
+"""Lazily created, per-process clients for the external services
+
+Nothing here connects or imports an SDK until a client is first used, so
+importing the app is cheap and a missing env var only fails the requests
+that need that service. Clients are rebuilt after a fork, so each gunicorn
+worker gets its own connection pools.
+"""
+import os
+import threading
+import time
+
+QWEN_BASE_URL = "https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
+
+# Connection pool sizing, per process
+QWEN_MAX_CONNECTIONS = int(os.getenv("QWEN_MAX_CONNECTIONS", "20"))
+QWEN_TIMEOUT = float(os.getenv("QWEN_TIMEOUT", "120"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+OSS_CONNECTION_POOL_SIZE = int(os.getenv("OSS_CONNECTION_POOL_SIZE", "20"))
+# The ASGI app (asgi.py) keeps many more requests in flight per process
+ASGI_HTTP_MAX_CONNECTIONS = int(os.getenv("ASGI_HTTP_MAX_CONNECTIONS", "200"))
+ASGI_MONGO_MAX_POOL_SIZE = int(os.getenv("ASGI_MONGO_MAX_POOL_SIZE", "200"))
+SPEECH_REGION = os.getenv("ALIBABA_SPEECH_REGION", "ap-southeast-1")
+# Seconds each readiness check may take
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "5"))
+
+_clients = {}
+_overrides = {}
+_pid = os.getpid()
+_lock = threading.Lock()
+
+
+def _client(name, factory):
+    global _pid
+    if name in _overrides:
+        return _overrides[name]
+
+    client = _clients.get(name)
+    if client is not None and _pid == os.getpid():
+        return client
+
+    with _lock:
+        if _pid != os.getpid():
+            # Pools inherited from the parent process are not fork-safe
+            _clients.clear()
+            _pid = os.getpid()
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = factory()
+        return client
+
+
+def _create_qwen():
+    import httpx
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=os.getenv("DASHSCOPE_API_KEY"),
+        base_url=QWEN_BASE_URL,
+        # Retries are done by llm.LlmGateway
+        max_retries=0,
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=QWEN_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(QWEN_TIMEOUT, connect=10.0)
+        )
+    )
+
+
+def _create_mongo():
+    from pymongo import MongoClient
+
+    # connect=False: the first operation opens the pool, not the import
+    return MongoClient(
+        os.getenv("MONGODB_CONNECTION_STRING"),
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        connect=False
+    )
+
+
+def _create_async_qwen():
+    import httpx
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=os.getenv("DASHSCOPE_API_KEY"),
+        base_url=QWEN_BASE_URL,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=ASGI_HTTP_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(QWEN_TIMEOUT, connect=10.0)
+        )
+    )
+
+
+def _create_async_http():
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=ASGI_HTTP_MAX_CONNECTIONS),
+        timeout=httpx.Timeout(QWEN_TIMEOUT, connect=10.0)
+    )
+
+
+def _create_async_mongo():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(
+        os.getenv("MONGODB_CONNECTION_STRING"),
+        maxPoolSize=ASGI_MONGO_MAX_POOL_SIZE
+    )
+
+
+def _create_bucket():
+    import oss2
+
+    oss2.defaults.connection_pool_size = OSS_CONNECTION_POOL_SIZE
+    auth = oss2.Auth(
+        os.getenv("OSS_ACCESS_KEY_ID"),
+        os.getenv("OSS_ACCESS_KEY_SECRET")
+    )
+    return oss2.Bucket(
+        auth,
+        os.getenv("OSS_ENDPOINT"),
+        os.getenv("OSS_BUCKET_NAME")
+    )
+
+
+def _create_speech():
+    from aliyunsdkcore.client import AcsClient
+
+    return AcsClient(
+        os.getenv("ALIBABA_SPEECH_ACCESS_KEY_ID"),
+        os.getenv("ALIBABA_SPEECH_ACCESS_KEY_SECRET"),
+        SPEECH_REGION
+    )
+
+
+def qwen():
+    """OpenAI-compatible client for DashScope (Qwen)"""
+    return _client("qwen", _create_qwen)
+
+
+def mongo():
+    return _client("mongo", _create_mongo)
+
+
+def database():
+    return mongo()[os.getenv("MONGODB_DATABASE", "aphasia_assistant")]
+
+
+def collection(name):
+    return database()[name]
+
+
+def async_qwen():
+    return _client("async_qwen", _create_async_qwen)
+
+
+def async_http():
+    """httpx.AsyncClient for plain downloads (e.g. synthesized audio)"""
+    return _client("async_http", _create_async_http)
+
+
+def async_collection(name):
+    """motor collection for the ASGI app"""
+    client = _client("async_mongo", _create_async_mongo)
+    return client[os.getenv("MONGODB_DATABASE", "aphasia_assistant")][name]
+
+
+def bucket():
+    """oss2 Bucket for media storage"""
+    return _client("bucket", _create_bucket)
+
+
+def speech():
+    """Aliyun AcsClient for Intelligent Speech Interaction (TTS)"""
+    return _client("speech", _create_speech)
+
+
+def configure(qwen=None, mongo=None, bucket=None, speech=None):
+    """Use the given clients instead of creating them from the environment"""
+    for name, client in (("qwen", qwen), ("mongo", mongo),
+                         ("bucket", bucket), ("speech", speech)):
+        if client is not None:
+            _overrides[name] = client
+
+
+def _check_qwen():
+    # Listing models is the cheapest authenticated DashScope call
+    qwen().with_options(timeout=READY_CHECK_TIMEOUT).models.list()
+
+
+def _check_speech():
+    from aliyunsdkcore.request import CommonRequest
+
+    # Issuing an NLS token proves the speech credentials and endpoint work
+    request = CommonRequest()
+    request.set_method("POST")
+    request.set_domain(f"nls-meta.{SPEECH_REGION}.aliyuncs.com")
+    request.set_version("2019-02-28")
+    request.set_action_name("CreateToken")
+    request.set_connect_timeout(int(READY_CHECK_TIMEOUT * 1000))
+    request.set_read_timeout(int(READY_CHECK_TIMEOUT * 1000))
+    speech().do_action_with_exception(request)
+
+
+def warm():
+    """Create every client and make one cheap call to its service
+
+    Returns name -> {"ok", "ms", "error"}; used by the readiness endpoint.
+    """
+    checks = {
+        "mongo": lambda: mongo().admin.command("ping"),
+        "oss": lambda: bucket().get_bucket_info(),
+        "qwen": _check_qwen,
+        "speech": _check_speech,
+    }
+    report = {}
+    for name, check in checks.items():
+        started = time.perf_counter()
+        try:
+            check()
+            report[name] = {"ok": True}
+        except Exception as e:
+            report[name] = {"ok": False, "error": str(e)}
+        report[name]["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return report
+
+
+class LazyClient:
+    """Stands in for a client (or collection) created on first attribute access
+
+    Lets module-level names such as items_collection stay in place while
+    the underlying client is only built, per process, when it is used.
+    """
+
+    def __init__(self, accessor, *args):
+        self._accessor = accessor
+        self._args = args
+
+    def __getattr__(self, name):
+        return getattr(self._accessor(*self._args), name)
+
+    def __getitem__(self, name):
+        return self._accessor(*self._args)[name]
@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskStatus:
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class Job:
+    """A unit of background work with status and progress tracking"""
+
+    def __init__(self, kind, payload=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload or {}
+        self.status = TaskStatus.PENDING
+        self.total = 0
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.events = []
+        self._lock = threading.Lock()
+        self._events_changed = threading.Condition(self._lock)
+        self._on_update = None
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+        self._touch()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.done += count
+        self._touch()
+
+    def emit(self, event, data):
+        """Record a progress event for streaming subscribers"""
+        with self._lock:
+            self.events.append({
+                "id": len(self.events) + 1,
+                "event": event,
+                "data": data,
+            })
+            self._events_changed.notify_all()
+
+    def is_finished(self):
+        return self.status in (TaskStatus.COMPLETED, TaskStatus.FAILED)
+
+    def wait_for_events(self, after, timeout=None):
+        """Block until events beyond index `after` exist or the job finishes"""
+        with self._lock:
+            self._events_changed.wait_for(
+                lambda: len(self.events) > after or self.is_finished(),
+                timeout
+            )
+            return self.events[after:]
+
+    def _touch(self):
+        self.updated_at = time.time()
+        if self._on_update:
+            self._on_update(self)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": {"done": self.done, "total": self.total},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+
+
+class JobQueue:
+    """Thread pool that runs jobs off the request thread"""
+
+    def __init__(self, max_workers=2, retention=60 * 60, on_update=None):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job")
+        self.retention = retention
+        self.on_update = on_update
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, payload=None):
+        """Queue fn(job, *args) and return the job immediately"""
+        job = Job(kind, payload)
+        job._on_update = self.on_update
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._touch()
+        self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending_count(self):
+        with self._lock:
+            return sum(
+                1 for job in self._jobs.values()
+                if job.status in (TaskStatus.PENDING, TaskStatus.PROCESSING))
+
+    def _run(self, job, fn, args):
+        job.status = TaskStatus.PROCESSING
+        job._touch()
+        try:
+            result = fn(job, *args)
+            job.emit(TaskStatus.COMPLETED, result)
+            job.result = result
+            job.status = TaskStatus.COMPLETED
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            job.emit(TaskStatus.FAILED, {"error": str(e)})
+            job.error = str(e)
+            job.status = TaskStatus.FAILED
+        with job._lock:
+            job._events_changed.notify_all()
+        job._touch()
+
+    def _prune(self):
+        # Drop finished jobs that are older than the retention window
+        cutoff = time.time() - self.retention
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.is_finished() and job.updated_at < cutoff
+        ]:
+            del self._jobs[job_id]
@@ -0,0 +1,315 @@
+"""Gateway for Qwen chat completions
+
+Every call goes through LlmGateway: deterministic (temperature 0) replies
+are cached by model and messages, in-flight calls are capped, each call has
+a timeout, and throttling or server errors are retried with jittered
+backoff. Both the sync client (Flask) and the async one (asgi.py) are
+supported, sharing the cache and counters.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ```json ... ``` or ``` ... ``` anywhere in a reply
+FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)```", re.DOTALL)
+
+
+class LlmUnavailable(Exception):
+    """The model could not be reached, even after retrying"""
+
+
+def extract_json(text):
+    """Parse the JSON value in a model reply
+
+    Accepts bare JSON, JSON in a Markdown fence, or JSON surrounded by
+    prose. Raises ValueError if the reply holds no JSON object or array.
+    """
+    text = text.strip()
+    candidates = [text] + [match.strip() for match in FENCE_PATTERN.findall(text)]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            pass
+
+    # First object or array that decodes, ignoring text around it
+    decoder = json.JSONDecoder()
+    for index, char in enumerate(text):
+        if char in "{[":
+            try:
+                return decoder.raw_decode(text, index)[0]
+            except ValueError:
+                continue
+    raise ValueError(f"No JSON found in model reply: {text[:200]!r}")
+
+
+def cache_key(model, messages, **params):
+    """Stable digest of a completion request"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU of completions in front of a MongoDB collection
+
+    The collection makes cached replies survive restarts and shared across
+    workers; if it is unavailable the cache keeps working in memory only.
+    """
+
+    def __init__(self, collection=None, async_collection=None, capacity=2048):
+        self.collection = collection
+        self.async_collection = async_collection
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        content = self._recall(key)
+        if content is None and self.collection is not None:
+            try:
+                doc = self.collection.find_one({"_id": key})
+            except Exception as e:
+                print(f"Error reading LLM cache: {str(e)}")
+                doc = None
+            if doc:
+                content = doc["content"]
+                self._remember(key, content)
+        return content
+
+    def put(self, key, model, content):
+        self._remember(key, content)
+        if self.collection is not None:
+            try:
+                self.collection.update_one(
+                    {"_id": key}, self._doc(model, content), upsert=True)
+            except Exception as e:
+                print(f"Error writing LLM cache: {str(e)}")
+
+    async def async_get(self, key):
+        content = self._recall(key)
+        if content is None and self.async_collection is not None:
+            try:
+                doc = await self.async_collection.find_one({"_id": key})
+            except Exception as e:
+                print(f"Error reading LLM cache: {str(e)}")
+                doc = None
+            if doc:
+                content = doc["content"]
+                self._remember(key, content)
+        return content
+
+    async def async_put(self, key, model, content):
+        self._remember(key, content)
+        if self.async_collection is not None:
+            try:
+                await self.async_collection.update_one(
+                    {"_id": key}, self._doc(model, content), upsert=True)
+            except Exception as e:
+                print(f"Error writing LLM cache: {str(e)}")
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.collection is not None:
+            try:
+                self.collection.delete_one({"_id": key})
+            except Exception as e:
+                print(f"Error writing LLM cache: {str(e)}")
+
+    def ensure_index(self, ttl):
+        """Expire persisted replies ttl seconds after they were written"""
+        if self.collection is not None:
+            self.collection.create_index("created_at", expireAfterSeconds=ttl)
+
+    def _recall(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+
+    def _remember(self, key, content):
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _doc(model, content):
+        from datetime import datetime, timezone
+
+        return {"$set": {"model": model, "content": content,
+                         "created_at": datetime.now(timezone.utc)}}
+
+
+def retry_delay(error, attempt, base, cap):
+    """Seconds to wait before retrying error, or None if it is not retryable
+
+    Honours Retry-After on throttling responses; otherwise full jitter
+    exponential backoff.
+    """
+    import openai
+
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            return min(float(retry_after), cap)
+        except (TypeError, ValueError):
+            pass
+    elif not isinstance(error, openai.APIConnectionError):
+        # Timeouts (APITimeoutError) are connection errors and are retried;
+        # anything else is not
+        return None
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LlmGateway:
+    """Cached, rate-capped and retried access to chat completions
+
+    Pass clients created with max_retries=0 so retries happen only here.
+    """
+
+    def __init__(self, client, async_client=None, cache=None,
+                 max_concurrency=8, timeout=60.0, max_retries=3,
+                 backoff=0.5, max_backoff=8.0):
+        self.client = client
+        self.async_client = async_client
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency
+        self.hits = 0
+        self.misses = 0
+        self.retries = 0
+        self.failures = 0
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphore = None
+        self._stats_lock = threading.Lock()
+
+    def complete(self, model, messages, temperature=0, timeout=None, cache=True):
+        """Return the reply text for messages"""
+        key = self._cacheable(model, messages, temperature, cache)
+        if key:
+            content = self.cache.get(key)
+            if self._count_lookup(content):
+                return content
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._semaphore:
+                    completion = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=timeout or self.timeout
+                    )
+                break
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                time.sleep(delay)
+
+        content = completion.choices[0].message.content
+        if key:
+            self.cache.put(key, model, content)
+        return content
+
+    def complete_json(self, model, messages, temperature=0, timeout=None):
+        """Return the JSON value in the reply; bad replies are not cached"""
+        content = self.complete(model, messages, temperature, timeout)
+        try:
+            return extract_json(content)
+        except ValueError:
+            self._forget(model, messages, temperature)
+            raise
+
+    async def async_complete(self, model, messages, temperature=0,
+                             timeout=None, cache=True):
+        """Async complete() over async_client"""
+        key = self._cacheable(model, messages, temperature, cache)
+        if key:
+            content = await self.cache.async_get(key)
+            if self._count_lookup(content):
+                return content
+
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._async_semaphore:
+                    completion = await self.async_client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=timeout or self.timeout
+                    )
+                break
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                await asyncio.sleep(delay)
+
+        content = completion.choices[0].message.content
+        if key:
+            await self.cache.async_put(key, model, content)
+        return content
+
+    async def async_complete_json(self, model, messages, temperature=0,
+                                  timeout=None):
+        content = await self.async_complete(model, messages, temperature, timeout)
+        try:
+            return extract_json(content)
+        except ValueError:
+            self._forget(model, messages, temperature)
+            raise
+
+    def stats(self):
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "retries": self.retries, "failures": self.failures}
+
+    def _cacheable(self, model, messages, temperature, cache):
+        # Only deterministic replies can be reused
+        if cache and self.cache is not None and temperature == 0:
+            return cache_key(model, messages)
+        return None
+
+    def _count_lookup(self, content):
+        with self._stats_lock:
+            if content is None:
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def _on_error(self, error, attempt):
+        """Return the delay before the next attempt, or raise"""
+        delay = retry_delay(error, attempt, self.backoff, self.max_backoff)
+        if delay is None:
+            raise error
+        if attempt >= self.max_retries:
+            with self._stats_lock:
+                self.failures += 1
+            raise LlmUnavailable(
+                f"Model unavailable after {attempt + 1} attempts: {str(error)}"
+            ) from error
+        with self._stats_lock:
+            self.retries += 1
+        print(f"Retrying model call in {delay:.2f}s: {str(error)}")
+        return delay
+
+    def _forget(self, model, messages, temperature):
+        key = self._cacheable(model, messages, temperature, True)
+        if key:
+            self.cache.discard(key)
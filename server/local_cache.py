@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; pins then only hold within a process
+    fcntl = None
+
+# Marker in the names of files that are still being written
+PARTIAL_MARKER = ".partial-"
+
+# Partial files of a live writer older than this are assumed abandoned
+PARTIAL_MAX_AGE = 6 * 60 * 60
+
+
+def writer_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to another user
+        return True
+    return True
+
+
+class LocalMediaCache:
+    """Byte-budgeted LRU over generated media kept on local disk
+
+    Writers produce files under temp_path() and commit() them, so the final
+    name only ever appears complete (rename is atomic within a directory).
+    The index maps path -> size and content digest, so a local copy can be
+    found by digest without touching OSS. Once the total size goes over
+    max_bytes the least recently used files are deleted; pinned files (being
+    uploaded or used as an I2V reference) are skipped until unpinned.
+
+    Several worker processes may share the directories. Pins are shared
+    flock()s, so no process evicts a file another one has pinned, and
+    partial files are only cleaned up once their writer is gone. The byte
+    budget and LRU order, however, are each process's own view: a process
+    counts the files it wrote or found in its last scan(), so the budget is
+    approximate when several processes write at once.
+    """
+
+    def __init__(self, index_path, max_bytes, roots=(),
+                 partial_max_age=PARTIAL_MAX_AGE):
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.roots = tuple(roots)
+        self.partial_max_age = partial_max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._digests = {}
+        # path -> [count, open file holding the shared lock]
+        self._pins = {}
+        self._total = 0
+        self._lock = threading.RLock()
+        self._load()
+        self.scan()
+
+    def temp_path(self, path):
+        """Sibling path to write to before commit(); keeps the extension
+
+        The name carries the writer's pid so scan() can tell files still
+        being written from ones a crashed process left behind.
+        """
+        base, ext = os.path.splitext(path)
+        return f"{base}{PARTIAL_MARKER}{os.getpid()}-{uuid.uuid4().hex[:8]}{ext}"
+
+    def commit(self, temp_path, path, digest=None):
+        """Atomically move a finished file into place and index it"""
+        os.replace(temp_path, path)
+        self.add(path, digest)
+        return path
+
+    def add(self, path, digest=None):
+        """Index a complete file at path and enforce the byte budget"""
+        size = os.path.getsize(path)
+        with self._lock:
+            self._remove_entry(path)
+            self._entries[path] = {"size": size, "digest": digest}
+            if digest:
+                self._digests[digest] = path
+            self._total += size
+            self._evict()
+            self._save()
+
+    def get(self, path):
+        """Return path if a complete local copy exists, marking it used"""
+        with self._lock:
+            if path in self._entries and os.path.exists(path):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return path
+            self.misses += 1
+            if path in self._entries:
+                # Deleted behind our back (another worker or an operator)
+                self._remove_entry(path)
+                self._save()
+                return None
+        if os.path.exists(path):
+            # A complete file we have not indexed yet, e.g. from before a restart
+            self.add(path)
+            return path
+        return None
+
+    def find(self, digest):
+        """Return the local path holding content with this digest, if any"""
+        with self._lock:
+            path = self._digests.get(digest)
+        return self.get(path) if path else None
+
+    def pin(self, path):
+        with self._lock:
+            pin = self._pins.get(path)
+            if pin:
+                pin[0] += 1
+                return
+            self._pins[path] = [1, self._lock_shared(path)]
+
+    def unpin(self, path):
+        with self._lock:
+            pin = self._pins.get(path)
+            if pin is None:
+                return
+            pin[0] -= 1
+            if pin[0] > 0:
+                return
+            del self._pins[path]
+            if pin[1]:
+                pin[1].close()
+            self._evict()
+            self._save()
+
+    def scan(self):
+        """Reconcile the index with the files actually under the roots"""
+        found = {}
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            for entry in os.scandir(root):
+                if not entry.is_file():
+                    continue
+                if PARTIAL_MARKER in entry.name:
+                    if self._abandoned(entry):
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+                    continue
+                found[entry.path] = entry.stat().st_size
+
+        with self._lock:
+            for path in [path for path in self._entries if path not in found]:
+                self._remove_entry(path)
+            for path, size in found.items():
+                entry = self._entries.get(path)
+                if entry is None:
+                    # Unknown files count as least recently used
+                    self._entries[path] = {"size": size, "digest": None}
+                    self._entries.move_to_end(path, last=False)
+                    self._total += size
+                elif entry["size"] != size:
+                    self._total += size - entry["size"]
+                    entry["size"] = size
+            self._evict()
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._total,
+                    "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+    def _abandoned(self, entry):
+        """True for a partial file whose writer has exited or given up"""
+        try:
+            if time.time() - entry.stat().st_mtime > self.partial_max_age:
+                return True
+        except OSError:
+            return False
+        pid = entry.name.split(PARTIAL_MARKER, 1)[1].split("-", 1)[0]
+        # Names without a pid predate it; only their age can tell
+        return pid.isdigit() and not writer_alive(int(pid))
+
+    def _lock_shared(self, path):
+        """Open path with a shared lock that keeps other processes from evicting it"""
+        if fcntl is None:
+            return None
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        fcntl.flock(f, fcntl.LOCK_SH)
+        return f
+
+    def _pinned_elsewhere(self, path):
+        """True if another process holds a pin (shared lock) on path"""
+        if fcntl is None:
+            return False
+        try:
+            with open(path, "rb") as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(f, fcntl.LOCK_UN)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def _evict(self):
+        for path in list(self._entries):
+            if self._total <= self.max_bytes:
+                return
+            if path in self._pins or self._pinned_elsewhere(path):
+                continue
+            self._remove_entry(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.evictions += 1
+
+    def _remove_entry(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return
+        self._total -= entry["size"]
+        if entry["digest"] and self._digests.get(entry["digest"]) == path:
+            del self._digests[entry["digest"]]
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for path, entry in entries:
+            self._entries[path] = entry
+            self._total += entry["size"]
+            if entry.get("digest"):
+                self._digests[entry["digest"]] = path
+
+    def _save(self):
+        # Ordered least to most recently used, written atomically
+        # Per-process temp name: workers sharing the index never interleave
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(list(self._entries.items()), f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Error saving local media index: {str(e)}")
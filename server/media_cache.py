@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; manifest merges then only hold within a process
+    fcntl = None
+
+MEDIA_PREFIXES = ("images/", "videos/", "audio/")
+
+
+class MediaCache:
+    """Content-addressed index of generated media stored in OSS
+
+    Assets are looked up by a digest of what produced them (model, prompt,
+    size, voice). An in-memory LRU sits in front of a JSON manifest on disk,
+    and the manifest's set of known OSS keys is the authority for existence
+    checks. The key set is refreshed by listing OSS prefixes in bulk rather
+    than issuing a HEAD per asset.
+
+    New entries are written to the manifest in batches, at most flush_delay
+    seconds after they are recorded, and merged with what other worker
+    processes wrote under a file lock.
+    """
+
+    def __init__(self, manifest_path, capacity=4096, reconcile_interval=6 * 60 * 60,
+                 retry_interval=60, flush_delay=1.0):
+        self.manifest_path = manifest_path
+        self.capacity = capacity
+        self.reconcile_interval = reconcile_interval
+        self.retry_interval = retry_interval
+        self.flush_delay = flush_delay
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._entries = {}
+        self._keys = set()
+        self._reconciled_at = 0
+        self._attempted_at = 0
+        self._reconcile_thread = None
+        self._manifest_mtime = None
+        self._flush_timer = None
+        self._lock = threading.RLock()
+        self._load()
+
+    @staticmethod
+    def digest(model, prompt, size=None, voice=None):
+        """Stable content address for a generated asset"""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "size": size, "voice": voice},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, digest):
+        """Return the OSS key stored for a digest, or None"""
+        with self._lock:
+            self._refresh()
+            oss_key = self._lru.get(digest)
+            if oss_key is None:
+                entry = self._entries.get(digest)
+                oss_key = entry["oss_key"] if entry else None
+            if oss_key is not None and oss_key in self._keys:
+                self._remember(digest, oss_key)
+                self.hits += 1
+                return oss_key
+            self.misses += 1
+            return None
+
+    def put(self, digest, oss_key):
+        """Record that digest is stored at oss_key"""
+        with self._lock:
+            self._entries[digest] = {"oss_key": oss_key, "created_at": time.time()}
+            self._keys.add(oss_key)
+            self._remember(digest, oss_key)
+            self._schedule_save()
+
+    def has_key(self, oss_key):
+        with self._lock:
+            self._refresh()
+            return oss_key in self._keys
+
+    def add_key(self, oss_key):
+        """Record that an object now exists in OSS"""
+        with self._lock:
+            if oss_key not in self._keys:
+                self._keys.add(oss_key)
+                self._schedule_save()
+
+    def lookup(self, digest, oss_key):
+        """Return oss_key if the asset exists, indexing it under digest"""
+        if self.get(digest) == oss_key:
+            return oss_key
+        if self.has_key(oss_key):
+            self.put(digest, oss_key)
+            return oss_key
+        return None
+
+    def flush(self):
+        """Write pending entries to the manifest now"""
+        with self._lock:
+            if self._flush_timer is None:
+                return
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._save()
+
+    def needs_reconcile(self):
+        """True if ensure_reconciled() has a listing to start or wait for"""
+        with self._lock:
+            if self._reconciling():
+                return not self._reconciled_at
+            return self._reconcile_due()
+
+    def reconcile(self, bucket, prefixes=MEDIA_PREFIXES):
+        """Replace the known key set with a bulk listing of OSS"""
+        import oss2
+
+        keys = set()
+        for prefix in prefixes:
+            for obj in oss2.ObjectIterator(bucket, prefix=prefix):
+                keys.add(obj.key)
+
+        with self._lock:
+            self._keys = keys
+            # Forget digests whose objects no longer exist
+            self._entries = {
+                digest: entry for digest, entry in self._entries.items()
+                if entry["oss_key"] in keys
+            }
+            self._lru = OrderedDict(
+                (digest, oss_key) for digest, oss_key in self._lru.items()
+                if oss_key in keys
+            )
+            self._reconciled_at = time.time()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self._save(merge=False)
+        print(f"Reconciled media cache with {len(keys)} OSS objects")
+
+    def ensure_reconciled(self, bucket):
+        """Reconcile against OSS in the background if the manifest is stale
+
+        One thread lists OSS at a time while callers keep using the current
+        manifest; only a cache that was never reconciled waits for it. A
+        failed listing is retried after retry_interval, not on every call.
+        """
+        with self._lock:
+            if not self._reconciling() and self._reconcile_due():
+                self._attempted_at = time.time()
+                self._reconcile_thread = threading.Thread(
+                    target=self._reconcile_quietly, args=(bucket,),
+                    daemon=True, name="media-reconcile")
+                self._reconcile_thread.start()
+            thread = self._reconcile_thread
+            first = not self._reconciled_at
+        if first and thread is not None:
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "keys": len(self._keys),
+            }
+
+    def _reconciling(self):
+        return self._reconcile_thread is not None and self._reconcile_thread.is_alive()
+
+    def _reconcile_due(self):
+        now = time.time()
+        return (now - self._reconciled_at > self.reconcile_interval
+                and now - self._attempted_at > self.retry_interval)
+
+    def _reconcile_quietly(self, bucket):
+        try:
+            self.reconcile(bucket)
+        except Exception as e:
+            print(f"Error reconciling media cache: {str(e)}")
+
+    def _remember(self, digest, oss_key):
+        self._lru[digest] = oss_key
+        self._lru.move_to_end(digest)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f), os.path.getmtime(self.manifest_path)
+        except (OSError, ValueError):
+            return None, None
+
+    def _load(self):
+        manifest, mtime = self._read_manifest()
+        if manifest:
+            self._entries = manifest.get("entries", {})
+            self._keys = set(manifest.get("keys", []))
+            self._reconciled_at = manifest.get("reconciled_at", 0)
+        self._manifest_mtime = mtime
+
+    def _refresh(self):
+        # Pick up entries written by other worker processes
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return
+        if mtime != self._manifest_mtime:
+            manifest, self._manifest_mtime = self._read_manifest()
+            if manifest:
+                self._entries.update(manifest.get("entries", {}))
+                self._keys.update(manifest.get("keys", []))
+                self._reconciled_at = max(
+                    self._reconciled_at, manifest.get("reconciled_at", 0))
+
+    def _schedule_save(self):
+        # Entries recorded within flush_delay share one manifest write. The
+        # timer is not a daemon, so pending entries are written before exit
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self._flush_due)
+            self._flush_timer.start()
+
+    def _flush_due(self):
+        with self._lock:
+            self._flush_timer = None
+        self._save()
+
+    def _save(self, merge=True):
+        lock_file = open(f"{self.manifest_path}.lock", "a")
+        try:
+            if fcntl is not None:
+                # Other workers merge and write under the same lock, so
+                # nobody overwrites entries it has not read yet
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self._lock:
+                if merge:
+                    self._refresh()
+                manifest = {
+                    "entries": dict(self._entries),
+                    "keys": list(self._keys),
+                    "reconciled_at": self._reconciled_at,
+                }
+            # Write then rename so other processes never read a partial manifest
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+            with self._lock:
+                self._manifest_mtime = os.path.getmtime(self.manifest_path)
+        finally:
+            lock_file.close()
@@ -0,0 +1,133 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans sub-millisecond cache hits up to multi-minute I2V renders
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60, 120, 300, 600)
+
+# Stage durations of the request being handled on this thread, if any
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus layout"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class Metrics:
+    """Per-stage timing histograms plus gauges read at scrape time
+
+    Use timer(stage) or @timed(stage) around work; render() returns the
+    Prometheus text exposition. Stages timed on a request thread are also
+    collected for that request's Server-Timing header.
+    """
+
+    def __init__(self, prefix="app", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._histograms = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, success=True):
+        key = (stage, "ok" if success else "error")
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            self.observe(stage, time.perf_counter() - started, success)
+
+    def timed(self, stage):
+        """Decorator form of timer()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def gauge(self, name, help_text, read, kind="gauge"):
+        """Register a value read at scrape time
+
+        read() returns a number, or a dict mapping label tuples such as
+        (("cache", "media"),) to numbers. Use kind="counter" for totals.
+        """
+        self._gauges.append((name, help_text, read, kind))
+
+    def start_request(self):
+        _request_timings.set({})
+
+    def server_timing(self, total=None):
+        """Server-Timing header value for the current request"""
+        timings = _request_timings.get() or {}
+        entries = [f"{stage};dur={seconds * 1000:.1f}"
+                   for stage, seconds in timings.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        _request_timings.set(None)
+        return ", ".join(entries)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each stage of request and job handling",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            for (stage, outcome), histogram in histograms:
+                labels = f'stage="{stage}",outcome="{outcome}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        for gauge_name, help_text, read, kind in self._gauges:
+            full_name = f"{self.prefix}_{gauge_name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            try:
+                value = read()
+            except Exception as e:
+                print(f"Error reading metric {full_name}: {str(e)}")
+                continue
+            if isinstance(value, dict):
+                for labels, sample in value.items():
+                    label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                    lines.append(f"{full_name}{{{label_text}}} {sample}")
+            else:
+                lines.append(f"{full_name} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,373 @@
+"""Pre-generate a whole catalog offline, without going through the web server
+
+    python pregenerate.py items.csv --checkpoint pregenerate.json
+
+Input is one of:
+  .json   {"items": [...]} as in data/categorized_data.json
+  .jsonl  one object per line: an item ({"name": ...}, optionally already
+          categorized) or {"items": "bread, tea"}
+  .csv    a "name" column, with optional category, subcategory and
+          ;-separated requests columns (without a header, the first
+          column is the name)
+
+Items that already carry a category, subcategory and requests skip Qwen.
+Categorization, images, videos and audio then run as stages, each with its
+own worker pool. Every finished unit is written to the checkpoint file, so
+a rerun after a crash resumes where the last run stopped; units that failed
+are retried. Media stages cover every item in the checkpoint, so keep one
+checkpoint per catalog. Per-stage throughput is printed at the end.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+STAGES = ("categorize", "images", "videos", "audio")
+
+
+def read_items(path):
+    """Return (names to categorize, already categorized items)"""
+    names = []
+    items = []
+
+    def add(entry):
+        if isinstance(entry, str):
+            names.extend(name.strip() for name in entry.split(",") if name.strip())
+        elif "items" in entry:
+            for nested in (entry["items"] if isinstance(entry["items"], list)
+                           else [entry["items"]]):
+                add(nested)
+        elif entry.get("category") and entry.get("subcategory") and entry.get("requests"):
+            items.append(entry)
+        elif entry.get("name"):
+            names.append(entry["name"].strip())
+
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension == ".json":
+            add(json.load(f))
+        elif extension == ".jsonl":
+            for line in f:
+                if line.strip():
+                    add(json.loads(line))
+        elif extension == ".csv":
+            rows = list(csv.reader(f))
+            header = [column.strip().lower() for column in rows[0]] if rows else []
+            if "name" in header:
+                for row in rows[1:]:
+                    entry = dict(zip(header, (value.strip() for value in row)))
+                    if entry.get("requests"):
+                        entry["requests"] = [request.strip() for request
+                                             in entry["requests"].split(";")
+                                             if request.strip()]
+                    add(entry)
+            else:
+                for row in rows:
+                    if row and row[0].strip():
+                        names.append(row[0].strip())
+        else:
+            raise ValueError(f"Unsupported input format: {path}")
+    return names, items
+
+
+class Checkpoint:
+    """Finished and failed units per stage, persisted as JSON
+
+    Writes are atomic (temp file + rename) and at most every save_interval
+    seconds; call save() once more at the end.
+    """
+
+    def __init__(self, path, save_interval=2.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._saved_at = 0
+        self._lock = threading.Lock()
+        self.data = {"items": {}, "done": {}, "failed": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        for stage in STAGES:
+            self.data["done"].setdefault(stage, {})
+            # Failures are retried on every run
+            self.data["failed"][stage] = {}
+
+    def items(self):
+        with self._lock:
+            return list(self.data["items"].values())
+
+    def add_item(self, key, item):
+        with self._lock:
+            self.data["items"][key] = item
+        self._maybe_save()
+
+    def done(self, stage):
+        with self._lock:
+            return dict(self.data["done"][stage])
+
+    def record(self, stage, unit, result):
+        with self._lock:
+            self.data["done"][stage][unit] = result
+            self.data["failed"][stage].pop(unit, None)
+        self._maybe_save()
+
+    def fail(self, stage, unit, error):
+        with self._lock:
+            self.data["failed"][stage][unit] = error
+        self._maybe_save()
+
+    def failed(self, stage):
+        with self._lock:
+            return dict(self.data["failed"][stage])
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._saved_at = time.time()
+
+    def _maybe_save(self):
+        if time.time() - self._saved_at >= self.save_interval:
+            self.save()
+
+
+class StageReport:
+    """Counts and timing for one stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.total = 0
+        self.skipped = 0
+        self.done = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def row(self):
+        return {
+            "stage": self.name,
+            "units": self.total,
+            "resumed": self.skipped,
+            "done": self.done,
+            "failed": self.failed,
+            "seconds": round(self.seconds, 2),
+            "units_per_s": round(self.done / self.seconds, 3) if self.seconds else 0.0,
+        }
+
+
+def chunked(units, size):
+    return [units[start:start + size] for start in range(0, len(units), size)]
+
+
+def run_stage(report, checkpoint, units, work, workers, chunk_size=1):
+    """Run work(chunk) -> {unit: result or None} over every unfinished unit
+
+    Units already done in the checkpoint are skipped; a None result or an
+    exception marks the unit failed.
+    """
+    done = checkpoint.done(report.name)
+    pending = [unit for unit in dict.fromkeys(units) if unit not in done]
+    report.total = len(pending) + len(set(units) & set(done))
+    report.skipped = report.total - len(pending)
+    if not pending:
+        return
+
+    print(f"{report.name}: {len(pending)} to do, {report.skipped} already done",
+          file=sys.stderr)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix=report.name) as executor:
+        futures = {executor.submit(work, chunk): chunk
+                   for chunk in chunked(pending, chunk_size)}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                results = future.result()
+                error = "no result"
+            except Exception as e:
+                print(f"Error in {report.name} for {', '.join(chunk)}: {str(e)}")
+                results = {}
+                error = str(e)
+            for unit in chunk:
+                if results.get(unit) is not None:
+                    checkpoint.record(report.name, unit, results[unit])
+                    report.done += 1
+                else:
+                    checkpoint.fail(report.name, unit, error)
+                    report.failed += 1
+            print(f"{report.name}: {report.done + report.failed}/{len(pending)}",
+                  file=sys.stderr)
+    report.seconds = time.perf_counter() - started
+
+
+def categorize_stage(server, checkpoint, report, names, items, args):
+    """Save pre-categorized items as they are and categorize the rest with Qwen"""
+    # Normalized name -> raw name to categorize, or an item to keep
+    units = {server.normalize_item_name(name): name for name in names}
+    units.update((server.normalize_item_name(item["name"]), item) for item in items)
+
+    def categorize(chunk):
+        given = [units[key] for key in chunk if isinstance(units[key], dict)]
+        raw = [units[key] for key in chunk if not isinstance(units[key], dict)]
+        categorized, new_items = (
+            server.categorize_incrementally(", ".join(raw)) if raw else ([], []))
+        new_items += given
+        if new_items and not server.save_data_to_mongodb({"items": new_items}):
+            raise RuntimeError("could not save items to MongoDB")
+
+        by_name = {server.normalize_item_name(item["name"]): item
+                   for item in categorized + given}
+        unmatched = [key for key in chunk if key not in by_name]
+        renamed = [item for key, item in by_name.items() if key not in chunk]
+        # Qwen rewrote some names; pair them up by order, as the server does
+        if len(unmatched) == len(renamed):
+            by_name.update(zip(unmatched, renamed))
+
+        results = {}
+        for key in chunk:
+            if key in by_name:
+                checkpoint.add_item(key, by_name[key])
+                results[key] = by_name[key]["name"]
+        return results
+
+    run_stage(report, checkpoint, list(units), categorize,
+              args.categorize_workers, args.categorize_batch)
+
+
+def images_stage(server, checkpoint, report, args):
+    items = checkpoint.items()
+    categories, subcategories = server.collect_categories(items)
+    image_requests = server.collect_image_requests(items, categories, subcategories)
+    prompts = {filename: prompt for _, prompt, filename in image_requests}
+
+    def generate(chunk):
+        return server.generate_images_batch(
+            [(prompts[filename], filename) for filename in chunk])
+
+    run_stage(report, checkpoint, list(prompts), generate,
+              args.image_workers, server.IMAGE_BATCH_SIZE)
+
+    done = checkpoint.done("images")
+    return {mapping_key: done[filename]
+            for mapping_key, _, filename in image_requests if filename in done}
+
+
+def videos_stage(server, checkpoint, report, args):
+    actions = {}
+    for item in checkpoint.items():
+        for action in item.get("requests", []):
+            actions[f"{item['name']}-{action}"] = (item["name"], action)
+
+    def generate(chunk):
+        results = {}
+        for video_key in chunk:
+            item_name, action = actions[video_key]
+            results[video_key] = server.generate_video(
+                item_name, action, server.action_video_filename(video_key))
+        return results
+
+    run_stage(report, checkpoint, list(actions), generate, args.video_workers)
+    done = checkpoint.done("videos")
+    return {video_key: done[video_key] for video_key in actions if video_key in done}
+
+
+def audio_stage(server, checkpoint, report, args):
+    items = checkpoint.items()
+    categories, subcategories = server.collect_categories(items)
+    phrases = (sorted(categories)
+               + sorted({subcategory for _, subcategory in subcategories})
+               + [item["name"] for item in items])
+
+    run_stage(report, checkpoint, phrases, server.tts_pipeline.synthesize_many,
+              args.audio_workers, args.audio_batch)
+    done = checkpoint.done("audio")
+    return {phrase: done[phrase] for phrase in phrases if phrase in done}
+
+
+def print_report(rows):
+    header = f"{'stage':<12}{'units':>8}{'resumed':>9}{'done':>8}{'failed':>8}{'seconds':>10}{'units/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['stage']:<12}{row['units']:>8}{row['resumed']:>9}"
+              f"{row['done']:>8}{row['failed']:>8}{row['seconds']:>10}"
+              f"{row['units_per_s']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help=".json, .jsonl or .csv list of items")
+    parser.add_argument("--checkpoint",
+                        help="progress file; rerun with the same one to resume "
+                             "(default: pregenerate.json in DATA_DIR)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="comma separated subset of " + ",".join(STAGES))
+    parser.add_argument("--categorize-workers", type=int, default=2)
+    parser.add_argument("--categorize-batch", type=int, default=20,
+                        help="item names per Qwen call")
+    parser.add_argument("--image-workers", type=int, default=1)
+    parser.add_argument("--video-workers", type=int, default=2)
+    parser.add_argument("--audio-workers", type=int, default=2)
+    parser.add_argument("--audio-batch", type=int, default=50,
+                        help="phrases submitted to TTS together")
+    parser.add_argument("--json", help="also write the report rows to this file")
+    args = parser.parse_args()
+
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    names, items = read_items(args.input)
+
+    # Imported here so --help works without the server's dependencies
+    import app as server
+
+    checkpoint = Checkpoint(
+        args.checkpoint or os.path.join(server.DATA_DIR, "pregenerate.json"))
+
+    reports = {stage: StageReport(stage) for stage in stages}
+    try:
+        if "categorize" in stages:
+            categorize_stage(server, checkpoint, reports["categorize"],
+                             names, items, args)
+        mappings = {}
+        if "images" in stages:
+            mappings["images"] = images_stage(
+                server, checkpoint, reports["images"], args)
+        if "videos" in stages:
+            mappings["videos"] = videos_stage(
+                server, checkpoint, reports["videos"], args)
+        if "audio" in stages:
+            mappings["audio"] = audio_stage(
+                server, checkpoint, reports["audio"], args)
+
+        # Renditions are uploaded in the background; let them land
+        while server.uploader.pending_count():
+            time.sleep(0.2)
+        if mappings and not server.save_data_to_mongodb(mappings):
+            print("Error saving media mappings; rerun to save them")
+    finally:
+        checkpoint.save()
+
+    rows = [reports[stage].row() for stage in stages]
+    print()
+    print_report(rows)
+    failed = {stage: checkpoint.failed(stage) for stage in stages}
+    for stage, units in failed.items():
+        if units:
+            print(f"{stage}: {len(units)} failed, rerun to retry "
+                  f"(e.g. {', '.join(list(units)[:5])})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 1 if any(failed.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
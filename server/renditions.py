@@ -0,0 +1,82 @@
+import os
+import subprocess
+
+# Height of the low-bitrate rendition; width keeps the aspect ratio
+LOW_HEIGHT = int(os.getenv("VIDEO_LOW_HEIGHT", "360"))
+LOW_MAX_BITRATE = os.getenv("VIDEO_LOW_MAX_BITRATE", "400k")
+
+# ffmpeg output options per rendition, all encoded from one decode
+RENDITION_OPTIONS = {
+    # Same streams with the moov atom at the front, so playback can start
+    # before the whole file has downloaded
+    "full": ["-map", "0", "-c", "copy", "-movflags", "+faststart"],
+    "low": [
+        "-map", "0:v:0", "-an",
+        "-vf", f"scale=-2:{LOW_HEIGHT}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+        "-maxrate", LOW_MAX_BITRATE, "-bufsize", "800k",
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+    ],
+    # One frame a second in, past any fade from the reference image
+    "poster": ["-map", "0:v:0", "-ss", "1", "-frames:v", "1", "-q:v", "3"],
+}
+
+# Network hints that make the low rendition the better choice
+SLOW_CONNECTIONS = {"slow-2g", "2g", "3g"}
+LOW_DOWNLINK_MBPS = 1.5
+
+# Client hints choose_rendition() reads; sent back as Vary and Accept-CH
+RENDITION_HINTS = "Save-Data, ECT, Downlink"
+
+
+def rendition_path(video_path, name):
+    """Local path or OSS key of a rendition, derived from the video's own
+
+    "full" is the video itself; e.g. videos/tea_add_ice.mp4 has
+    videos/tea_add_ice_low.mp4 and videos/tea_add_ice_poster.jpg.
+    """
+    if name == "full":
+        return video_path
+    stem = os.path.splitext(video_path)[0]
+    return f"{stem}_poster.jpg" if name == "poster" else f"{stem}_{name}.mp4"
+
+
+def transcode(source, outputs, ffmpeg="ffmpeg", timeout=300):
+    """Write each rendition in outputs (name -> path) from source with ffmpeg
+
+    Returns True if ffmpeg succeeded. Runs once for all outputs, so the
+    source is decoded a single time.
+    """
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-i", source]
+    for name, path in outputs.items():
+        cmd += RENDITION_OPTIONS[name] + [path]
+    try:
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout
+        )
+        return True
+    except (OSError, subprocess.SubprocessError) as e:
+        stderr = getattr(e, "stderr", None)
+        detail = stderr.decode(errors="replace").strip() if stderr else str(e)
+        print(f"Error transcoding {source}: {detail}")
+        return False
+
+
+def choose_rendition(quality, headers):
+    """Return "low" or "full" from an explicit ?quality= or client hints"""
+    if quality in ("low", "full"):
+        return quality
+    if headers.get("Save-Data", "").lower() == "on":
+        return "low"
+    if headers.get("ECT", "").lower() in SLOW_CONNECTIONS:
+        return "low"
+    try:
+        if float(headers.get("Downlink", "")) < LOW_DOWNLINK_MBPS:
+            return "low"
+    except ValueError:
+        pass
+    return "full"
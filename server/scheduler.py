@@ -0,0 +1,109 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+
+class Priority:
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class GpuScheduler:
+    """Admits GPU work per model with a concurrency limit and priority lanes
+
+    Callers block in run() until their model has a free slot and no
+    higher-priority (or earlier same-priority) caller is waiting. Calls that
+    share a key coalesce onto the one already queued or running; if an
+    interactive caller joins a queued bulk call, the call is promoted.
+    """
+
+    def __init__(self, limits=None, default_limit=1):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.coalesced = 0
+        self._running = {}
+        self._waiting = {}
+        self._in_flight = {}
+        self._tickets = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._slots_changed = threading.Condition(self._lock)
+
+    def run(self, model, fn, *args, priority=Priority.BULK, key=None):
+        """Run fn(*args) once a slot for model is free and return its result"""
+        with self._lock:
+            future = self._in_flight.get(key) if key is not None else None
+            owner = future is None
+            if owner:
+                future = Future()
+                if key is not None:
+                    self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+                self._promote(model, key, priority)
+        if not owner:
+            return future.result()
+
+        try:
+            self._acquire(model, priority, key)
+            try:
+                result = fn(*args)
+            finally:
+                self._release(model)
+        except BaseException as e:
+            future.set_exception(e)
+            self._forget(key, future)
+            raise
+        future.set_result(result)
+        self._forget(key, future)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": dict(self._running),
+                "waiting": {
+                    model: len(waiting)
+                    for model, waiting in self._waiting.items()
+                },
+                "coalesced": self.coalesced,
+            }
+
+    def _limit(self, model):
+        return self.limits.get(model, self.default_limit)
+
+    def _acquire(self, model, priority, key):
+        ticket = [priority, next(self._counter)]
+        with self._lock:
+            waiting = self._waiting.setdefault(model, [])
+            heapq.heappush(waiting, ticket)
+            if key is not None:
+                self._tickets[key] = ticket
+            self._slots_changed.wait_for(
+                lambda: waiting[0] is ticket and
+                self._running.get(model, 0) < self._limit(model))
+            heapq.heappop(waiting)
+            self._tickets.pop(key, None)
+            self._running[model] = self._running.get(model, 0) + 1
+            # The next waiter may also fit under the limit
+            self._slots_changed.notify_all()
+
+    def _release(self, model):
+        with self._lock:
+            self._running[model] -= 1
+            self._slots_changed.notify_all()
+
+    def _promote(self, model, key, priority):
+        ticket = self._tickets.get(key)
+        if ticket is not None and priority < ticket[0]:
+            ticket[0] = priority
+            heapq.heapify(self._waiting[model])
+            self._slots_changed.notify_all()
+
+    def _forget(self, key, future):
+        if key is None:
+            return
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SignedUrlCache:
+    """Reuses signed OSS URLs until shortly before they expire"""
+
+    def __init__(self, sign, ttl=3600, refresh_margin=300, capacity=20000):
+        self.sign = sign
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, oss_key):
+        """Return a signed GET URL for oss_key, valid for at least the margin"""
+        return self.get_with_expiry(oss_key)[0]
+
+    def get_with_expiry(self, oss_key, min_validity=None):
+        """Return (url, expires_at) valid for at least min_validity seconds"""
+        if min_validity is None:
+            min_validity = self.refresh_margin
+        now = time.time()
+        with self._lock:
+            cached = self._urls.get(oss_key)
+            if cached and cached[1] - min_validity > now:
+                self._urls.move_to_end(oss_key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        # Signing is a local HMAC, so do it outside the lock
+        entry = (self.sign(oss_key, self.ttl), now + self.ttl)
+        with self._lock:
+            self._urls[oss_key] = entry
+            self._urls.move_to_end(oss_key)
+            while len(self._urls) > self.capacity:
+                self._urls.popitem(last=False)
+        return entry
+
+    def get_many(self, oss_keys, min_validity=None):
+        """Sign a list of keys, returning key -> (url, expires_at)"""
+        return {
+            oss_key: self.get_with_expiry(oss_key, min_validity)
+            for oss_key in oss_keys
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._urls)}
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+
+class MongoLease:
+    """Cross-process lock on a key, stored as a document with an expiry
+
+    The holder renews the lease while its work runs (see SingleFlight), so
+    only a lease that is not released because the worker died lapses after
+    ttl seconds and can be taken over by another worker.
+    """
+
+    def __init__(self, collection, ttl=15 * 60):
+        self.collection = collection
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def ensure_index(self):
+        # Let MongoDB clean up lapsed leases on its own
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def acquire(self, key):
+        """Take the lease for key; returns False if another worker holds it"""
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.update_one(
+                {"_id": key,
+                 "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner,
+                          "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            # Without MongoDB we can still deduplicate within this process
+            print(f"Error acquiring lease {key}: {str(e)}")
+            return True
+
+    def renew(self, key):
+        """Push back the expiry of a lease we hold; False if it was lost"""
+        try:
+            result = self.collection.update_one(
+                {"_id": key, "owner": self.owner},
+                {"$set": {"expires_at": datetime.now(timezone.utc)
+                          + timedelta(seconds=self.ttl)}}
+            )
+            return result.matched_count > 0
+        except Exception as e:
+            # Keep going; the next heartbeat tries again
+            print(f"Error renewing lease {key}: {str(e)}")
+            return True
+
+    def release(self, key):
+        try:
+            self.collection.delete_one({"_id": key, "owner": self.owner})
+        except Exception as e:
+            print(f"Error releasing lease {key}: {str(e)}")
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one execution
+
+    Threads in this process wait on the call already in flight. With a
+    lease, workers in other processes wait too: they poll check() until the
+    owner's result shows up (or the lease frees) instead of generating the
+    same asset again.
+    """
+
+    def __init__(self, lease=None, poll_interval=2.0):
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.shared = 0
+        self.waited = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, check=None):
+        """Return fn(*args), or the result of an identical call in flight"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.shared += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._run(key, fn, args, check)
+        except BaseException as e:
+            future.set_exception(e)
+            self._forget(key)
+            raise
+        future.set_result(result)
+        self._forget(key)
+        return result
+
+    async def async_do(self, key, fn, *args, check=None):
+        """Awaitable do() for a coroutine function fn
+
+        Shares the in-flight table with do(), so sync and async callers of
+        the same key still collapse into one execution. Lease calls run on
+        the default executor; waiting happens on the event loop.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.shared += 1
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await self._async_run(key, fn, args, check)
+        except BaseException as e:
+            future.set_exception(e)
+            self._forget(key)
+            raise
+        future.set_result(result)
+        self._forget(key)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"shared": self.shared, "waited": self.waited,
+                    "in_flight": len(self._in_flight)}
+
+    def _run(self, key, fn, args, check):
+        if self.lease is None:
+            return fn(*args)
+
+        waited = False
+        while not self.lease.acquire(key):
+            if not waited:
+                waited = True
+                with self._lock:
+                    self.waited += 1
+            time.sleep(self.poll_interval)
+            if check:
+                result = check()
+                if result:
+                    return result
+
+        # Renew the lease while fn runs, however long the GPU queue and the
+        # render take, so it never lapses under a live generation
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(key, stop), daemon=True,
+            name=f"lease-{key}")
+        heartbeat.start()
+        try:
+            return fn(*args)
+        finally:
+            stop.set()
+            heartbeat.join()
+            self.lease.release(key)
+
+    async def _async_run(self, key, fn, args, check):
+        if self.lease is None:
+            return await fn(*args)
+
+        loop = asyncio.get_running_loop()
+        waited = False
+        while not await loop.run_in_executor(None, self.lease.acquire, key):
+            if not waited:
+                waited = True
+                with self._lock:
+                    self.waited += 1
+            await asyncio.sleep(self.poll_interval)
+            if check:
+                result = await loop.run_in_executor(None, check)
+                if result:
+                    return result
+
+        heartbeat = asyncio.ensure_future(self._async_heartbeat(key))
+        try:
+            return await fn(*args)
+        finally:
+            heartbeat.cancel()
+            await loop.run_in_executor(None, self.lease.release, key)
+
+    async def _async_heartbeat(self, key):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.lease.ttl / 3)
+            if not await loop.run_in_executor(None, self.lease.renew, key):
+                print(f"Lease {key} was lost while generating")
+                return
+
+    def _heartbeat(self, key, stop):
+        while not stop.wait(self.lease.ttl / 3):
+            if not self.lease.renew(key):
+                print(f"Lease {key} was lost while generating")
+                return
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+import time
+
+# Tests import the server modules directly, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app must not touch server/data or reach real services
+_scratch = tempfile.mkdtemp(prefix="server-tests-")
+os.environ.setdefault("DATA_DIR", os.path.join(_scratch, "data"))
+os.environ.setdefault("TEMP_DIR", os.path.join(_scratch, "temp"))
+os.environ.setdefault("WAN_WORKER_ADDRESS", "")
+os.environ.setdefault(
+    "MONGODB_CONNECTION_STRING",
+    "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100")
+
+
+def wait_until(condition, timeout=5):
+    """Poll condition until it is true; fail the test after timeout seconds"""
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("timed out waiting for condition")
+        time.sleep(0.005)
@@ -0,0 +1,150 @@
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from llm import LlmGateway, LlmUnavailable, ResponseCache, cache_key, extract_json
+
+ITEMS = {"items": [{"name": "water", "category": "food and drinks"}]}
+
+
+@pytest.mark.parametrize("reply", [
+    '{"items": [{"name": "water", "category": "food and drinks"}]}',
+    '```json\n{"items": [{"name": "water", "category": "food and drinks"}]}\n```',
+    '```\n{"items": [{"name": "water", "category": "food and drinks"}]}```',
+    'Here is the JSON:\n```json\n{"items": [{"name": "water", '
+    '"category": "food and drinks"}]}\n```\nLet me know!',
+    'Sure! {"items": [{"name": "water", "category": "food and drinks"}]} Hope this helps.',
+    '  \n{"items": [{"name": "water", "category": "food and drinks"}]}\n  ',
+])
+def test_extracts_json_however_it_is_wrapped(reply):
+    assert extract_json(reply) == ITEMS
+
+
+def test_skips_braces_that_are_not_json():
+    reply = 'Items {water} are below: {"items": []}'
+    assert extract_json(reply) == {"items": []}
+
+
+def test_arrays_are_accepted():
+    assert extract_json('Result: [1, 2, 3]') == [1, 2, 3]
+
+
+@pytest.mark.parametrize("reply", ["", "no json here", "{not: valid", "```json\n```"])
+def test_replies_without_json_raise_value_error(reply):
+    with pytest.raises(ValueError):
+        extract_json(reply)
+
+
+def test_cache_key_is_stable_and_distinguishes_requests():
+    messages = [{"role": "user", "content": "tea, water"}]
+    assert cache_key("qwen-max", messages) == cache_key("qwen-max", list(messages))
+    assert cache_key("qwen-max", messages) != cache_key("qwen-vl", messages)
+    assert cache_key("qwen-max", messages) != cache_key(
+        "qwen-max", [{"role": "user", "content": "water, tea"}])
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(capacity=2)
+    cache.put("a", "qwen-max", "A")
+    cache.put("b", "qwen-max", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "qwen-max", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+    cache.discard("a")
+    assert cache.get("a") is None
+
+
+def reply(content):
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://example.invalid/v1/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+class FakeClient:
+    """Stands in for an OpenAI client, replaying outcomes in order"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return reply(outcome)
+
+
+MESSAGES = [{"role": "user", "content": "water"}]
+
+
+def gateway(client, **kwargs):
+    kwargs.setdefault("cache", ResponseCache())
+    return LlmGateway(client, backoff=0, max_backoff=0, **kwargs)
+
+
+def test_deterministic_replies_are_cached():
+    client = FakeClient('{"a": 1}')
+    llm = gateway(client)
+
+    assert llm.complete_json("qwen-max", MESSAGES) == {"a": 1}
+    assert llm.complete_json("qwen-max", MESSAGES) == {"a": 1}
+    assert client.calls == 1
+    assert llm.stats()["hits"] == 1
+
+
+def test_sampled_replies_are_not_cached():
+    client = FakeClient("one", "two")
+    llm = gateway(client)
+
+    assert llm.complete("qwen-max", MESSAGES, temperature=0.7) == "one"
+    assert llm.complete("qwen-max", MESSAGES, temperature=0.7) == "two"
+
+
+def test_unparseable_replies_are_not_cached():
+    client = FakeClient("sorry, no", '{"a": 1}')
+    llm = gateway(client)
+
+    with pytest.raises(ValueError):
+        llm.complete_json("qwen-max", MESSAGES)
+    assert llm.complete_json("qwen-max", MESSAGES) == {"a": 1}
+    assert client.calls == 2
+
+
+def test_throttling_and_server_errors_are_retried():
+    client = FakeClient(status_error(429, {"retry-after": "0"}), status_error(503), "ok")
+    llm = gateway(client)
+
+    assert llm.complete("qwen-max", MESSAGES) == "ok"
+    assert llm.stats()["retries"] == 2
+
+
+def test_client_errors_are_not_retried():
+    client = FakeClient(status_error(400), "ok")
+    llm = gateway(client)
+
+    with pytest.raises(openai.APIStatusError):
+        llm.complete("qwen-max", MESSAGES)
+    assert client.calls == 1
+
+
+def test_gives_up_after_max_retries():
+    client = FakeClient(*[status_error(500)] * 3)
+    llm = gateway(client, max_retries=2)
+
+    with pytest.raises(LlmUnavailable):
+        llm.complete("qwen-max", MESSAGES)
+    assert client.calls == 3
+    assert llm.stats()["failures"] == 1
@@ -0,0 +1,142 @@
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+import pytest
+
+from local_cache import LocalMediaCache
+
+
+@pytest.fixture
+def media_dir(tmp_path):
+    path = tmp_path / "videos"
+    path.mkdir()
+    return path
+
+
+def write(path, size):
+    path.write_bytes(b"0" * size)
+    return str(path)
+
+
+def cache_for(tmp_path, media_dir, max_bytes=250, **kwargs):
+    return LocalMediaCache(
+        str(tmp_path / "index.json"), max_bytes, roots=[str(media_dir)], **kwargs)
+
+
+def test_evicts_least_recently_used_files_over_budget(tmp_path, media_dir):
+    cache = cache_for(tmp_path, media_dir)
+    a = write(media_dir / "a.mp4", 100)
+    b = write(media_dir / "b.mp4", 100)
+    cache.add(a)
+    cache.add(b)
+    # Using a makes b the least recently used
+    assert cache.get(a) == a
+
+    c = write(media_dir / "c.mp4", 100)
+    cache.add(c)
+
+    assert os.path.exists(a) and os.path.exists(c)
+    assert not os.path.exists(b)
+    assert cache.stats()["bytes"] == 200
+    assert cache.stats()["evictions"] == 1
+
+
+def test_pinned_files_are_not_evicted(tmp_path, media_dir):
+    cache = cache_for(tmp_path, media_dir, max_bytes=150)
+    a = write(media_dir / "a.mp4", 100)
+    b = write(media_dir / "b.mp4", 100)
+    cache.add(a)
+    cache.pin(a)
+    cache.pin(b)
+    cache.add(b)
+
+    # Over budget, but nothing can go while both are pinned
+    assert os.path.exists(a) and os.path.exists(b)
+    assert cache.stats()["bytes"] == 200
+
+    # Unpinning makes the least recently used file evictable again
+    cache.unpin(a)
+    assert not os.path.exists(a)
+    assert os.path.exists(b)
+
+
+def test_commit_moves_a_partial_file_into_place(tmp_path, media_dir):
+    cache = cache_for(tmp_path, media_dir)
+    final = str(media_dir / "tea.mp4")
+    temp = cache.temp_path(final)
+    assert temp.endswith(".mp4") and temp != final
+    write(pathlib.Path(temp), 10)
+
+    cache.commit(temp, final, digest="abc")
+
+    assert not os.path.exists(temp)
+    assert cache.find("abc") == final
+
+
+def test_find_and_get_miss_deleted_files(tmp_path, media_dir):
+    cache = cache_for(tmp_path, media_dir)
+    path = write(media_dir / "a.mp4", 10)
+    cache.add(path, digest="abc")
+    os.remove(path)
+
+    assert cache.find("abc") is None
+    assert cache.get(path) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_index_survives_a_restart(tmp_path, media_dir):
+    cache = cache_for(tmp_path, media_dir)
+    path = write(media_dir / "a.mp4", 10)
+    cache.add(path, digest="abc")
+
+    restarted = cache_for(tmp_path, media_dir)
+    assert restarted.find("abc") == path
+    # Files written while the process was down are picked up by scan()
+    other = write(media_dir / "b.mp4", 10)
+    restarted.scan()
+    assert restarted.stats()["entries"] == 2
+    assert restarted.get(other) == other
+
+
+def test_scan_keeps_partials_of_live_writers(tmp_path, media_dir):
+    live = media_dir / f"a.partial-{os.getpid()}-0000aaaa.mp4"
+    dead = media_dir / "b.partial-999999999-0000bbbb.mp4"
+    stale = media_dir / f"c.partial-{os.getpid()}-0000cccc.mp4"
+    for path in (live, dead, stale):
+        write(path, 10)
+    old = time.time() - 3600
+    os.utime(stale, (old, old))
+
+    cache_for(tmp_path, media_dir, partial_max_age=60)
+
+    assert live.exists()
+    assert not dead.exists()
+    assert not stale.exists()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="pins use flock")
+def test_files_pinned_by_another_process_are_not_evicted(tmp_path, media_dir):
+    a = write(media_dir / "a.mp4", 100)
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    holder = subprocess.Popen(
+        [sys.executable, "-c", (
+            "import sys, time\n"
+            f"sys.path.insert(0, {server_dir!r})\n"
+            "from local_cache import LocalMediaCache\n"
+            f"cache = LocalMediaCache({str(tmp_path / 'other.json')!r}, 10**9)\n"
+            f"cache.pin({a!r})\n"
+            "print('pinned', flush=True)\n"
+            "sys.stdin.read()\n"
+        )],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "pinned"
+        cache = cache_for(tmp_path, media_dir, max_bytes=150)
+        cache.add(write(media_dir / "b.mp4", 100))
+        assert os.path.exists(a)
+    finally:
+        holder.stdin.close()
+        holder.wait()
@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+from conftest import wait_until
+from media_cache import MediaCache
+
+
+class FakeBucket:
+    """Answers oss2.ObjectIterator listings from a fixed key list"""
+
+    def __init__(self, keys=(), error=None):
+        self.keys = list(keys)
+        self.error = error
+        self.listings = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def list_objects(self, prefix="", marker="", **kwargs):
+        self.listings += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        objects = [SimpleNamespace(key=key) for key in self.keys
+                   if key.startswith(prefix)]
+        return SimpleNamespace(object_list=objects, prefix_list=[],
+                               is_truncated=False, next_marker="")
+
+
+def cache_for(tmp_path, **kwargs):
+    return MediaCache(str(tmp_path / "manifest.json"), **kwargs)
+
+
+def test_first_reconcile_waits_for_the_listing(tmp_path):
+    cache = cache_for(tmp_path)
+    cache.ensure_reconciled(FakeBucket(["videos/a.mp4"]))
+
+    assert cache.lookup("digest", "videos/a.mp4") == "videos/a.mp4"
+    assert not cache.needs_reconcile()
+
+
+def test_failed_listing_is_retried_after_a_back_off(tmp_path):
+    cache = cache_for(tmp_path, retry_interval=60)
+    bucket = FakeBucket(error=RuntimeError("OSS is down"))
+
+    for _ in range(5):
+        cache.ensure_reconciled(bucket)
+    assert bucket.listings == 1
+    assert not cache.needs_reconcile()
+
+    cache.retry_interval = 0
+    bucket.error = None
+    cache.ensure_reconciled(bucket)
+    # One listing per media prefix
+    assert bucket.listings == 4
+    assert not cache.needs_reconcile()
+
+
+def test_stale_manifest_is_reconciled_by_one_background_thread(tmp_path):
+    cache = cache_for(tmp_path, reconcile_interval=60, retry_interval=0)
+    cache.ensure_reconciled(FakeBucket(["audio/old.mp3"]))
+
+    cache.reconcile_interval = 0
+    bucket = FakeBucket(["audio/old.mp3", "audio/new.mp3"])
+    bucket.release.clear()
+    callers = [threading.Thread(target=cache.ensure_reconciled, args=(bucket,))
+               for _ in range(4)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join(1)
+
+    # Nobody waited on the slow listing, and the old manifest kept serving
+    assert not any(caller.is_alive() for caller in callers)
+    assert cache.has_key("audio/old.mp3")
+    assert not cache.has_key("audio/new.mp3")
+    wait_until(lambda: bucket.listings == 1)
+
+    bucket.release.set()
+    wait_until(lambda: cache.has_key("audio/new.mp3"))
+    assert bucket.listings == 3
+
+
+def test_entries_are_written_in_one_batch(tmp_path):
+    cache = cache_for(tmp_path, flush_delay=60)
+    for i in range(100):
+        cache.put(f"digest-{i}", f"audio/{i}.mp3")
+    assert not os.path.exists(tmp_path / "manifest.json")
+
+    cache.flush()
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert len(manifest["entries"]) == 100
+    assert cache_for(tmp_path).get("digest-99") == "audio/99.mp3"
+
+
+def test_concurrent_workers_keep_each_others_entries(tmp_path):
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    manifest = str(tmp_path / "manifest.json")
+    workers = [
+        subprocess.Popen([sys.executable, "-c", (
+            "import sys\n"
+            f"sys.path.insert(0, {server_dir!r})\n"
+            "from media_cache import MediaCache\n"
+            f"cache = MediaCache({manifest!r}, flush_delay=0)\n"
+            "for i in range(100):\n"
+            f"    cache.put('{worker}-%d' % i, 'videos/{worker}-%d.mp4' % i)\n"
+            "cache.flush()\n"
+        )])
+        for worker in range(4)
+    ]
+    for worker in workers:
+        assert worker.wait() == 0
+
+    assert len(json.loads(open(manifest).read())["entries"]) == 400
@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+
+from conftest import wait_until
+from scheduler import GpuScheduler, Priority
+
+
+def start(target, *args, **kwargs):
+    thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+    thread.start()
+    return thread
+
+
+def waiting(scheduler, model):
+    return scheduler.stats()["waiting"].get(model, 0)
+
+
+def test_runs_at_most_limit_calls_per_model():
+    scheduler = GpuScheduler({"t2i": 2})
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+
+    threads = [start(scheduler.run, "t2i", work) for _ in range(6)]
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    assert scheduler.stats()["running"] == {"t2i": 0}
+
+
+def test_models_have_separate_limits():
+    scheduler = GpuScheduler({"t2i": 1, "i2v": 1})
+    release = threading.Event()
+    start(scheduler.run, "t2i", release.wait)
+    wait_until(lambda: scheduler.stats()["running"].get("t2i") == 1)
+
+    # i2v is not held up by the busy t2i slot
+    assert scheduler.run("i2v", lambda: "video") == "video"
+    release.set()
+
+
+def test_interactive_calls_jump_the_bulk_queue():
+    scheduler = GpuScheduler({"i2v": 1})
+    release = threading.Event()
+    order = []
+    start(scheduler.run, "i2v", release.wait)
+    wait_until(lambda: scheduler.stats()["running"].get("i2v") == 1)
+
+    bulk = start(scheduler.run, "i2v", order.append, "bulk")
+    wait_until(lambda: waiting(scheduler, "i2v") == 1)
+    interactive = start(scheduler.run, "i2v", order.append, "interactive",
+                        priority=Priority.INTERACTIVE)
+    wait_until(lambda: waiting(scheduler, "i2v") == 2)
+
+    release.set()
+    bulk.join()
+    interactive.join()
+    assert order == ["interactive", "bulk"]
+
+
+def test_same_priority_runs_in_arrival_order():
+    scheduler = GpuScheduler({"i2v": 1})
+    release = threading.Event()
+    order = []
+    start(scheduler.run, "i2v", release.wait)
+    wait_until(lambda: scheduler.stats()["running"].get("i2v") == 1)
+
+    threads = []
+    for name in ("first", "second", "third"):
+        threads.append(start(scheduler.run, "i2v", order.append, name))
+        wait_until(lambda: waiting(scheduler, "i2v") == len(threads))
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert order == ["first", "second", "third"]
+
+
+def test_calls_with_the_same_key_coalesce():
+    scheduler = GpuScheduler({"i2v": 1})
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def render():
+        calls.append(1)
+        release.wait()
+        return "videos/tea.mp4"
+
+    owner = start(lambda: results.append(scheduler.run("i2v", render, key="tea")))
+    wait_until(lambda: calls)
+    joiner = start(lambda: results.append(scheduler.run("i2v", render, key="tea")))
+    wait_until(lambda: scheduler.stats()["coalesced"] == 1)
+
+    release.set()
+    owner.join()
+    joiner.join()
+    assert calls == [1]
+    assert results == ["videos/tea.mp4", "videos/tea.mp4"]
+
+
+def test_coalesced_callers_see_the_owners_error():
+    scheduler = GpuScheduler({"i2v": 1})
+    release = threading.Event()
+    errors = []
+
+    def render():
+        release.wait()
+        raise RuntimeError("render failed")
+
+    def call():
+        try:
+            scheduler.run("i2v", render, key="tea")
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [start(call)]
+    wait_until(lambda: scheduler.stats()["running"].get("i2v") == 1)
+    threads.append(start(call))
+    wait_until(lambda: scheduler.stats()["coalesced"] == 1)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["render failed", "render failed"]
+    # The failed key is forgotten, so the next call runs again
+    assert scheduler.run("i2v", lambda: "retried", key="tea") == "retried"
+
+
+def test_interactive_caller_promotes_a_queued_bulk_call():
+    scheduler = GpuScheduler({"i2v": 1})
+    release = threading.Event()
+    order = []
+    start(scheduler.run, "i2v", release.wait)
+    wait_until(lambda: scheduler.stats()["running"].get("i2v") == 1)
+
+    other = start(scheduler.run, "i2v", order.append, "other")
+    wait_until(lambda: waiting(scheduler, "i2v") == 1)
+    tea = start(scheduler.run, "i2v", order.append, "tea", key="tea")
+    wait_until(lambda: waiting(scheduler, "i2v") == 2)
+
+    # Joining the queued "tea" call interactively moves it ahead of "other"
+    joiner = start(scheduler.run, "i2v", order.append, "tea", key="tea",
+                   priority=Priority.INTERACTIVE)
+    wait_until(lambda: scheduler.stats()["coalesced"] == 1)
+
+    release.set()
+    for thread in (other, tea, joiner):
+        thread.join()
+    assert order == ["tea", "other"]
+
+
+def test_errors_release_the_slot():
+    scheduler = GpuScheduler({"t2i": 1})
+
+    def fail():
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        scheduler.run("t2i", fail)
+    assert scheduler.run("t2i", lambda: "ok") == "ok"
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+
+import mongomock
+import pytest
+
+from conftest import wait_until
+from singleflight import MongoLease, SingleFlight
+
+
+@pytest.fixture
+def leases():
+    return mongomock.MongoClient().db.leases
+
+
+def lease(collection, owner, ttl=60):
+    lease = MongoLease(collection, ttl=ttl)
+    lease.owner = owner
+    return lease
+
+
+def test_lease_is_exclusive_until_released(leases):
+    a, b = lease(leases, "a"), lease(leases, "b")
+    assert a.acquire("videos/tea.mp4")
+    assert not b.acquire("videos/tea.mp4")
+    # The holder may take its own lease again
+    assert a.acquire("videos/tea.mp4")
+
+    a.release("videos/tea.mp4")
+    assert b.acquire("videos/tea.mp4")
+
+
+def test_lapsed_lease_can_be_taken_over(leases):
+    a, b = lease(leases, "a", ttl=0.05), lease(leases, "b")
+    assert a.acquire("key")
+    time.sleep(0.1)
+    assert b.acquire("key")
+    # Renewing a lease that was taken over reports it lost
+    assert not a.renew("key")
+    assert b.renew("key")
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def generate():
+        calls.append(1)
+        release.wait()
+        return "audio/hello.mp3"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("hello", generate)))
+        for _ in range(3)
+    ]
+    threads[0].start()
+    wait_until(lambda: calls)
+    for thread in threads[1:]:
+        thread.start()
+    wait_until(lambda: flight.stats()["shared"] == 2)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ["audio/hello.mp3"] * 3
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("upload failed")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_other_worker_waits_for_the_lease_holder(leases):
+    owner = lease(leases, "worker-1")
+    assert owner.acquire("videos/tea.mp4")
+    flight = SingleFlight(lease(leases, "worker-2"), poll_interval=0.01)
+    uploaded = []
+
+    def check():
+        return "videos/tea.mp4" if uploaded else None
+
+    def generate():
+        raise AssertionError("must not generate while another worker holds the lease")
+
+    threading.Timer(0.05, uploaded.append, args=[True]).start()
+    assert flight.do("videos/tea.mp4", generate, check=check) == "videos/tea.mp4"
+    assert flight.stats()["waited"] == 1
+
+
+def test_lease_is_renewed_while_the_work_runs(leases):
+    holder = lease(leases, "worker-1", ttl=0.15)
+    other = lease(leases, "worker-2")
+    flight = SingleFlight(holder)
+    taken = []
+
+    def generate():
+        # Several TTLs pass while the generation runs
+        for _ in range(6):
+            time.sleep(0.05)
+            taken.append(other.acquire("key"))
+        return "done"
+
+    assert flight.do("key", generate) == "done"
+    assert not any(taken)
+    # Released once the work finished
+    assert other.acquire("key")
+
+
+def test_async_calls_share_one_execution_with_sync_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        while not release.is_set():
+            await asyncio.sleep(0.005)
+        return "audio/hello.mp3"
+
+    async def main():
+        owner = asyncio.ensure_future(flight.async_do("hello", generate))
+        while not calls:
+            await asyncio.sleep(0.005)
+        sync_results = []
+        thread = threading.Thread(
+            target=lambda: sync_results.append(flight.do("hello", generate)))
+        thread.start()
+        other = asyncio.ensure_future(flight.async_do("hello", generate))
+        while flight.stats()["shared"] < 2:
+            await asyncio.sleep(0.005)
+        release.set()
+        results = await asyncio.gather(owner, other)
+        thread.join()
+        return results + sync_results
+
+    assert asyncio.run(main()) == ["audio/hello.mp3"] * 3
+    assert calls == [1]
+
+
+def test_async_do_takes_and_releases_the_lease(leases):
+    holder = lease(leases, "worker-1")
+    other = lease(leases, "worker-2")
+    flight = SingleFlight(holder)
+    held = []
+
+    async def generate():
+        held.append(other.acquire("key"))
+        return "done"
+
+    assert asyncio.run(flight.async_do("key", generate)) == "done"
+    assert held == [False]
+    assert other.acquire("key")
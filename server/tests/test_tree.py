@@ -0,0 +1,73 @@
+import mongomock
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+import app as server
+
+
+@pytest.mark.parametrize("name", ["food and drinks", "café ☕", "a/b+c", "x" * 200])
+def test_cursor_round_trips(name):
+    cursor = server.encode_cursor(name)
+    assert server.decode_cursor(cursor) == name
+    # Safe to put in a query string as-is
+    assert all(char.isalnum() or char in "-_=" for char in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "YQ", "YQ==x", "%%", "gA==", "YQ==YQ=="])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        server.decode_cursor(cursor)
+
+
+def test_unnamed_nodes_cannot_be_encoded():
+    with pytest.raises(ValueError):
+        server.encode_cursor(None)
+
+
+@pytest.fixture
+def client():
+    server.configure_clients(mongo=mongomock.MongoClient())
+    server.tree_cache.clear()
+    server.items_collection.insert_many([
+        {"name": f"item {i:02d}", "category": f"cat {i % 3}",
+         "subcategory": f"sub {i % 2}", "requests": ["need more"]}
+        for i in range(12)
+    ] + [
+        # Partly categorized items must not break paging
+        {"name": "orphan", "category": None, "subcategory": None},
+        {"name": "loose", "category": "cat 0"},
+    ])
+    server.bump_data_version()
+    return Client(server.app, Response)
+
+
+def page_through(client, query):
+    names, cursor = [], None
+    while True:
+        response = client.get("/api/tree", query_string=dict(
+            query, limit=2, **({"cursor": cursor} if cursor else {})))
+        assert response.status_code == 200
+        page = response.get_json()
+        names += [entry["name"] for entry in page["entries"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return names
+
+
+def test_pages_cover_each_level_once(client):
+    assert page_through(client, {}) == ["cat 0", "cat 1", "cat 2"]
+    assert page_through(client, {"category": "cat 0"}) == ["sub 0", "sub 1"]
+    assert page_through(client, {"category": "cat 0", "subcategory": "sub 0"}) == [
+        "item 00", "item 06"]
+
+
+def test_subcategory_counts_skip_unnamed_subcategories(client):
+    entries = client.get("/api/tree").get_json()["entries"]
+    assert {entry["name"]: entry["subcategories"] for entry in entries} == {
+        "cat 0": 2, "cat 1": 2, "cat 2": 2}
+
+
+def test_bad_requests_get_400(client):
+    assert client.get("/api/tree?cursor=!!!").status_code == 400
+    assert client.get("/api/tree?subcategory=sub 0").status_code == 400
@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+TTS_FORMAT = "mp3"
+TTS_SAMPLE_RATE = 16000
+
+
+def speech_cache_key(text, voice, fmt=TTS_FORMAT, sample_rate=TTS_SAMPLE_RATE):
+    """Stable digest of everything that determines the synthesized audio"""
+    payload = json.dumps(
+        {"text": text, "voice": voice, "format": fmt,
+         "sample_rate": sample_rate},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def speech_filename(text, voice, fmt=TTS_FORMAT, sample_rate=TTS_SAMPLE_RATE):
+    """Deterministic filename: readable prefix plus the cache key"""
+    digest = speech_cache_key(text, voice, fmt, sample_rate)
+    return f"speech_{text.replace(' ', '_')[:30].lower()}_{digest[:16]}.{fmt}"
+
+
+def nls_request_types():
+    """(create task, get task) request classes from the speech SDK"""
+    from aliyunsdknls.request.v20180628 import (
+        CreateTtsTaskRequest, GetTtsTaskRequest,
+    )
+    return (CreateTtsTaskRequest.CreateTtsTaskRequest,
+            GetTtsTaskRequest.GetTtsTaskRequest)
+
+
+class TtsTask:
+    """State of one phrase moving through the TTS pipeline"""
+
+    def __init__(self, text, voice, filename=None):
+        self.text = text
+        self.voice = voice
+        self.cache_key = speech_cache_key(text, voice)
+        self.filename = filename or speech_filename(text, voice)
+        self.task_id = None
+        self.tts_url = None
+        self.oss_key = None
+
+
+class TtsPipeline:
+    """Submits TTS tasks together and polls them in one multiplexed loop
+
+    Results are cached in the media cache under speech_cache_key(), so the
+    same (text, voice, format, sample rate) is only ever synthesized once.
+    request_types replaces the speech SDK's (create, get) request classes,
+    which are otherwise imported on first use.
+    """
+
+    def __init__(self, speech_client, upload, audio_dir, cache=None,
+                 local_cache=None, max_workers=8, poll_interval=1.0,
+                 timeout=180, request_types=None):
+        self.speech_client = speech_client
+        self.request_types = request_types
+        self.upload = upload
+        self.audio_dir = audio_dir
+        self.cache = cache
+        self.local_cache = local_cache
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tts")
+
+    def synthesize(self, text, voice="Olivia", filename=None):
+        """Generate speech for one phrase and return its OSS key"""
+        return self.synthesize_many(
+            [text], voice, filenames={text: filename} if filename else None
+        ).get(text)
+
+    def cached(self, text, voice="Olivia", filename=None):
+        """Return the OSS key of already synthesized speech, or None
+
+        Counts hits only; a miss is counted when synthesis looks again.
+        """
+        task = TtsTask(text, voice, filename)
+        if not self.cache:
+            return None
+        oss_key = self.cache.lookup(task.cache_key, f"audio/{task.filename}")
+        if oss_key:
+            with self._stats_lock:
+                self.hits += 1
+        return oss_key
+
+    def stats(self):
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def synthesize_many(self, phrases, voice="Olivia", filenames=None,
+                        on_audio=None):
+        """Generate speech for every phrase and return phrase -> OSS key
+
+        on_audio(phrase, oss_key) is called as each phrase finishes, with
+        oss_key None on failure.
+        """
+        filenames = filenames or {}
+        tasks = [
+            TtsTask(text, voice, filenames.get(text))
+            for text in dict.fromkeys(phrases)
+        ]
+
+        def finish(task):
+            if on_audio:
+                on_audio(task.text, task.oss_key)
+
+        # Serve cached phrases without touching the TTS service
+        pending = []
+        for task in tasks:
+            if self._lookup(task):
+                finish(task)
+            else:
+                pending.append(task)
+
+        # Submit every remaining phrase at once
+        for task, task_id in zip(pending, self.executor.map(self._create, pending)):
+            task.task_id = task_id
+            if not task_id:
+                finish(task)
+
+        # Poll all outstanding tasks together and hand finished ones to the
+        # download/upload workers straight away
+        outstanding = [task for task in pending if task.task_id]
+        transfers = []
+        deadline = time.time() + self.timeout
+        while outstanding and time.time() < deadline:
+            time.sleep(self.poll_interval)
+            statuses = list(self.executor.map(self._poll, outstanding))
+            still_running = []
+            for task, status in zip(outstanding, statuses):
+                if status == "RUNNING":
+                    still_running.append(task)
+                elif status == "SUCCESS" and task.tts_url:
+                    transfers.append(
+                        self.executor.submit(self._transfer, task, finish))
+                else:
+                    print(f"TTS task failed with status: {status}")
+                    finish(task)
+            outstanding = still_running
+
+        for task in outstanding:
+            print(f"TTS task timed out for '{task.text}'")
+            finish(task)
+
+        wait(transfers)
+        return {task.text: task.oss_key for task in tasks if task.oss_key}
+
+    async def async_synthesize(self, text, voice="Olivia", filename=None,
+                               http_client=None):
+        """Async synthesize() that waits for the TTS task on the event loop
+
+        The speech SDK is synchronous, so each create and poll call runs on
+        the executor, but only for the length of that call; the download
+        goes over httpx (http_client, an httpx.AsyncClient, if given).
+        """
+        import httpx
+
+        task = TtsTask(text, voice, filename)
+        if self._lookup(task):
+            return task.oss_key
+
+        loop = asyncio.get_running_loop()
+        task.task_id = await loop.run_in_executor(self.executor, self._create, task)
+        if not task.task_id:
+            return None
+
+        deadline = time.time() + self.timeout
+        status = "RUNNING"
+        while status == "RUNNING" and time.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            status = await loop.run_in_executor(self.executor, self._poll, task)
+        if status != "SUCCESS" or not task.tts_url:
+            print(f"TTS task for '{text}' ended with status: {status}")
+            return None
+
+        local_audio_path, write_path = self._download_paths(task)
+        try:
+            client = http_client or httpx.AsyncClient()
+            try:
+                async with client.stream("GET", task.tts_url) as response:
+                    response.raise_for_status()
+                    with open(write_path, "wb") as f:
+                        async for chunk in response.aiter_bytes():
+                            f.write(chunk)
+            finally:
+                if http_client is None:
+                    await client.aclose()
+        except Exception as e:
+            print(f"Error generating audio for '{text}': {str(e)}")
+            return None
+
+        await loop.run_in_executor(
+            self.executor, self._store, task, local_audio_path, write_path)
+        return task.oss_key
+
+    def _lookup(self, task):
+        """Fill in task.oss_key from the cache; True on a hit"""
+        if self.cache:
+            task.oss_key = self.cache.lookup(
+                task.cache_key, f"audio/{task.filename}")
+        with self._stats_lock:
+            if task.oss_key:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return bool(task.oss_key)
+
+    def _create(self, task):
+        try:
+            # The speech SDK is not on PyPI; without it only this phrase fails
+            create_request, _ = self.request_types or nls_request_types()
+
+            # Create TTS request
+            request = create_request()
+            request.set_accept_format('json')
+            request.set_Text(task.text)
+            request.set_Voice(task.voice)  # Voice options like Olivia, William, etc.
+            request.set_Format(TTS_FORMAT)
+            request.set_SampleRate(TTS_SAMPLE_RATE)
+
+            response_json = json.loads(
+                self.speech_client.do_action_with_exception(request))
+            if 'TaskId' in response_json:
+                return response_json['TaskId']
+            print("Failed to create TTS task")
+        except Exception as e:
+            print(f"Error creating TTS task for '{task.text}': {str(e)}")
+        return None
+
+    def _poll(self, task):
+        try:
+            _, get_request = self.request_types or nls_request_types()
+        except ImportError as e:
+            print(f"Error polling TTS task for '{task.text}': {str(e)}")
+            return "FAILED"
+
+        try:
+            status_request = get_request()
+            status_request.set_TaskId(task.task_id)
+            status_response_json = json.loads(
+                self.speech_client.do_action_with_exception(status_request))
+        except Exception as e:
+            # Treat transient polling errors as still running
+            print(f"Error polling TTS task for '{task.text}': {str(e)}")
+            return "RUNNING"
+
+        status = status_response_json.get('StatusText', 'RUNNING')
+        if status == "SUCCESS":
+            task.tts_url = status_response_json.get('TtsUrl')
+        return status
+
+    def _transfer(self, task, finish):
+        try:
+            # Download the audio file
+            local_audio_path, write_path = self._download_paths(task)
+            urllib.request.urlretrieve(task.tts_url, write_path)
+            self._store(task, local_audio_path, write_path)
+        except Exception as e:
+            print(f"Error generating audio for '{task.text}': {str(e)}")
+        finish(task)
+
+    def _download_paths(self, task):
+        """(final local path, path to download to)"""
+        os.makedirs(self.audio_dir, exist_ok=True)
+        local_audio_path = os.path.join(self.audio_dir, task.filename)
+        if self.local_cache:
+            # Download under a temp name so readers never see a partial file
+            return local_audio_path, self.local_cache.temp_path(local_audio_path)
+        return local_audio_path, local_audio_path
+
+    def _store(self, task, local_audio_path, write_path):
+        """Move a downloaded file into place and upload it to OSS"""
+        try:
+            if self.local_cache:
+                self.local_cache.commit(
+                    write_path, local_audio_path, task.cache_key)
+
+            # Upload to OSS
+            oss_key = f"audio/{task.filename}"
+            if self.upload(local_audio_path, oss_key):
+                task.oss_key = oss_key
+                if self.cache:
+                    self.cache.put(task.cache_key, oss_key)
+            else:
+                print(f"Error uploading audio for '{task.text}'")
+        except Exception as e:
+            print(f"Error generating audio for '{task.text}': {str(e)}")
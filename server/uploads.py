@@ -0,0 +1,109 @@
+import os
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+
+def oss_resumable_upload(bucket, oss_key, local_path, checkpoint_dir,
+                         multipart_threshold, part_size, num_threads):
+    """Multipart upload through oss2, resumable across restarts"""
+    import oss2
+
+    oss2.resumable_upload(
+        bucket, oss_key, local_path,
+        store=oss2.ResumableStore(root=checkpoint_dir),
+        multipart_threshold=multipart_threshold,
+        part_size=part_size,
+        num_threads=num_threads
+    )
+
+
+class UploadManager:
+    """Bounded pool that uploads generated media to OSS in the background
+
+    Files at or above multipart_threshold go through resumable multipart
+    upload; smaller ones use a single PUT. Pass a different
+    resumable_upload callable (same signature as oss_resumable_upload) to
+    run against a local fake bucket.
+    """
+
+    def __init__(self, bucket, max_workers=4, multipart_threshold=10 * 1024 * 1024,
+                 part_size=2 * 1024 * 1024, num_threads=4, checkpoint_dir=None,
+                 resumable_upload=oss_resumable_upload, on_uploaded=None,
+                 timer=None):
+        self.bucket = bucket
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.num_threads = num_threads
+        self.checkpoint_dir = checkpoint_dir
+        self.resumable_upload = resumable_upload
+        self.on_uploaded = on_uploaded
+        # Optional factory for a context manager wrapped around each upload
+        self.timer = timer or nullcontext
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="upload")
+        self._in_flight = {}
+        # Re-entrant: a done callback can fire inside submit() itself
+        self._lock = threading.RLock()
+
+    def upload(self, local_path, oss_key):
+        """Upload on the calling thread; returns True on success"""
+        try:
+            with self.timer():
+                if os.path.getsize(local_path) >= self.multipart_threshold:
+                    self.resumable_upload(
+                        self.bucket, oss_key, local_path, self.checkpoint_dir,
+                        self.multipart_threshold, self.part_size, self.num_threads)
+                else:
+                    self.bucket.put_object_from_file(oss_key, local_path)
+        except Exception as e:
+            print(f"Error uploading {oss_key} to OSS: {str(e)}")
+            return False
+
+        if self.on_uploaded:
+            self.on_uploaded(oss_key)
+        return True
+
+    def submit(self, local_path, oss_key, callback=None):
+        """Queue an upload and return its future (result is True on success)
+
+        callback(oss_key, success) runs on the upload thread when it ends;
+        the returned future then resolves after the callback has run.
+        """
+        with self._lock:
+            future = self._in_flight.get(oss_key)
+            if future is None:
+                future = self.executor.submit(self.upload, local_path, oss_key)
+                self._in_flight[oss_key] = future
+                future.add_done_callback(
+                    lambda _: self._forget(oss_key, future))
+
+        if callback is None:
+            return future
+
+        # Resolve only after the callback, so waiting on the returned future
+        # also waits for its bookkeeping
+        finished = Future()
+
+        def run_callback(upload_future):
+            success = upload_future.result()
+            try:
+                callback(oss_key, success)
+            except Exception as e:
+                print(f"Error in upload callback for {oss_key}: {str(e)}")
+            finished.set_result(success)
+
+        future.add_done_callback(run_callback)
+        return finished
+
+    def wait(self, futures):
+        wait(list(futures))
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def _forget(self, oss_key, future):
+        with self._lock:
+            if self._in_flight.get(oss_key) is future:
+                del self._in_flight[oss_key]
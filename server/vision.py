@@ -0,0 +1,114 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; uploads are then sent as-is
+    Image = None
+    ImageOps = None
+
+
+class InvalidImage(ValueError):
+    """The upload is not an image Pillow can decode"""
+
+
+def open_image(data):
+    try:
+        return Image.open(io.BytesIO(data))
+    except Exception as e:
+        # UnidentifiedImageError, truncated data, decompression bombs
+        raise InvalidImage(f"Not a readable image: {str(e)}") from e
+
+
+def prepare_image(data, max_side=1024, quality=85):
+    """Downscale and re-encode an upload to a JPEG no larger than max_side
+
+    Returns (bytes, mime type). Without Pillow the original bytes are
+    returned unchanged.
+    """
+    if Image is None:
+        return data, "image/jpeg"
+
+    with open_image(data) as image:
+        if image.format == "JPEG" and max(image.size) <= max_side:
+            return data, "image/jpeg"
+
+        try:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+        except OSError as e:
+            raise InvalidImage(f"Not a readable image: {str(e)}") from e
+        image.thumbnail((max_side, max_side))
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+        return output.getvalue(), "image/jpeg"
+
+
+def perceptual_hash(data):
+    """64-bit difference hash of an image, as hex
+
+    Near-identical photos of the same object hash to values a few bits
+    apart. Without Pillow this degrades to an exact content hash.
+    """
+    if Image is None:
+        return hashlib.sha256(data).hexdigest()
+
+    with open_image(data) as image:
+        try:
+            pixels = list(image.convert("L").resize((9, 8)).getdata())
+        except OSError as e:
+            raise InvalidImage(f"Not a readable image: {str(e)}") from e
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def hamming_distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class DetectionCache:
+    """LRU of perceptual hash -> detected object label"""
+
+    def __init__(self, capacity=512, max_distance=4):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._labels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_hash):
+        with self._lock:
+            label = self._labels.get(image_hash)
+            if label is None and len(image_hash) == 16:
+                # Accept a near match: same object, slightly different photo
+                for cached_hash, cached_label in self._labels.items():
+                    if (len(cached_hash) == 16 and
+                            hamming_distance(image_hash, cached_hash) <= self.max_distance):
+                        image_hash, label = cached_hash, cached_label
+                        break
+            if label is None:
+                self.misses += 1
+                return None
+            self._labels.move_to_end(image_hash)
+            self.hits += 1
+            return label
+
+    def put(self, image_hash, label):
+        with self._lock:
+            self._labels[image_hash] = label
+            self._labels.move_to_end(image_hash)
+            while len(self._labels) > self.capacity:
+                self._labels.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._labels)}
@@ -0,0 +1,254 @@
+"""Long-lived Wan2.1 worker that loads checkpoints once and serves jobs.
+
+Run it from the Wan2.1 repository (or set WAN_REPO_DIR), with the same
+WAN_WORKER_AUTHKEY as the server:
+
+    WAN_WORKER_AUTHKEY=<secret> python wan_worker.py --preload
+"""
+import argparse
+import os
+import sys
+import threading
+from multiprocessing.connection import Client, Listener
+
+
+DEFAULT_ADDRESS = "127.0.0.1:6100"
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def get_authkey():
+    """Shared secret for the worker connection; there is no default
+
+    The connection unpickles every message, so anyone holding the key can
+    run code in the worker.
+    """
+    authkey = os.getenv("WAN_WORKER_AUTHKEY")
+    if not authkey:
+        raise ValueError("WAN_WORKER_AUTHKEY is not set")
+    return authkey.encode("utf-8")
+
+
+class WanWorkerClient:
+    """Client for a running wan_worker process"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.address = parse_address(address)
+        self.authkey = authkey or get_authkey()
+
+    def generate(self, task, size, ckpt_dir, prompt, output, image=None):
+        """Run one generation job; raises ConnectionError if unreachable"""
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except OSError as e:
+            raise ConnectionError(f"Wan worker unavailable: {str(e)}")
+
+        try:
+            conn.send({
+                "task": task,
+                "size": size,
+                "ckpt_dir": ckpt_dir,
+                "prompt": prompt,
+                "output": output,
+                "image": image,
+            })
+            reply = conn.recv()
+        finally:
+            conn.close()
+
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "Wan worker failed"))
+        return reply["output"]
+
+    def generate_batch(self, task, size, ckpt_dir, jobs):
+        """Run several prompts in one round trip and one model residency
+
+        jobs is a list of {"prompt": ..., "output": ...}; returns a dict of
+        output path -> error message (None on success).
+        """
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except OSError as e:
+            raise ConnectionError(f"Wan worker unavailable: {str(e)}")
+
+        try:
+            conn.send({
+                "task": task,
+                "size": size,
+                "ckpt_dir": ckpt_dir,
+                "batch": jobs,
+            })
+            reply = conn.recv()
+        finally:
+            conn.close()
+
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "Wan worker failed"))
+        return reply["results"]
+
+
+class WanModelServer:
+    """Keeps Wan2.1 pipelines resident and runs jobs one at a time"""
+
+    def __init__(self, device_id=0):
+        self.device_id = device_id
+        self.pipelines = {}
+        # A single GPU runs one job at a time; connections queue on this lock
+        self.gpu_lock = threading.RLock()
+
+    def get_pipeline(self, task, ckpt_dir):
+        key = (task, ckpt_dir)
+        if key not in self.pipelines:
+            import wan
+            from wan.configs import WAN_CONFIGS
+
+            if task not in WAN_CONFIGS:
+                raise ValueError(f"Unsupported Wan2.1 task: {task}")
+
+            print(f"Loading Wan2.1 {task} checkpoint from {ckpt_dir}")
+            pipeline_class = wan.WanI2V if task.startswith("i2v") else wan.WanT2V
+            self.pipelines[key] = pipeline_class(
+                config=WAN_CONFIGS[task],
+                checkpoint_dir=ckpt_dir,
+                device_id=self.device_id,
+                rank=0,
+            )
+        return self.pipelines[key]
+
+    def run(self, job):
+        from wan.configs import MAX_AREA_CONFIGS, SIZE_CONFIGS, WAN_CONFIGS
+        from wan.utils.utils import cache_image, cache_video
+
+        task = job["task"]
+        size = job["size"]
+        output = job["output"]
+
+        with self.gpu_lock:
+            pipeline = self.get_pipeline(task, job["ckpt_dir"])
+
+            if task.startswith("i2v"):
+                from PIL import Image
+
+                image = Image.open(job["image"]).convert("RGB")
+                video = pipeline.generate(
+                    job["prompt"],
+                    image,
+                    max_area=MAX_AREA_CONFIGS[size],
+                    offload_model=False,
+                )
+                cache_video(
+                    tensor=video[None],
+                    save_file=output,
+                    fps=WAN_CONFIGS[task].sample_fps,
+                    nrow=1,
+                    normalize=True,
+                    value_range=(-1, 1),
+                )
+            elif task.startswith("t2i"):
+                video = pipeline.generate(
+                    job["prompt"],
+                    size=SIZE_CONFIGS[size],
+                    frame_num=1,
+                    offload_model=False,
+                )
+                cache_image(
+                    tensor=video.squeeze(1)[None],
+                    save_file=output,
+                    nrow=1,
+                    normalize=True,
+                    value_range=(-1, 1),
+                )
+            else:
+                video = pipeline.generate(
+                    job["prompt"],
+                    size=SIZE_CONFIGS[size],
+                    offload_model=False,
+                )
+                cache_video(
+                    tensor=video[None],
+                    save_file=output,
+                    fps=WAN_CONFIGS[task].sample_fps,
+                    nrow=1,
+                    normalize=True,
+                    value_range=(-1, 1),
+                )
+
+        return output
+
+    def run_batch(self, job):
+        results = {}
+        # Hold the GPU for the whole batch so other jobs don't interleave
+        with self.gpu_lock:
+            for entry in job["batch"]:
+                try:
+                    self.run(dict(job, **entry))
+                    results[entry["output"]] = None
+                except Exception as e:
+                    print(f"Error running Wan2.1 batch entry: {str(e)}")
+                    results[entry["output"]] = str(e)
+        return results
+
+    def handle(self, conn):
+        try:
+            while True:
+                try:
+                    job = conn.recv()
+                except EOFError:
+                    break
+                try:
+                    if "batch" in job:
+                        results = self.run_batch(job)
+                        conn.send({"ok": True, "results": results})
+                        continue
+                    output = self.run(job)
+                    conn.send({"ok": True, "output": output})
+                except Exception as e:
+                    print(f"Error running Wan2.1 job: {str(e)}")
+                    conn.send({"ok": False, "error": str(e)})
+        finally:
+            conn.close()
+
+    def serve(self, address):
+        listener = Listener(parse_address(address), authkey=get_authkey())
+        print(f"Wan2.1 worker listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"Error accepting connection: {str(e)}")
+                continue
+            threading.Thread(
+                target=self.handle, args=(conn,), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--address", default=os.getenv("WAN_WORKER_ADDRESS", DEFAULT_ADDRESS))
+    parser.add_argument("--device-id", type=int, default=0)
+    parser.add_argument(
+        "--preload", action="store_true",
+        help="Load the T2I and I2V checkpoints before accepting jobs")
+    args = parser.parse_args()
+    if not os.getenv("WAN_WORKER_AUTHKEY"):
+        parser.error("set WAN_WORKER_AUTHKEY to a random secret shared with the server")
+
+    # Make the Wan2.1 package importable when started outside its repo
+    sys.path.insert(0, os.getenv("WAN_REPO_DIR", os.getcwd()))
+
+    server = WanModelServer(device_id=args.device_id)
+    if args.preload:
+        server.get_pipeline(
+            os.getenv("WAN_T2I_TASK", "t2i-1.3B"),
+            os.getenv("WAN_T2I_MODEL_PATH", "./Wan2.1-T2V-1.3B"))
+        server.get_pipeline(
+            os.getenv("WAN_I2V_TASK", "i2v-1.3B"),
+            os.getenv("WAN_I2V_MODEL_PATH", "./Wan2.1-I2V-1.3B-720P"))
+    server.serve(args.address)
+
+
+if __name__ == "__main__":
+    main()